@@ -0,0 +1,128 @@
+"""Pre-aggregated form submission counters: one rollup document per tenant per day
+
+Each document looks like {"_id": "2026-03-15", "total": 12, "counts": {"volunteer": 9, "contact": 3}};
+a chapter's _id carries its tenant prefix ("usu:2026-03-15", see tenants.key), so one
+_id range still covers one tenant's days. submit_form increments it atomically; time
+series are then read in O(days) without touching raw submissions. Rebuild from
+scratch with:
+
+    python analytics.py backfill
+"""
+
+import asyncio
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+import archive
+import consistency
+import tenants
+
+ROLLUP_COLLECTION = 'submission_rollups'
+MAX_DAYS = 366
+
+_FORM_TYPE_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def rollup_key(form_type: str) -> str:
+    """formType becomes a field name in the rollup, so anything unsafe is folded into 'other'"""
+    return form_type if _FORM_TYPE_RE.match(form_type or '') else 'other'
+
+
+async def record_submission(database, form_type: str, submitted_at: str):
+    """Atomically bump the day's total and per-formType counter"""
+    await database[ROLLUP_COLLECTION].update_one(
+        {"_id": tenants.key(submitted_at[:10])},
+        {"$inc": {"total": 1, f"counts.{rollup_key(form_type)}": 1}},
+        upsert=True,
+    )
+
+
+def series_filter(start: str, end: str) -> Dict:
+    """The current tenant's rollups for days start..end inclusive"""
+    return {"_id": {"$gte": tenants.key(start), "$lte": tenants.key(end)}}
+
+
+async def get_series(database, days: int = 30, form_type: Optional[str] = None) -> Dict:
+    """The current tenant's daily counts for the last `days` days (zero-filled) plus totals over the window"""
+    days = min(max(days, 1), MAX_DAYS)
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=days - 1)
+    rollups = await consistency.collection(database, ROLLUP_COLLECTION, "analytics-read").find(
+        series_filter(start.isoformat(), today.isoformat())
+    ).to_list(days)
+    by_day = {doc["_id"][-10:]: doc for doc in rollups}
+
+    key = rollup_key(form_type) if form_type else None
+    series = []
+    totals: Dict[str, int] = {}
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        doc = by_day.get(day, {})
+        counts = doc.get("counts", {})
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+        if key:
+            series.append({"date": day, "total": counts.get(key, 0)})
+        else:
+            series.append({"date": day, "total": doc.get("total", 0), "counts": counts})
+
+    return {
+        "days": days,
+        "formType": form_type,
+        "series": series,
+        "total": totals.get(key, 0) if key else sum(totals.values()),
+        "totals": totals,
+    }
+
+
+async def rebuild_rollups(database) -> int:
+    """Recompute every rollup from raw submissions, archived ones included, and atomically
+    replace the collection.
+
+    Increments that land while the pipeline runs are overwritten by $out, so run this
+    when submissions are quiet (e.g. right after deploying the rollups).
+    """
+    tenant = {"$ifNull": ["$tenant", tenants.DEFAULT_TENANT]}
+    day = {"$substrBytes": ["$submittedAt", 0, 10]}
+    pipeline = [
+        # Days the archiver has already moved out still count
+        {"$unionWith": archive.ARCHIVE_COLLECTION},
+        {"$match": {"submittedAt": {"$type": "string"}}},
+        {"$group": {
+            "_id": {
+                # tenants.key(): the default tenant's days are bare dates
+                "day": {"$cond": [{"$eq": [tenant, tenants.DEFAULT_TENANT]}, day, {"$concat": [tenant, ":", day]}]},
+                "type": {"$cond": [
+                    {"$regexMatch": {"input": "$formType", "regex": _FORM_TYPE_RE.pattern}},
+                    "$formType",
+                    "other",
+                ]},
+            },
+            "n": {"$sum": 1},
+        }},
+        {"$group": {
+            "_id": "$_id.day",
+            "total": {"$sum": "$n"},
+            "counts": {"$push": {"k": "$_id.type", "v": "$n"}},
+        }},
+        {"$project": {"total": 1, "counts": {"$arrayToObject": "$counts"}}},
+        {"$out": ROLLUP_COLLECTION},
+    ]
+    await database.form_submissions.aggregate(pipeline, allowDiskUse=True).to_list(None)
+    return await database[ROLLUP_COLLECTION].count_documents({})
+
+
+async def _main(argv):
+    if argv[1:] != ['backfill']:
+        print("usage: python analytics.py backfill")
+        return 2
+    from server import get_db
+    days = await rebuild_rollups(get_db())
+    print(f"Rebuilt {days} daily rollups")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(_main(sys.argv)))
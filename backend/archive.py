@@ -0,0 +1,164 @@
+"""Hot/cold tiering for form submissions
+
+Submissions older than SUBMISSION_HOT_DAYS are moved, oldest first and in batches,
+from form_submissions to form_submissions_archive by a background job, so the hot
+collection and its indexes only cover recent history. Each batch is upserted into
+the archive with the submission-write profile before it is deleted from the hot
+collection, so an interrupted run just repeats work on the next one.
+
+Everything in the archive is older than `now - SUBMISSION_HOT_DAYS`, so
+find_submissions() only touches it when the requested range reaches that far back
+and the hot collection didn't already fill the page.
+
+Form types listed in SUBMISSION_TTL (e.g. "contact:90") get an expiresAt field and
+are deleted by a TTL index instead of being kept forever. Both tiers have the TTL
+index, so archiving a submission doesn't extend its retention.
+
+    python archive.py run
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import consistency
+
+logger = logging.getLogger(__name__)
+
+HOT_COLLECTION = 'form_submissions'
+ARCHIVE_COLLECTION = 'form_submissions_archive'
+# Stored for tiering, scoping and expiry; not part of a submission as the API returns it
+INTERNAL_FIELDS = ('_id', 'tenant', 'expiresAt')
+# Unset disables the job, and the archive is never queried
+HOT_DAYS = int(os.environ['SUBMISSION_HOT_DAYS']) if os.environ.get('SUBMISSION_HOT_DAYS') else None
+BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+INTERVAL = int(os.environ.get('ARCHIVE_INTERVAL_SECONDS', 3600))
+
+
+def _parse_ttl(spec: str) -> Dict[str, int]:
+    """"contact:90,newsletter:30" -> {"contact": 90, "newsletter": 30}"""
+    ttl = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        form_type, _, days = item.partition(':')
+        ttl[form_type] = int(days)
+    return ttl
+
+
+TTL_DAYS = _parse_ttl(os.environ.get('SUBMISSION_TTL', ''))
+
+
+def cutoff(now: Optional[datetime] = None) -> Optional[str]:
+    """submittedAt below which submissions belong in the archive"""
+    if HOT_DAYS is None:
+        return None
+    return ((now or datetime.now(timezone.utc)) - timedelta(days=HOT_DAYS)).isoformat()
+
+
+def apply_ttl(doc: dict) -> dict:
+    """Stamp transient form types with the date the TTL index should delete them"""
+    days = TTL_DAYS.get(doc.get('formType'))
+    if days is not None:
+        doc['expiresAt'] = datetime.now(timezone.utc) + timedelta(days=days)
+    return doc
+
+
+async def archive_batch(database, before: str, batch_size: int = BATCH_SIZE) -> int:
+    """Move up to `batch_size` of the oldest submissions older than `before`; returns how many"""
+    from pymongo import ReplaceOne
+
+    hot = database[HOT_COLLECTION]
+    docs = await hot.find({"submittedAt": {"$lt": before}}).sort("submittedAt", 1).limit(batch_size).to_list(batch_size)
+    if not docs:
+        return 0
+    archive = consistency.collection(database, ARCHIVE_COLLECTION, "submission-write")
+    await archive.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs], ordered=False)
+    await hot.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+    return len(docs)
+
+
+async def archive_old_submissions(database, batch_size: int = BATCH_SIZE) -> int:
+    """Move everything past the hot window into the archive, a batch at a time"""
+    before = cutoff()
+    if before is None:
+        return 0
+    moved = 0
+    while True:
+        count = await archive_batch(database, before, batch_size)
+        moved += count
+        if count < batch_size:
+            break
+        await asyncio.sleep(0)  # let request handlers in between batches
+    if moved:
+        logger.info(f"Archived {moved} submissions older than {before}")
+    return moved
+
+
+async def run_forever(database):
+    """Background job: archive every INTERVAL seconds"""
+    while True:
+        try:
+            await archive_old_submissions(database)
+        except Exception as e:
+            logger.error(f"Submission archiving failed: {e}")
+        await asyncio.sleep(INTERVAL)
+
+
+def _date_range(since: Optional[str], until: Optional[str]) -> dict:
+    """submittedAt filter for [since, until]; a date-only `until` includes that whole day"""
+    date_range = {}
+    if since:
+        date_range["$gte"] = since
+    if until:
+        try:
+            date_range["$lt"] = (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+        except ValueError:
+            date_range["$lte"] = until
+    return date_range
+
+
+async def find_submissions(
+    database,
+    query: dict,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 1000,
+) -> List[dict]:
+    """Newest-first submissions matching `query` within [since, until], across both tiers"""
+    query = dict(query)
+    date_range = _date_range(since, until)
+    if date_range:
+        query["submittedAt"] = date_range
+    results = await database[HOT_COLLECTION].find(query).sort("submittedAt", -1).to_list(limit)
+
+    boundary = cutoff()
+    reaches_archive = boundary is not None and (since is None or since < boundary)
+    if reaches_archive and len(results) < limit:
+        older = await database[ARCHIVE_COLLECTION].find(query).sort("submittedAt", -1).to_list(limit - len(results))
+        # A run interrupted mid-batch can leave a document in both tiers until the next run
+        seen = {d["_id"] for d in results}
+        results += [d for d in older if d["_id"] not in seen]
+        results.sort(key=lambda d: d.get("submittedAt", ""), reverse=True)
+    for d in results:
+        for field in INTERNAL_FIELDS:
+            d.pop(field, None)
+    return results[:limit]
+
+
+async def _main(argv):
+    if argv[1:] != ['run']:
+        print("usage: python archive.py run")
+        return 2
+    from server import get_db
+    if HOT_DAYS is None:
+        print("SUBMISSION_HOT_DAYS is not set; nothing to archive")
+        return 1
+    moved = await archive_old_submissions(get_db())
+    print(f"Archived {moved} submissions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(_main(sys.argv)))
@@ -0,0 +1,256 @@
+"""Streaming backup and restore of the site's data
+
+Covers CMS content for every tenant, the tenant registry, form submissions (hot
+and archived), newsletter subscribers and campaigns, queued notifications and
+uploaded media (the GridFS bucket). Derived data - public_site and the
+submission rollups - is rebuilt after a restore rather than backed up.
+
+A backup is one gzip-compressed NDJSON stream, written and read incrementally so
+memory stays bounded whatever the dataset size:
+
+    {"manifest": {"format": "uisn-backup", "version": 1, "createdAt": ..., "collections": [...]}}
+    {"c": "programs", "d": {...document as canonical extended JSON...}}
+    ...
+    {"end": "programs", "count": 4}
+    ...
+
+Usage:
+
+    python backup.py export backup.ndjson.gz
+    python backup.py restore backup.ndjson.gz [--insert]
+
+Restore upserts by _id (or inserts, skipping duplicates, with --insert) in batched
+unordered bulk writes spread over a few concurrent workers, then rebuilds every
+tenant's public_site document and the submission rollups. Running workers pick up
+the restored content, search indexes included, on their next read.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional
+
+from bson import json_util
+from bson.json_util import CANONICAL_JSON_OPTIONS
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+import tenants
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "uisn-backup"
+FORMAT_VERSION = 1
+BACKUP_COLLECTIONS = (
+    "tenants", "programs", "events", "stats", "impact_stories", "about",
+    "announcements", "opportunities", "settings", "form_submissions", "form_submissions_archive",
+    "subscribers", "campaigns", "pending_notifications", "media.files", "media.chunks",
+)
+SINGLETONS = ("about", "settings")
+BATCH_SIZE = 500
+RESTORE_WORKERS = 4
+READ_CHUNK_BYTES = 256 * 1024
+
+
+def _line(obj) -> bytes:
+    return json_util.dumps(obj, json_options=CANONICAL_JSON_OPTIONS).encode() + b"\n"
+
+# ============ EXPORT ============
+
+async def export_stream(database, collections: Iterable[str] = BACKUP_COLLECTIONS) -> AsyncIterator[bytes]:
+    """Yield a gzip-compressed backup one cursor batch at a time"""
+    collections = list(collections)
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31)
+    yield gzip.compress(_line({"manifest": {
+        "format": FORMAT,
+        "version": FORMAT_VERSION,
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "collections": collections,
+    }}))
+    for collection in collections:
+        count = 0
+        buffer = []
+        async for doc in database[collection].find({}).batch_size(BATCH_SIZE):
+            buffer.append(_line({"c": collection, "d": doc}))
+            count += 1
+            if len(buffer) >= BATCH_SIZE:
+                data = gzip.compress(b"".join(buffer))
+                buffer = []
+                if data:
+                    yield data
+        buffer.append(_line({"end": collection, "count": count}))
+        yield gzip.compress(b"".join(buffer))
+        logger.info(f"Exported {count} documents from {collection}")
+    yield gzip.flush()
+
+# ============ RESTORE ============
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    gunzip = zlib.decompressobj(31)
+    pending = b""
+    async for chunk in chunks:
+        pending += gunzip.decompress(chunk)
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line:
+                yield line
+    pending += gunzip.flush()
+    if pending.strip():
+        yield pending
+
+
+async def _write_batch(database, collection: str, docs: list, insert_only: bool) -> int:
+    if insert_only:
+        try:
+            result = await database[collection].insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Duplicates are expected when restoring over existing data; anything else isn't
+            errors = [err for err in e.details["writeErrors"] if err["code"] != 11000]
+            if errors:
+                raise
+            return e.details["nInserted"]
+    if collection in SINGLETONS:
+        # about/settings are read with find_one(tenants.query()) - the restored document
+        # must be the only one for its tenant
+        latest = {doc.get("tenant") or tenants.DEFAULT_TENANT: doc for doc in docs}
+        for tenant, doc in latest.items():
+            await database[collection].delete_many(tenants.query(tenant, _id={"$ne": doc["_id"]}))
+        docs = list(latest.values())
+    result = await database[collection].bulk_write(
+        [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False
+    )
+    return result.upserted_count + result.matched_count
+
+
+async def restore_stream(
+    database,
+    chunks: AsyncIterator[bytes],
+    insert_only: bool = False,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None,
+) -> Dict:
+    """Restore a backup stream. Returns per-collection counts and any manifest mismatches."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=RESTORE_WORKERS * 2)
+    written: Dict[str, int] = {}
+    expected: Dict[str, int] = {}
+    errors = []
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            try:
+                if item is None:
+                    return
+                if errors:
+                    continue  # keep draining so the reader never blocks on a full queue
+                collection, docs = item
+                written[collection] = written.get(collection, 0) + await _write_batch(
+                    database, collection, docs, insert_only
+                )
+                if progress:
+                    progress(dict(written))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(RESTORE_WORKERS)]
+    try:
+        manifest = None
+        batches: Dict[str, list] = {}
+        async for raw in _lines(chunks):
+            record = json_util.loads(raw)
+            if manifest is None:
+                manifest = record.get("manifest")
+                if not manifest or manifest.get("format") != FORMAT:
+                    raise ValueError("Not a UISN backup stream")
+                if manifest.get("version", 0) > FORMAT_VERSION:
+                    raise ValueError(f"Backup format version {manifest['version']} is newer than supported")
+                continue
+            if "end" in record:
+                collection = record["end"]
+                expected[collection] = record["count"]
+                if batches.get(collection):
+                    await queue.put((collection, batches.pop(collection)))
+                continue
+            batch = batches.setdefault(record["c"], [])
+            batch.append(record["d"])
+            if len(batch) >= BATCH_SIZE:
+                await queue.put((record["c"], batches.pop(record["c"])))
+        for collection, batch in batches.items():
+            if batch:
+                await queue.put((collection, batch))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        if errors:
+            raise errors[0]
+    finally:
+        for w in workers:
+            w.cancel()
+
+    mismatched = {c: {"expected": n, "restored": written.get(c, 0)} for c, n in expected.items() if written.get(c, 0) != n}
+    return {"restored": written, "expected": expected, "mismatched": mismatched}
+
+# ============ CLI ============
+
+async def _file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = await asyncio.to_thread(f.read, READ_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def _main(argv):
+    if len(argv) < 3 or argv[1] not in ("export", "restore"):
+        print("usage: python backup.py export FILE | restore FILE [--insert]")
+        return 2
+    from server import get_db
+    logging.basicConfig(level=logging.INFO)
+    database = get_db()
+    started = time.monotonic()
+
+    if argv[1] == "export":
+        size = 0
+        with open(argv[2], "wb") as out:
+            async for chunk in export_stream(database):
+                size += len(chunk)
+                await asyncio.to_thread(out.write, chunk)
+        print(f"Wrote {size:,} bytes to {argv[2]} in {time.monotonic() - started:.1f}s")
+        return 0
+
+    last = [0.0]
+
+    def report(counts):
+        if time.monotonic() - last[0] >= 1:
+            last[0] = time.monotonic()
+            print(f"  restored {sum(counts.values()):,} documents", flush=True)
+
+    result = await restore_stream(database, _file_chunks(argv[2]), insert_only="--insert" in argv, progress=report)
+    print(f"Restored {sum(result['restored'].values()):,} documents in {time.monotonic() - started:.1f}s")
+    for collection, count in sorted(result["restored"].items()):
+        print(f"  {collection}: {count}")
+
+    # Derived data: every tenant's materialized public payload and the submission rollups
+    from server import rebuild_public_site
+    import analytics
+    for tenant in [tenants.DEFAULT_TENANT] + await database[tenants.TENANTS_COLLECTION].distinct("_id"):
+        token = tenants.current.set(tenant)
+        try:
+            await rebuild_public_site()
+        finally:
+            tenants.current.reset(token)
+    await analytics.rebuild_rollups(database)
+    if result["mismatched"]:
+        print(f"Count mismatches: {result['mismatched']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv)))
@@ -0,0 +1,147 @@
+"""Cold-start benchmark: process start to first /api/health and /api/cms/all
+
+Starts uvicorn the way Railway does, polls each endpoint until it answers 200,
+and repeats that --runs times. Then breaks `import server` down by module with
+`python -X importtime`. A module is charged to the first import that pulled it
+in, so moving an import elsewhere shows up as a shift between rows.
+
+    cd backend && python benchmarks/cold_start_bench.py
+    cd backend && python benchmarks/cold_start_bench.py --runs 10 --budget-ms 2000 --json
+
+MONGO_URL / DB_NAME come from the environment and default to a local mongod.
+Without a reachable Mongo, /api/cms/all still answers if a public site snapshot
+exists at SNAPSHOT_PATH. With --budget-ms the script exits non-zero when the
+median time to /api/cms/all is over budget, so a CI job can catch regressions.
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+POLL_INTERVAL = 0.005
+TIMEOUT = 60
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    env.setdefault('DB_NAME', 'cold_start_bench')
+    env.setdefault('LOG_ACCESS', 'false')
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    return env
+
+
+def _wait_for(url: str, started: float) -> float:
+    """Seconds from `started` until `url` answers 200"""
+    while time.perf_counter() - started < TIMEOUT:
+        try:
+            with urllib.request.urlopen(url, timeout=TIMEOUT) as response:
+                if response.status == 200:
+                    response.read()
+                    return time.perf_counter() - started
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(POLL_INTERVAL)
+    raise TimeoutError(f"{url} did not answer within {TIMEOUT}s")
+
+
+def measure_once(env: dict) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        health = _wait_for(f"{base}/api/health", started)
+        cms_all = _wait_for(f"{base}/api/cms/all", started)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"health": health * 1000, "cmsAll": cms_all * 1000}
+
+
+def import_breakdown(env: dict, top: int) -> dict:
+    """Cumulative import time (ms) of `server` and of each module it imports directly"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, name.strip(), int(cumulative) / 1000))
+    end = next(i for i, (_, name, _) in enumerate(rows) if name == "server")
+    server_depth, _, total = rows[end]
+    # importtime prints children before their parent: server's imports are the rows since
+    # the previous top-level import (interpreter startup imports come before that)
+    start = end
+    while start > 0 and rows[start - 1][0] > server_depth:
+        start -= 1
+    children = sorted(
+        ((name, ms) for depth, name, ms in rows[start:end] if depth == server_depth + 1),
+        key=lambda row: row[1], reverse=True,
+    )
+    return {"total": total, "modules": dict(children[:top])}
+
+
+def _summary(values) -> dict:
+    return {"median": statistics.median(values), "min": min(values), "max": max(values)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="modules to list in the import breakdown")
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail if median time to /api/cms/all exceeds this")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    env = _env()
+    runs = [measure_once(env) for _ in range(args.runs)]
+    results = {
+        "runs": args.runs,
+        "health": _summary([r["health"] for r in runs]),
+        "cmsAll": _summary([r["cmsAll"] for r in runs]),
+        "imports": import_breakdown(env, args.top),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"Cold start over {args.runs} runs (ms)     median      min      max")
+        for key, label in (("health", "first /api/health"), ("cmsAll", "first /api/cms/all")):
+            s = results[key]
+            print(f"  {label:<30}{s['median']:>10.0f}{s['min']:>9.0f}{s['max']:>9.0f}")
+        print(f"\nimport server: {results['imports']['total']:.0f} ms, largest direct imports:")
+        for name, ms in results["imports"]["modules"].items():
+            print(f"  {name:<32}{ms:>8.1f}")
+
+    median = results["cmsAll"]["median"]
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"\nFAIL: median time to /api/cms/all {median:.0f} ms exceeds budget {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
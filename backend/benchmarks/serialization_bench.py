@@ -0,0 +1,77 @@
+"""Micro-benchmark: response_model serialization vs the raw orjson fast path
+
+Runs each path over synthetic Program and Event collections of 100 and 10,000
+documents, exactly as a read handler would see them from Mongo. No database needed:
+
+    cd backend && python benchmarks/serialization_bench.py
+"""
+
+import asyncio
+import os
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'bench')
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+import serialization  # noqa: E402
+from server import Event, Program  # noqa: E402
+
+SIZES = (100, 10_000)
+
+
+def make_programs(n):
+    return [
+        {
+            "id": str(i), "title": f"Program {i}", "description": "Start an official UISN chapter on your campus. " * 3,
+            "frequency": "Year-round", "location": "Your Campus", "impact": "Statewide network",
+            "icon": "GraduationCap", "color": "secondary", "active": True, "slug": f"program-{i}",
+        }
+        for i in range(n)
+    ]
+
+
+def make_events(n):
+    return [
+        {
+            "id": str(i), "title": f"Service Day {i}", "date": "2026-03-15", "time": "9:00 AM - 3:00 PM",
+            "location": "Salt Lake City", "description": "Join us for our service day! " * 4,
+            "registrationLink": "#", "image": None, "active": True,
+        }
+        for i in range(n)
+    ]
+
+
+def model_path(field, docs):
+    """What FastAPI does for response_model=List[Model]: validate, serialize, json.dumps"""
+    content = asyncio.run(serialize_response(field=field, response_content=docs))
+    return JSONResponse(content).body
+
+
+def fast_path(model, docs):
+    """What respond() does: project onto the model's fields, then dump"""
+    return serialization.dumps(serialization.project(docs, model))
+
+
+def bench(label, model, factory):
+    field = create_model_field(name="Response", type_=List[model], mode="serialization")
+    for n in SIZES:
+        docs = factory(n)
+        number = max(1, 2000 // n)
+        slow = min(timeit.repeat(lambda: model_path(field, docs), number=number, repeat=5)) / number
+        fast = min(timeit.repeat(lambda: fast_path(model, docs), number=number, repeat=5)) / number
+        print(f"{label:<8} {n:>6} docs   response_model {slow * 1000:9.3f} ms   "
+              f"fast path {fast * 1000:8.3f} ms   {slow / fast:6.1f}x")
+
+
+if __name__ == '__main__':
+    print(f"encoder: {'orjson' if serialization.orjson else 'json (orjson not installed)'}")
+    bench("programs", Program, make_programs)
+    bench("events", Event, make_events)
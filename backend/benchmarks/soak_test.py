@@ -0,0 +1,392 @@
+"""Soak test: sustained mixed traffic against an in-process server, watching for leaks
+
+Runs the app under uvicorn inside this process, with a local SMTP sink standing
+in for Gmail. Worker coroutines keep up a weighted mix of public reads, page and
+feed requests, searches, form submissions and admin writes for --duration
+seconds. Every --interval seconds it samples:
+
+    rssMb            resident set size of the process
+    tracedMb         memory currently allocated by Python (tracemalloc)
+    tasks            live asyncio tasks (workers + server + background work)
+    backgroundTasks  tasks held by server.spawn()
+    pendingEmails    notification emails waiting for an SMTP slot
+    threads          OS threads (asyncio.to_thread workers, Motor monitors)
+    poolCheckedOut   Mongo connections checked out of the Motor pool
+    poolOpen         Mongo connections open
+
+After a warm-up (the first --warmup fraction of samples), a metric whose samples
+keep rising by more than its threshold is flagged as growth. The top tracemalloc
+allocators by growth over the same window are printed too. The exit status is 1
+if anything was flagged.
+
+    cd backend && python benchmarks/soak_test.py --duration 600
+    cd backend && python benchmarks/soak_test.py --duration 120 --smtp-delay 2 --output soak.json
+
+Needs a local mongod at SOAK_MONGO_URL (default mongodb://localhost:27017; MONGO_URL
+and DB_NAME are deliberately ignored so this never runs against a deployment). Each
+run uses a freshly named soak_* database, dropped afterwards unless --keep-db is given.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import socketserver
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+MONGO_URL = os.environ.get('SOAK_MONGO_URL', 'mongodb://localhost:27017')
+
+# metric -> net rise after warm-up that counts as growth
+GROWTH_THRESHOLDS = {
+    "rssMb": 10.0,
+    "tracedMb": 2.0,
+    "tasks": 5,
+    "backgroundTasks": 5,
+    "pendingEmails": 5,
+    "threads": 2,
+    "poolCheckedOut": 2,
+    "poolOpen": 2,
+}
+# Fraction of steps after warm-up that must not go down for a rise to count as monotonic
+MONOTONIC_FRACTION = 0.9
+
+# ============ SMTP SINK ============
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Accepts any mail, optionally slowly, and counts it"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 soak sink")
+        while True:
+            line = self.rfile.readline().decode(errors="replace").strip()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == "DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline().rstrip(b"\r\n") != b".":
+                    pass
+                time.sleep(self.server.delay)
+                self.server.messages += 1
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay: float):
+        super().__init__(("127.0.0.1", 0), _SinkHandler)
+        self.delay = delay
+        self.messages = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+# ============ MONGO POOL ============
+
+def _pool_listener():
+    """CMAP listener counting open and checked-out connections across Motor's pools"""
+    from pymongo import monitoring
+
+    class PoolCounts(monitoring.ConnectionPoolListener):
+        def __init__(self):
+            self.open = 0
+            self.checked_out = 0
+
+        def connection_created(self, event):
+            self.open += 1
+
+        def connection_closed(self, event):
+            self.open -= 1
+
+        def connection_checked_out(self, event):
+            self.checked_out += 1
+
+        def connection_checked_in(self, event):
+            self.checked_out -= 1
+
+        def pool_created(self, event): pass
+        def pool_ready(self, event): pass
+        def pool_cleared(self, event): pass
+        def pool_closed(self, event): pass
+        def connection_ready(self, event): pass
+        def connection_check_out_started(self, event): pass
+        def connection_check_out_failed(self, event): pass
+
+    listener = PoolCounts()
+    monitoring.register(listener)
+    return listener
+
+# ============ SAMPLING ============
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Not Linux: peak rather than current RSS (kilobytes on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def take_sample(started: float, server, pool, requests: Counter) -> dict:
+    return {
+        "t": round(time.monotonic() - started, 1),
+        "rssMb": round(_rss_mb(), 1),
+        "tracedMb": round(tracemalloc.get_traced_memory()[0] / 2**20, 2) if tracemalloc.is_tracing() else None,
+        "tasks": len(asyncio.all_tasks()),
+        "backgroundTasks": len(server._background_tasks),
+        "pendingEmails": server._pending_emails,
+        "threads": threading.active_count(),
+        "poolCheckedOut": pool.checked_out,
+        "poolOpen": pool.open,
+        "requests": sum(requests.values()),
+    }
+
+
+def find_growth(samples: list, warmup: float) -> dict:
+    """metric -> {rise, perMinute} for metrics that rose (almost) monotonically past their threshold"""
+    window = samples[int(len(samples) * warmup):]
+    if len(window) < 3:
+        return {}
+    flagged = {}
+    for metric, threshold in GROWTH_THRESHOLDS.items():
+        values = [s[metric] for s in window if s[metric] is not None]
+        if len(values) < 3:
+            continue
+        steps = [b - a for a, b in zip(values, values[1:])]
+        rise = values[-1] - values[0]
+        if rise > threshold and sum(step >= 0 for step in steps) >= MONOTONIC_FRACTION * len(steps):
+            minutes = (window[-1]["t"] - window[0]["t"]) / 60 or 1
+            flagged[metric] = {"rise": round(rise, 2), "perMinute": round(rise / minutes, 2)}
+    return flagged
+
+
+def top_allocators(baseline, limit: int = 10) -> list:
+    if baseline is None or not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().compare_to(baseline, "lineno")
+    return [
+        {"where": str(stat.traceback[0]), "growthKb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+        for stat in stats[:limit]
+    ]
+
+# ============ TRAFFIC ============
+
+SLUGS = ("create-chapter", "service-event", "join-network", "leadership")
+FORM_TYPES = ("volunteer", "contact", "newsletter", "partner")
+
+
+def _submission():
+    form_type = random.choice(FORM_TYPES)
+    return {
+        "formType": form_type,
+        "data": {
+            "name": "Soak Test", "email": f"soak{random.randrange(10**6)}@example.edu",
+            "subject": "Soak", "message": "Sustained traffic", "availability": ["Weekends"],
+        },
+    }
+
+
+def _announcement(i: int):
+    return {
+        "id": "soak-announcement", "title": f"Soak announcement {i}", "content": "Updated by the soak test",
+        "date": "2026-01-01", "priority": "low", "active": True,
+    }
+
+
+# (weight, method, path or callable, body factory)
+MIX = (
+    (30, "GET", "/api/cms/all", None),
+    (10, "GET", "/api/cms/programs", None),
+    (10, "GET", "/api/cms/events", None),
+    (5, "GET", "/api/cms/events.ics", None),
+    (8, "GET", lambda: f"/program/{random.choice(SLUGS)}", None),
+    (3, "GET", "/sitemap.xml", None),
+    (8, "GET", lambda: f"/api/search?q={random.choice(('service', 'chapter', 'event', 'utah'))}", None),
+    (8, "GET", "/api/t/soak/cms/all", None),
+    (10, "POST", "/api/forms/submit", _submission),
+    (3, "GET", "/api/admin/summary", None),
+    (2, "GET", "/api/analytics/submissions?days=7", None),
+    (1, "PUT", "/api/cms/announcements/soak-announcement", lambda: _announcement(random.randrange(10**6))),
+)
+
+
+async def worker(client, deadline: float, requests: Counter, latencies: list):
+    weights = [w for w, *_ in MIX]
+    while time.monotonic() < deadline:
+        _, method, path, body = random.choices(MIX, weights)[0]
+        path = path() if callable(path) else path
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body() if body else None)
+            requests[response.status_code] += 1
+        except Exception as e:
+            requests[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+        if len(latencies) > 100_000:
+            del latencies[:50_000]
+
+# ============ RUN ============
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def soak(args) -> dict:
+    import httpx
+    import uvicorn
+
+    pool = _pool_listener()
+    import server  # after the environment and pool listener are in place
+
+    port = _free_port()
+    uv = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_config=None, access_log=False))
+    serving = asyncio.create_task(uv.serve())
+    while not uv.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.05)
+
+    requests: Counter = Counter()
+    latencies: list = []
+    samples = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        (await client.post("/api/cms/initialize")).raise_for_status()
+        await client.post("/api/tenants", json={"id": "soak", "name": "Soak Test Chapter"})
+        await client.post("/api/cms/announcements", json=_announcement(0))
+
+        started = time.monotonic()
+        deadline = started + args.duration
+        workers = [asyncio.create_task(worker(client, deadline, requests, latencies)) for _ in range(args.concurrency)]
+        baseline = None
+        next_sample = started
+        while time.monotonic() < deadline:
+            await asyncio.sleep(max(0.0, next_sample - time.monotonic()))
+            next_sample += args.interval
+            samples.append(take_sample(started, server, pool, requests))
+            if baseline is None and len(samples) > args.duration / args.interval * args.warmup and tracemalloc.is_tracing():
+                baseline = tracemalloc.take_snapshot()
+            if not args.quiet:
+                print(json.dumps(samples[-1]), flush=True)
+        await asyncio.gather(*workers)
+
+    # Let spawned work (emails, rebuilds, purges) finish before the last sample
+    for _ in range(int(args.drain / 0.1)):
+        if not server._background_tasks:
+            break
+        await asyncio.sleep(0.1)
+    samples.append(take_sample(started, server, pool, requests))
+
+    uv.should_exit = True
+    await serving
+    return {
+        "durationSeconds": args.duration,
+        "concurrency": args.concurrency,
+        "requests": dict(requests),
+        "latencyMs": {
+            "p50": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+            "p99": round(sorted(latencies)[int(len(latencies) * 0.99)] * 1000, 1) if latencies else None,
+        },
+        "emailsDelivered": args.sink.messages,
+        "serverEmailStats": dict(server.email_stats),
+        "samples": samples,
+        "growth": find_growth(samples, args.warmup),
+        "topAllocators": top_allocators(baseline),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=300, help="seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client workers")
+    parser.add_argument("--interval", type=float, default=10, help="seconds between samples")
+    parser.add_argument("--warmup", type=float, default=0.2, help="fraction of samples ignored for growth checks")
+    parser.add_argument("--drain", type=float, default=30, help="seconds to wait for background tasks at the end")
+    parser.add_argument("--smtp-delay", type=float, default=0.0, help="seconds the SMTP sink takes per message")
+    parser.add_argument("--trace-frames", type=int, default=1, help="tracemalloc frames per allocation; 0 disables it")
+    parser.add_argument("--output", help="write the full report as JSON to this file")
+    parser.add_argument("--keep-db", action="store_true", help="don't drop the scratch database")
+    parser.add_argument("--quiet", action="store_true", help="don't print samples as they're taken")
+    args = parser.parse_args(argv)
+
+    from pymongo import MongoClient
+    with MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000) as client:
+        existing = set(client.list_database_names())
+    db_name = f"soak_{uuid.uuid4().hex[:8]}"
+    if db_name in existing:
+        print(f"Database {db_name} already exists; not touching it", file=sys.stderr)
+        return 2
+
+    args.sink = SmtpSink(args.smtp_delay)
+    os.environ.update({
+        "MONGO_URL": MONGO_URL,
+        "DB_NAME": db_name,
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(args.sink.server_address[1]),
+        "SMTP_STARTTLS": "false",
+        "GMAIL_APP_PASSWORD": "",
+        "SNAPSHOT_PATH": str(Path(tempfile.mkdtemp(prefix="soak")) / "public_site.snapshot.json"),
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LOG_ACCESS", "false")
+    if args.trace_frames > 0:
+        tracemalloc.start(args.trace_frames)
+
+    try:
+        report = asyncio.run(soak(args))
+    finally:
+        if not args.keep_db:
+            with MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000) as client:
+                client.drop_database(db_name)
+        args.sink.shutdown()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"\n{sum(report['requests'].values())} requests in {args.duration:.0f}s: {report['requests']}")
+    print(f"latency p50 {report['latencyMs']['p50']} ms, p99 {report['latencyMs']['p99']} ms; "
+          f"emails delivered {report['emailsDelivered']} {report['serverEmailStats']}")
+    first, last = report["samples"][0], report["samples"][-1]
+    for metric in GROWTH_THRESHOLDS:
+        print(f"  {metric:<16}{first[metric]!s:>10} -> {last[metric]!s:<10}")
+    if report["topAllocators"]:
+        print("\nTop allocators since warm-up:")
+        for row in report["topAllocators"]:
+            print(f"  {row['growthKb']:>10.1f} KiB {row['count']:>+8}  {row['where']}")
+    if report["growth"]:
+        print("\nGROWTH:")
+        for metric, growth in report["growth"].items():
+            print(f"  {metric} rose {growth['rise']} ({growth['perMinute']}/min)")
+        return 1
+    print("\nNo monotonic growth detected")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Per-route HTTP cache policy and CDN purge hook
+
+Public CMS reads get a short browser max-age, a longer shared-cache s-maxage and
+stale-while-revalidate, and a Surrogate-Key header naming the collections they
+were built from. Admin, submission and diagnostic routes are never cached. When a
+write handler commits, purge() asks the CDN to drop everything tagged with that
+collection, so edges can cache aggressively and still update within seconds.
+
+Edges only get the long s-maxage when CDN_PURGE_URL is set; without a purge hook
+nothing would evict them. The per-collection endpoints are also what the admin
+screens re-read straight after a write, so browsers always revalidate those.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE = int(os.environ.get('CACHE_MAX_AGE', 60))
+PURGE_URL = os.environ.get('CDN_PURGE_URL', '')
+PURGE_TOKEN = os.environ.get('CDN_PURGE_TOKEN', '')
+EDGE_MAX_AGE = int(os.environ.get('CACHE_EDGE_MAX_AGE', 3600 if PURGE_URL else MAX_AGE))
+STALE_WHILE_REVALIDATE = int(os.environ.get('CACHE_STALE_WHILE_REVALIDATE', 600))
+STALE_IF_ERROR = int(os.environ.get('CACHE_STALE_IF_ERROR', 86400))
+
+PUBLIC = (
+    f"public, max-age={MAX_AGE}, s-maxage={EDGE_MAX_AGE}, "
+    f"stale-while-revalidate={STALE_WHILE_REVALIDATE}, stale-if-error={STALE_IF_ERROR}"
+)
+# Read back by the admin screens after every write: edges may keep it until purged, browsers may not
+EDITABLE = (
+    f"public, max-age=0, s-maxage={EDGE_MAX_AGE}, stale-if-error={STALE_IF_ERROR}" if PURGE_URL else "no-cache"
+)
+# Search results are derived from everything and keyed by arbitrary query strings
+SHORT = f"public, max-age={MAX_AGE}, stale-while-revalidate={STALE_WHILE_REVALIDATE}"
+# Served from the local snapshot while Mongo is unreachable - don't let edges keep it
+REVALIDATE = "no-cache"
+NO_STORE = "no-store"
+
+PUBLIC_COLLECTIONS = ("programs", "events", "stats", "impact_stories", "about", "announcements", "opportunities")
+SEARCHABLE = ("programs", "events", "announcements", "opportunities")
+
+# (path pattern, Cache-Control, surrogate keys); first match wins. Unlisted routes are no-store.
+_RULES: Tuple[Tuple[re.Pattern, str, Tuple[str, ...]], ...] = tuple(
+    (re.compile(pattern), cache_control, keys)
+    for pattern, cache_control, keys in (
+        (r"^/api/cms/all$", PUBLIC, PUBLIC_COLLECTIONS),
+        (r"^/api/cms/impact-stories$", EDITABLE, ("impact_stories",)),
+        (r"^/api/cms/events\.ics$", PUBLIC, ("events",)),
+        (r"^/api/cms/settings$", EDITABLE, ("settings",)),
+        (r"^/api/cms/(programs|events|stats|about|announcements|opportunities)$", EDITABLE, None),
+        (r"^/api/search$", SHORT, SEARCHABLE),
+        (r"^/program/[^/]+$", PUBLIC, ("programs",)),
+        (r"^/event/[^/]+$", PUBLIC, ("events",)),
+        (r"^/sitemap\.xml$", PUBLIC, ("programs", "events")),
+    )
+)
+
+
+def policy_for(method: str, path: str) -> Tuple[str, Tuple[str, ...]]:
+    """Cache-Control value and surrogate keys for a request"""
+    if method not in ('GET', 'HEAD'):
+        return NO_STORE, ()
+    for pattern, cache_control, keys in _RULES:
+        match = pattern.match(path)
+        if match:
+            return cache_control, keys if keys is not None else (match.group(1),)
+    return NO_STORE, ()
+
+
+def apply(method: str, path: str, status_code: int, headers, key_prefix: str = '') -> None:
+    """Set caching headers on an outgoing response, leaving handler-set Cache-Control alone.
+
+    `key_prefix` namespaces the surrogate keys per tenant, so a chapter's write
+    only purges that chapter's responses.
+    """
+    if 'cache-control' in headers:
+        return
+    cache_control, keys = policy_for(method, path)
+    if status_code >= 400:
+        cache_control, keys = NO_STORE, ()
+    elif cache_control != NO_STORE and 'x-served-from' in headers:
+        cache_control = REVALIDATE
+    headers['Cache-Control'] = cache_control
+    if keys:
+        headers['Surrogate-Key'] = " ".join(f"{key_prefix}{key}" for key in keys)
+
+
+def _post_purge(keys: list):
+    import urllib.request
+    body = json.dumps({"surrogate_keys": keys}).encode()
+    request = urllib.request.Request(PURGE_URL, data=body, method='POST', headers={"Content-Type": "application/json"})
+    if PURGE_TOKEN:
+        request.add_header("Authorization", f"Bearer {PURGE_TOKEN}")
+    with urllib.request.urlopen(request, timeout=10) as response:
+        response.read()
+
+
+async def purge(keys: Iterable[str]) -> Optional[bool]:
+    """Ask the CDN to drop responses tagged with any of `keys`; no-op unless CDN_PURGE_URL is set"""
+    if not PURGE_URL:
+        return None
+    keys = sorted(set(keys))
+    try:
+        await asyncio.to_thread(_post_purge, keys)
+    except Exception as e:
+        logger.warning(f"CDN purge of {keys} failed: {e}")
+        return False
+    logger.info(f"Purged CDN surrogate keys {keys}")
+    return True
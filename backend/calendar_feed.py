@@ -0,0 +1,229 @@
+"""iCalendar (RFC 5545) feed of active events
+
+Event dates and times are free-form strings typed into the admin form, e.g.
+"2026-03-15" / "9:00 AM - 3:00 PM", "March 15, 2026" / "6pm", or no time at all.
+parse_when() turns them into a start and end, in EVENTS_TIMEZONE converted to
+UTC, or all-day dates when no time is given. Events whose date can't be parsed
+are left out of the feed rather than guessed.
+
+The rendered feed is cached against the public site version and only re-rendered
+when the events themselves changed, so calendar clients polling every few minutes
+mostly get a 304.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from email.utils import format_datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TIMEZONE_NAME = os.environ.get('EVENTS_TIMEZONE', 'America/Denver')
+DEFAULT_DURATION = timedelta(hours=int(os.environ.get('EVENT_DEFAULT_DURATION_HOURS', 2)))
+SITE_URL = os.environ.get('SITE_URL', '').rstrip('/')
+UID_DOMAIN = os.environ.get('CALENDAR_UID_DOMAIN', 'uisn.org')
+CALENDAR_NAME = "UISN Events"
+
+try:
+    from zoneinfo import ZoneInfo
+    LOCAL_TZ = ZoneInfo(TIMEZONE_NAME)
+except Exception as e:  # no tz database on this host: emit floating local times
+    logger.warning(f"Time zone {TIMEZONE_NAME} unavailable ({e}); calendar times will be floating")
+    LOCAL_TZ = None
+
+_DATE_FORMATS = (
+    "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%B %d, %Y", "%b %d, %Y", "%B %d %Y", "%b %d %Y",
+    "%A, %B %d, %Y", "%a, %b %d, %Y", "%d %B %Y", "%d %b %Y",
+)
+_YEARLESS_FORMATS = ("%B %d", "%b %d", "%m/%d")
+_ORDINAL_RE = re.compile(r"(\d)(st|nd|rd|th)\b", re.I)
+_TIME_RE = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*([ap])?\.?\s*m?\.?(?![a-z])", re.I)
+_NOON_MIDNIGHT = {"noon": time(12), "midnight": time(0)}
+
+
+def parse_date(text: str, today: Optional[date] = None) -> Optional[date]:
+    """A calendar date from a free-form string; yearless dates take their next occurrence"""
+    text = _ORDINAL_RE.sub(r"\1", (text or '').strip())
+    # "March 15-16, 2026" / "2026-03-15 to 2026-03-16": the feed uses the first day
+    text = re.sub(r"^(\w+ \d{1,2})\s*[-–]\s*\d{1,2}(,? \d{4})$", r"\1\2", text)
+    text = re.split(r"\s+(?:to|through|[-–])\s+", text)[0]
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    today = today or date.today()
+    for fmt in _YEARLESS_FORMATS:
+        try:
+            parsed = datetime.strptime(f"{text} {today.year}", f"{fmt} %Y").date()
+        except ValueError:
+            continue
+        return parsed if parsed >= today else parsed.replace(year=today.year + 1)
+    return None
+
+
+def parse_times(text: str) -> Tuple[Optional[time], Optional[time]]:
+    """Start and end time from strings like "9:00 AM - 3:00 PM", "6-8pm", "18:30", "Noon"."""
+    text = (text or '').strip().lower()
+    if not text or text in ("tbd", "tba", "all day", "all-day"):
+        return None, None
+    found = []
+    for word, value in _NOON_MIDNIGHT.items():
+        if word in text:
+            found.append((text.index(word), value.hour, value.minute, None))
+    for match in _TIME_RE.finditer(text):
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+        if hour > 23 or minute > 59:
+            continue
+        found.append((match.start(), hour, minute, meridiem.lower() if meridiem else None))
+    found.sort()
+    if not found:
+        return None, None
+    found = found[:2]
+    # "6-8pm" / "9:00 - 11:30 AM": a bare start borrows the end's meridiem
+    if len(found) == 2 and found[0][3] is None and found[1][3] is not None:
+        start_hour = found[0][1]
+        borrowed = found[1][3]
+        if borrowed == 'p' and start_hour > found[1][1] % 12 and start_hour != 12:
+            borrowed = 'a'  # "11-1pm" starts in the morning
+        found[0] = (found[0][0], start_hour, found[0][2], borrowed)
+
+    def to_time(hour, minute, meridiem):
+        if meridiem == 'p' and hour < 12:
+            hour += 12
+        elif meridiem == 'a' and hour == 12:
+            hour = 0
+        elif meridiem is None and 1 <= hour <= 6:
+            hour += 12  # a bare "6" on a volunteer event means the evening
+        return time(hour % 24, minute)
+
+    times = [to_time(h, m, mer) for _, h, m, mer in found]
+    return times[0], times[1] if len(times) > 1 else None
+
+
+def parse_when(event: dict) -> Optional[Tuple[object, object, bool]]:
+    """(start, end, all_day) for an event, or None if its date can't be read"""
+    day = parse_date(event.get("date"))
+    if day is None:
+        return None
+    start_time, end_time = parse_times(event.get("time"))
+    if start_time is None:
+        return day, day + timedelta(days=1), True
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time) if end_time else start + DEFAULT_DURATION
+    if end <= start:
+        end += timedelta(days=1)  # "8 PM - 1 AM"
+    if LOCAL_TZ is not None:
+        start = start.replace(tzinfo=LOCAL_TZ).astimezone(timezone.utc)
+        end = end.replace(tzinfo=LOCAL_TZ).astimezone(timezone.utc)
+    return start, end, False
+
+# ============ RENDERING ============
+
+def _escape(text) -> str:
+    return (str(text or '').replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Lines longer than 75 octets continue on the next line after a space"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        cut = 75 if not parts else 74
+        # Don't split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts)
+
+
+def _stamp(value) -> str:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.strftime("%Y%m%dT%H%M%S")
+        return value.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return value.strftime("%Y%m%d")
+
+
+def _updated(event: dict) -> Optional[datetime]:
+    try:
+        updated = datetime.fromisoformat(event["updatedAt"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return updated if updated.tzinfo else updated.replace(tzinfo=timezone.utc)
+
+
+def render_calendar(events: List[dict], now: Optional[datetime] = None) -> str:
+    now = now or datetime.now(timezone.utc)
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//UISN//Events//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(CALENDAR_NAME)}",
+        f"X-WR-TIMEZONE:{TIMEZONE_NAME}",
+        "REFRESH-INTERVAL;VALUE=DURATION:PT1H",
+        "X-PUBLISHED-TTL:PT1H",
+    ]
+    for event in events:
+        if not event.get("active", True):
+            continue
+        when = parse_when(event)
+        if when is None:
+            logger.debug(f"Skipping event {event.get('id')} with unparseable date {event.get('date')!r}")
+            continue
+        start, end, all_day = when
+        updated = _updated(event) or now
+        value = ";VALUE=DATE" if all_day else ""
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:event-{_escape(event['id'])}@{UID_DOMAIN}",
+            f"DTSTAMP:{_stamp(updated)}",
+            f"LAST-MODIFIED:{_stamp(updated)}",
+            f"DTSTART{value}:{_stamp(start)}",
+            f"DTEND{value}:{_stamp(end)}",
+            f"SUMMARY:{_escape(event.get('title'))}",
+            f"LOCATION:{_escape(event.get('location'))}",
+            f"DESCRIPTION:{_escape(event.get('description'))}",
+        ]
+        if SITE_URL:
+            lines.append(f"URL:{SITE_URL}/event/{event['id']}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
+# ============ CACHE ============
+
+class FeedCache:
+    """The rendered feed, re-rendered only when the events in a new site version differ"""
+
+    def __init__(self):
+        self.version = None
+        self.events_key = None
+        self.body = ''
+        self.etag = ''
+        self.last_modified = ''
+
+    def get(self, version, events: List[dict]) -> Dict[str, str]:
+        if version != self.version or not self.body:
+            key = hashlib.sha256(json.dumps(events, sort_keys=True, default=str).encode()).hexdigest()[:32]
+            if key != self.events_key:
+                self.body = render_calendar(events)
+                self.etag = f'"{key}"'
+                newest = max((u for u in map(_updated, events) if u), default=datetime.now(timezone.utc))
+                self.last_modified = format_datetime(newest.astimezone(timezone.utc), usegmt=True)
+                self.events_key = key
+            self.version = version
+        return {"body": self.body, "etag": self.etag, "last_modified": self.last_modified}
+
+
+feed = FeedCache()
@@ -0,0 +1,82 @@
+"""Named durability / latency profiles for collection access
+
+The client default (w=1, no journal) is the right trade-off for CMS content, which
+can always be re-entered, but not for volunteer registrations, and it pins every
+read to the primary. Handlers ask for a collection through a profile instead:
+
+    content-read      public CMS reads: nearest-secondary, bounded staleness
+    content-write     CMS writes and read-your-writes rebuilds: primary, w=1
+    submission-write  form submissions: majority, journaled
+    analytics-read    dashboards over rollups: secondary, looser staleness
+
+On a standalone mongod the read preferences fall back to the only node and
+majority is that node, so the profiles are safe in development too.
+"""
+
+import os
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+
+# maxStalenessSeconds must be at least 90 (heartbeatFrequencyMS + idle write period)
+CONTENT_MAX_STALENESS = max(90, int(os.environ.get('CONTENT_MAX_STALENESS_SECONDS', 90)))
+ANALYTICS_MAX_STALENESS = max(90, int(os.environ.get('ANALYTICS_MAX_STALENESS_SECONDS', 300)))
+SUBMISSION_WTIMEOUT_MS = int(os.environ.get('SUBMISSION_WTIMEOUT_MS', 5000))
+
+
+class Profile(NamedTuple):
+    read_preference: Optional[object] = None
+    read_concern: Optional[object] = None
+    write_concern: Optional[object] = None
+
+
+@lru_cache(maxsize=None)
+def profiles() -> Dict[str, Profile]:
+    """Built on first use so importing this module doesn't load pymongo"""
+    from pymongo import ReadPreference
+    from pymongo.read_concern import ReadConcern
+    from pymongo.read_preferences import SecondaryPreferred
+    from pymongo.write_concern import WriteConcern
+
+    return {
+        "content-read": Profile(
+            read_preference=SecondaryPreferred(max_staleness=CONTENT_MAX_STALENESS),
+            read_concern=ReadConcern("local"),
+        ),
+        "content-write": Profile(
+            read_preference=ReadPreference.PRIMARY,
+            write_concern=WriteConcern(w=1, j=False),
+        ),
+        "submission-write": Profile(
+            read_preference=ReadPreference.PRIMARY,
+            read_concern=ReadConcern("majority"),
+            write_concern=WriteConcern(w="majority", j=True, wtimeout=SUBMISSION_WTIMEOUT_MS),
+        ),
+        "analytics-read": Profile(
+            read_preference=SecondaryPreferred(max_staleness=ANALYTICS_MAX_STALENESS),
+            read_concern=ReadConcern("local"),
+        ),
+    }
+
+
+def collection(database, name: str, profile: str):
+    """`database[name]` with the profile's read preference and concerns applied"""
+    options = profiles()[profile]
+    return database.get_collection(
+        name,
+        read_preference=options.read_preference,
+        read_concern=options.read_concern,
+        write_concern=options.write_concern,
+    )
+
+
+def describe() -> Dict[str, Dict]:
+    """Profiles as plain data, for /api/metrics"""
+    return {
+        name: {
+            "readPreference": p.read_preference.mongos_mode if p.read_preference else None,
+            "maxStalenessSeconds": p.read_preference.max_staleness if p.read_preference else -1,
+            "readConcern": p.read_concern.level if p.read_concern else None,
+            "writeConcern": p.write_concern.document if p.write_concern else None,
+        }
+        for name, p in profiles().items()
+    }
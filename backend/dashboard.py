@@ -0,0 +1,99 @@
+"""Admin dashboard summary built from server-side aggregations
+
+Every number the dashboard shows on load comes from one $facet pipeline per
+collection, all run concurrently, so only counts and a handful of recent items
+cross the wire instead of entire collections.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import newsletter
+import notifications
+
+# Collections with an `active` flag get an active/inactive split; stats have none
+SUMMARY_COLLECTIONS = ("programs", "events", "announcements", "opportunities", "impact_stories", "stats")
+MAX_RECENT = 50
+
+
+def collection_summary_pipeline(match: Dict) -> List[Dict]:
+    return [
+        {"$match": match},
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "active": [{"$match": {"active": True}}, {"$count": "n"}],
+        }},
+    ]
+
+
+def upcoming_events_pipeline(limit: int, match: Dict, today: str) -> List[Dict]:
+    return [
+        {"$match": {**match, "active": True, "date": {"$gte": today}}},
+        {"$sort": {"date": 1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "id": 1, "title": 1, "date": 1, "time": 1, "location": 1}},
+    ]
+
+
+def submissions_by_type_pipeline(limit: int, match: Dict) -> List[Dict]:
+    """Hot-tier counts and newest submissions per formType ($topN needs MongoDB 5.2+)"""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": "$formType",
+            "count": {"$sum": 1},
+            "latest": {"$topN": {
+                "n": limit,
+                "sortBy": {"submittedAt": -1},
+                "output": {"submittedAt": "$submittedAt", "data": "$data"},
+            }},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+async def _collection_summary(database, collection: str, match: Dict) -> Dict:
+    result = await database[collection].aggregate(collection_summary_pipeline(match)).to_list(1)
+    # $facet always yields one document; $count yields nothing for zero matches
+    total = result[0]["total"][0]["n"] if result[0]["total"] else 0
+    active = result[0]["active"][0]["n"] if result[0]["active"] else 0
+    return {"total": total, "active": active, "inactive": total - active}
+
+
+async def _upcoming_events(database, limit: int, match: Dict):
+    today = datetime.now(timezone.utc).date().isoformat()
+    return await database.events.aggregate(upcoming_events_pipeline(limit, match, today)).to_list(limit)
+
+
+async def _submissions_by_type(database, limit: int, match: Dict):
+    groups = await database.form_submissions.aggregate(submissions_by_type_pipeline(limit, match)).to_list(None)
+    return {g["_id"]: {"count": g["count"], "latest": g["latest"]} for g in groups}
+
+
+async def build_summary(database, recent: int = 5, match: Optional[Dict] = None) -> Dict:
+    """Counts per CMS collection, upcoming events and the latest submissions per formType.
+
+    `match` scopes content and submissions (e.g. to one tenant); subscriber and
+    notification counts are site-wide.
+    """
+    recent = min(max(recent, 1), MAX_RECENT)
+    match = match or {}
+    counts, upcoming, submissions, subscribers, pending = await asyncio.gather(
+        asyncio.gather(*[_collection_summary(database, c, match) for c in SUMMARY_COLLECTIONS]),
+        _upcoming_events(database, recent, match),
+        _submissions_by_type(database, recent, match),
+        database[newsletter.SUBSCRIBERS].count_documents({"status": "active"}),
+        database[notifications.PENDING_COLLECTION].estimated_document_count(),
+    )
+    collections = dict(zip(SUMMARY_COLLECTIONS, counts))
+    # Stats aren't toggled on and off; report them as all active
+    collections["stats"].update(active=collections["stats"]["total"], inactive=0)
+    return {
+        "collections": collections,
+        "upcomingEvents": upcoming,
+        "submissions": submissions,
+        "subscribers": subscribers,
+        "pendingNotifications": pending,
+        "generatedAt": datetime.now(timezone.utc).isoformat(),
+    }
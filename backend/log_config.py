@@ -0,0 +1,173 @@
+"""Structured, non-blocking logging
+
+configure() points the root logger at a QueueHandler; a QueueListener thread does
+the formatting and the stdout writes, so a log call on the event loop only costs
+an enqueue. Every record carries the id of the request it was logged under, and
+AccessLogMiddleware writes one access line per request with route, status and
+duration. DEBUG records are sampled (LOG_DEBUG_SAMPLE_RATE) before they are queued.
+
+    LOG_LEVEL=INFO  LOG_FORMAT=json|text  LOG_DEBUG_SAMPLE_RATE=0.01  LOG_ACCESS=true
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 0.01))
+ACCESS_LOG = os.environ.get('LOG_ACCESS', 'true').lower() in ('1', 'true', 'yes')
+QUEUE_SIZE = 10_000
+
+request_id: ContextVar[str] = ContextVar('request_id', default='-')
+access_logger = logging.getLogger('access')
+
+# Attributes every LogRecord has; anything else came from `extra=` and goes into the JSON
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "requestId": getattr(record, 'request_id', '-'),
+        }
+        entry.update((k, v) for k, v in vars(record).items() if k not in _RECORD_ATTRS)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s')
+
+
+class DebugSampler(logging.Filter):
+    """Keeps all INFO and above, and a random fraction of DEBUG"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class ContextQueueHandler(QueueHandler):
+    """Captures the request id and renders the message on the calling side, before the
+    record crosses to the listener thread where the context is no longer visible"""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # shed log lines rather than block the event loop
+
+
+def configure():
+    """Install the queue handler on the root logger; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if FORMAT == 'json' else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(DebugSampler(DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LEVEL)
+
+    # Send uvicorn's own logs through the same pipeline; our access line replaces its one
+    for name in ('uvicorn', 'uvicorn.error'):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    if ACCESS_LOG:
+        logging.getLogger('uvicorn.access').disabled = True
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class AccessLogMiddleware:
+    """Assigns each request an id (honouring an incoming X-Request-ID), echoes it on the
+    response and logs one access line when the response has finished"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id", b"").decode("latin-1")[:64]
+        rid = incoming or uuid.uuid4().hex
+        token = request_id.set(rid)
+        status = [500]
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if ACCESS_LOG:
+                route = scope.get("route")
+                access_logger.info(
+                    f"{scope['method']} {scope['path']} {status[0]}",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "route": getattr(route, "path", None),
+                        "tenant": scope.get("tenant"),
+                        "status": status[0],
+                        "durationMs": round((time.perf_counter() - started) * 1000, 2),
+                    },
+                )
+            request_id.reset(token)
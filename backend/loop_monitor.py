@@ -0,0 +1,136 @@
+"""Event-loop lag monitor and blocking-call detector
+
+A ticker coroutine sleeps for a fixed interval and records how late it woke up;
+that lateness is time some other callback held the loop. Lags are kept in a
+fixed-bucket histogram. In debug mode a watchdog thread also samples the loop
+thread's stack whenever the loop has been stuck past the threshold, so the log
+shows exactly which coroutine (e.g. a synchronous smtplib call) was blocking.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+INTERVAL = float(os.environ.get('LOOP_MONITOR_INTERVAL', 0.1))
+THRESHOLD = float(os.environ.get('LOOP_BLOCK_THRESHOLD', 0.1))
+DEBUG = os.environ.get('LOOP_MONITOR_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is open-ended
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+MAX_CAPTURES = 20
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = INTERVAL, threshold: float = THRESHOLD, debug: bool = DEBUG):
+        self.interval = interval
+        self.threshold = threshold
+        self.debug = debug
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.blocked = 0
+        self.captures: deque = deque(maxlen=MAX_CAPTURES)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._last_tick = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._captured_this_stall = False
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._task = asyncio.ensure_future(self._tick())
+        if self.debug:
+            self._stop.clear()
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        logger.info(f"Event loop monitor started (interval {self.interval}s, threshold {self.threshold}s, debug {self.debug})")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stop.set()
+
+    async def _tick(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_tick = now
+            self._captured_this_stall = False
+            self.record(max(0.0, now - expected))
+
+    def record(self, lag: float):
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        self.counts[bisect_left(BUCKETS, lag)] += 1
+        if lag >= self.threshold:
+            self.blocked += 1
+            logger.warning(f"Event loop blocked for {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        """Runs in its own thread - the only place that can see a stuck loop while it's stuck"""
+        while not self._stop.wait(self.threshold / 2):
+            stalled = time.monotonic() - self._last_tick - self.interval
+            if stalled < self.threshold or self._captured_this_stall:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.format_stack(frame)
+            self._captured_this_stall = True
+            self.captures.append({
+                "at": time.time(),
+                "stalledMs": round(stalled * 1000),
+                "stack": stack,
+            })
+            logger.warning(f"Event loop stalled {stalled * 1000:.0f} ms in:\n{''.join(stack[-8:])}")
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Approximate percentile from the histogram (upper bound of the bucket it falls in)"""
+        if not self.samples:
+            return None
+        target = q * self.samples
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(BUCKETS[i], self.max_lag) if i < len(BUCKETS) else self.max_lag
+        return self.max_lag
+
+    def histogram(self) -> List[Dict]:
+        edges = [f"<={int(b * 1000)}ms" for b in BUCKETS] + [f">{int(BUCKETS[-1] * 1000)}ms"]
+        return [{"bucket": edge, "count": count} for edge, count in zip(edges, self.counts)]
+
+    def stats(self) -> Dict:
+        p = {q: self.percentile(q) for q in (0.5, 0.99)}
+        return {
+            "running": self._task is not None,
+            "debug": self.debug,
+            "samples": self.samples,
+            "meanLagMs": round(self.total_lag / self.samples * 1000, 2) if self.samples else None,
+            "p50LagMs": round(p[0.5] * 1000, 2) if p[0.5] is not None else None,
+            "p99LagMs": round(p[0.99] * 1000, 2) if p[0.99] is not None else None,
+            "maxLagMs": round(self.max_lag * 1000, 2),
+            "blocked": self.blocked,
+            "thresholdMs": round(self.threshold * 1000),
+            "histogram": self.histogram(),
+        }
+
+
+monitor = LoopMonitor()
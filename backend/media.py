@@ -0,0 +1,363 @@
+"""Image proxy: fetch a source image once, render width-bucketed variants, cache them on disk"""
+
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+
+# Widths a variant can be rendered at - requests for anything else are rejected
+# so the cache only ever holds a small, predictable set of files per image
+WIDTH_BUCKETS = (320, 640, 960, 1280, 1920)
+FORMATS = {"webp": ("WEBP", "image/webp"), "jpg": ("JPEG", "image/jpeg")}
+DEFAULT_WIDTH = 960
+
+CACHE_DIR = Path(os.environ.get('MEDIA_CACHE_DIR', ROOT_DIR / 'media_cache'))
+UPLOAD_DIR = Path(os.environ.get('MEDIA_UPLOAD_DIR', ROOT_DIR / 'uploads'))
+CACHE_MAX_BYTES = int(os.environ.get('MEDIA_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+MAX_SOURCE_BYTES = int(os.environ.get('MEDIA_MAX_SOURCE_BYTES', 20 * 1024 * 1024))
+ALLOWED_HOSTS = {h.strip() for h in os.environ.get('MEDIA_ALLOWED_HOSTS', 'images.unsplash.com').split(',') if h.strip()}
+WORKERS = int(os.environ.get('MEDIA_WORKERS', 2))
+QUALITY = int(os.environ.get('MEDIA_QUALITY', 80))
+PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '').rstrip('/')
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class MediaError(Exception):
+    """Raised when a source can't be resolved or rendered; carries an HTTP status"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# ============ DISK CACHE ============
+
+class DiskLRUCache:
+    """Size-bounded cache of files under one directory, evicting least recently used first"""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        self._loaded = False
+        self._loading = False
+
+    def _scan(self) -> "OrderedDict[str, int]":
+        # Rebuild the index from disk so a restart keeps what was already rendered
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.root.rglob('*'):
+            if path.is_file() and not path.name.startswith('.tmp'):
+                stat = path.stat()
+                files.append((stat.st_atime, str(path.relative_to(self.root)), stat.st_size))
+        files.sort()
+        return OrderedDict((key, size) for _, key, size in files)
+
+    def _install(self, entries: "OrderedDict[str, int]"):
+        # Anything put or read while the scan ran is the most recently used
+        for key in self._entries:
+            entries.pop(key, None)
+        entries.update(self._entries)
+        self._entries = entries
+        self._size = sum(entries.values())
+        self._loaded = True
+        self._evict()
+
+    def _load(self):
+        self._install(self._scan())
+
+    async def preload(self):
+        """Scan the cache directory in a thread; until it finishes, requests just see fewer hits"""
+        if self._loaded or self._loading:
+            return
+        self._loading = True
+        try:
+            self._install(await asyncio.to_thread(self._scan))
+        finally:
+            self._loading = False
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def get(self, key: str) -> Optional[Path]:
+        if not self._loaded and not self._loading:
+            self._load()
+        if key not in self._entries:
+            return None
+        path = self.path(key)
+        if not path.exists():
+            self._size -= self._entries.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return path
+
+    def put(self, key: str, tmp_path: Path) -> Path:
+        """Atomically move a finished temp file into the cache under key"""
+        if not self._loaded and not self._loading:
+            self._load()
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, path)
+        if key in self._entries:
+            self._size -= self._entries.pop(key)
+        size = path.stat().st_size
+        self._entries[key] = size
+        self._size += size
+        self._evict(keep=key)
+        return path
+
+    def tmp_path(self) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(prefix='.tmp', dir=self.root)
+        os.close(fd)
+        return Path(name)
+
+    def _evict(self, keep: Optional[str] = None):
+        while self._size > self.max_bytes and self._entries:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                break
+            self._entries.pop(key)
+            self._size -= size
+            try:
+                self.path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        return {"files": len(self._entries), "bytes": self._size, "maxBytes": self.max_bytes}
+
+
+cache = DiskLRUCache(CACHE_DIR, CACHE_MAX_BYTES)
+
+# ============ SOURCE KEYS ============
+
+def encode_source(src: str) -> str:
+    """Encode a source URL (or local:<name>) into a URL-safe path segment"""
+    return base64.urlsafe_b64encode(src.encode()).decode().rstrip('=')
+
+
+def decode_source(key: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(key + '=' * (-len(key) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise MediaError(400, "Invalid media key")
+
+
+# Path prefix -> coroutine(name, dst_path) that copies one of our own stored files to disk
+_resolvers: Dict[str, Callable[[str, str], Awaitable[None]]] = {}
+
+
+def register_resolver(path_prefix: str, fetch: Callable[[str, str], Awaitable[None]]):
+    """Let sources served by this API (e.g. /api/media/uploads/<id>) be read directly"""
+    _resolvers[path_prefix] = fetch
+
+
+def _resolver_for(src: str):
+    parsed = urlparse(src)
+    if parsed.hostname and not (PUBLIC_BASE_URL and src.startswith(PUBLIC_BASE_URL)):
+        return None
+    for prefix, fetch in _resolvers.items():
+        if parsed.path.startswith(prefix):
+            return fetch, parsed.path[len(prefix):]
+    return None
+
+
+def is_proxyable(src: Optional[str]) -> bool:
+    if not src:
+        return False
+    if src.startswith('local:') or _resolver_for(src):
+        return True
+    return _is_allowed_url(src)
+
+
+def variant_url(src: str, width: int, fmt: str) -> str:
+    return f"{PUBLIC_BASE_URL}/api/media/{encode_source(src)}/{width}.{fmt}"
+
+
+def image_variants(src: Optional[str]) -> Optional[Dict[str, str]]:
+    """srcset-ready variant URLs for an image field, or None when it can't be proxied"""
+    if not is_proxyable(src):
+        return None
+    variants = {
+        f"{fmt}Srcset": ", ".join(f"{variant_url(src, w, fmt)} {w}w" for w in WIDTH_BUCKETS)
+        for fmt in FORMATS
+    }
+    variants["src"] = variant_url(src, DEFAULT_WIDTH, 'jpg')
+    return variants
+
+
+def with_image_variants(items: list) -> list:
+    """Attach imageVariants to every item that has a proxyable image"""
+    for item in items:
+        variants = image_variants(item.get('image'))
+        if variants:
+            item['imageVariants'] = variants
+    return items
+
+# ============ RENDERING ============
+
+def _render_variant(src_path: str, dst_path: str, width: int, pil_format: str, quality: int):
+    """Runs in a worker process - Pillow work never touches the event loop"""
+    from PIL import Image, ImageOps
+
+    with Image.open(src_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.width > width:
+            height = round(img.height * width / img.width)
+            img = img.resize((width, height), Image.LANCZOS)
+        if pil_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        elif pil_format == 'WEBP' and img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        img.save(dst_path, pil_format, quality=quality, optimize=True)
+
+
+def _is_allowed_url(url: str) -> bool:
+    parsed = urlparse(url)
+    return parsed.scheme in ('http', 'https') and parsed.hostname in ALLOWED_HOSTS
+
+
+def _opener():
+    """urllib opener whose redirects must stay on MEDIA_ALLOWED_HOSTS too"""
+    import urllib.request  # ~40 ms to import; only variant renders need it
+
+    class AllowedHostRedirects(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, req, fp, code, msg, headers, newurl):
+            if not _is_allowed_url(newurl):
+                raise MediaError(403, "Source redirected to a host that isn't allowed")
+            return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+    return urllib.request.build_opener(AllowedHostRedirects)
+
+
+def _download(url: str, dst_path: str):
+    import urllib.request
+    request = urllib.request.Request(url, headers={"User-Agent": "UISN-media-proxy"})
+    with _opener().open(request, timeout=15) as response, open(dst_path, 'wb') as out:
+        read = 0
+        while True:
+            chunk = response.read(64 * 1024)
+            if not chunk:
+                break
+            read += len(chunk)
+            if read > MAX_SOURCE_BYTES:
+                raise MediaError(413, "Source image too large")
+            out.write(chunk)
+
+
+_executor: Optional["ProcessPoolExecutor"] = None
+# Concurrent requests for the same source or variant share one fetch/render
+_flights = SingleFlight()
+
+
+def _get_executor() -> "ProcessPoolExecutor":
+    global _executor
+    if _executor is None:
+        # Pulls in multiprocessing; only the first variant render should pay for that
+        from concurrent.futures import ProcessPoolExecutor
+        _executor = ProcessPoolExecutor(max_workers=WORKERS)
+    return _executor
+
+
+async def _source_path(src: str) -> Path:
+    if src.startswith('local:'):
+        name = src[len('local:'):]
+        path = (UPLOAD_DIR / name).resolve()
+        if UPLOAD_DIR.resolve() not in path.parents or not path.is_file():
+            raise MediaError(404, "Upload not found")
+        return path
+
+    if not is_proxyable(src):
+        raise MediaError(403, "Source host not allowed")
+
+    key = f"sources/{hashlib.sha256(src.encode()).hexdigest()}"
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    resolver = _resolver_for(src)
+
+    async def fetch():
+        tmp = cache.tmp_path()
+        try:
+            if resolver:
+                await resolver[0](resolver[1], str(tmp))
+            else:
+                await asyncio.to_thread(_download, src, str(tmp))
+        except MediaError:
+            tmp.unlink(missing_ok=True)
+            raise
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            logger.warning(f"Failed to fetch media source {src}: {e}")
+            raise MediaError(502, "Could not fetch source image")
+        return cache.put(key, tmp)
+
+    return await _flights.do(key, fetch)
+
+
+async def get_variant(key: str, width: int, fmt: str) -> Path:
+    """Return the on-disk path of a rendered variant, rendering it on first request"""
+    if width not in WIDTH_BUCKETS:
+        raise MediaError(404, f"Width must be one of {', '.join(map(str, WIDTH_BUCKETS))}")
+    if fmt not in FORMATS:
+        raise MediaError(404, "Format must be webp or jpg")
+
+    src = decode_source(key)
+    digest = hashlib.sha256(src.encode()).hexdigest()
+    cache_key = f"variants/{digest[:2]}/{digest}-{width}.{fmt}"
+    cached = cache.get(cache_key)
+    if cached:
+        return cached
+
+    async def render():
+        source = await _source_path(src)
+        # Copy the source aside so eviction can't pull it out from under the worker
+        work_src = cache.tmp_path()
+        await asyncio.to_thread(shutil.copyfile, source, work_src)
+        tmp = cache.tmp_path()
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                _get_executor(), _render_variant, str(work_src), str(tmp), width, FORMATS[fmt][0], QUALITY
+            )
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            logger.warning(f"Failed to render {src} at {width}w: {e}")
+            raise MediaError(415, "Source is not a supported image")
+        finally:
+            work_src.unlink(missing_ok=True)
+        return cache.put(cache_key, tmp)
+
+    return await _flights.do(cache_key, render)
+
+
+def media_type(fmt: str) -> str:
+    return FORMATS[fmt][1]
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
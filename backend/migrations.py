@@ -0,0 +1,313 @@
+"""Versioned migrations: seeds, indexes and online schema backfills
+
+Each migration runs once per database and is recorded in the `_migrations`
+collection. A lease-style lock document in the same collection means that when
+several workers boot together only one runs the pending migrations; the others
+skip and serve traffic. Run pending migrations, or list their status, with:
+
+    python migrations.py
+    python migrations.py status
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import analytics
+from tenants import DEFAULT_TENANT
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = '_migrations'
+LOCK_ID = 'lock'
+LOCK_TTL_SECONDS = 60
+BACKFILL_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', 500))
+
+# ============ DEFAULT CONTENT ============
+
+DEFAULT_PROGRAMS = [
+    {"id": "1", "title": "Create a UISN Chapter at Your School", "description": "Start an official UISN chapter on your campus. Access toolkits, branding, and support to lead service initiatives locally and connect with other universities in Utah.", "frequency": "Year-round", "location": "Your Campus", "impact": "Statewide network", "icon": "GraduationCap", "color": "secondary", "active": True, "slug": "create-chapter"},
+    {"id": "2", "title": "Host a UISN Service Event", "description": "Evening service-focused events including community projects, donation drives, and volunteering. Designed for students with busy schedules - 1–2 hours, low commitment, high impact.", "frequency": "Flexible", "location": "Your Community", "impact": "Quick & impactful", "icon": "Calendar", "color": "accent", "active": True, "slug": "service-event"},
+    {"id": "3", "title": "Join the Utah Intercollegiate Service Network", "description": "Become part of a statewide student service coalition. Collaborate with students from other colleges, share resources, events, and impact reports.", "frequency": "Ongoing", "location": "Statewide", "impact": "9+ universities", "icon": "Heart", "color": "secondary", "active": True, "slug": "join-network"},
+    {"id": "4", "title": "Join the UISN Leadership Team", "description": "Take on a leadership role within UISN and help shape the future of student service in Utah. Gain valuable experience, earn service hours, access possible stipends, and expand your network.", "frequency": "Ongoing Commitment", "location": "Statewide", "impact": "Leadership & Growth", "icon": "Users", "color": "accent", "active": True, "slug": "leadership"},
+]
+
+DEFAULT_STATS = [
+    {"id": "1", "label": "Active Volunteers", "value": "1,000+", "description": "Students making a difference", "icon": "Users", "color": "secondary"},
+    {"id": "2", "label": "Service Hours", "value": "5,000+", "description": "Contributed since 2026", "icon": "Clock", "color": "accent"},
+    {"id": "3", "label": "Community Partners", "value": "5", "description": "Organizations served", "icon": "Heart", "color": "secondary"},
+    {"id": "4", "label": "Partner Universities", "value": "9+", "description": "Colleges across Utah", "icon": "TrendingUp", "color": "accent"},
+]
+
+DEFAULT_ABOUT = {
+    "mission": "To mobilize and empower college students across Utah to serve their communities, develop leadership skills, and create lasting positive impact through coordinated volunteer initiatives that address real community needs.",
+    "story": "Founded in 2026 at Snow College by a passionate group of students who saw the need for coordinated service across Utah's universities. With the support and guidance of UServeUtah, we launched UISN to create a statewide network where college students could collaborate on meaningful service projects. What started as a small group at Snow College has grown into a movement spanning 9+ universities, with over 1,000 active volunteers making a real difference in their communities."
+}
+
+DEFAULT_IMPACT_STORIES = [
+    {"id": "1", "title": "Building Community Together", "description": "In our first year, UISN volunteers have contributed over 5,000 hours of service across Utah communities.", "image": "https://images.unsplash.com/photo-1758599667729-a6f0f8bd213b?w=800&q=80", "active": True},
+    {"id": "2", "title": "Growing Network", "description": "Started at Snow College, we've expanded to partner with 9 universities across Utah, creating a statewide movement.", "image": "https://images.unsplash.com/photo-1615856210162-9ae33390b1a2?w=800&q=80", "active": True},
+    {"id": "3", "title": "Student-Led Impact", "description": "Over 1,000 student volunteers are actively participating in service projects, proving that young people can create lasting change.", "image": "https://images.unsplash.com/photo-1582213782179-e0d53f98f2ca?w=800&q=80", "active": True},
+]
+
+DEFAULT_EVENTS = [
+    {"id": "1", "title": "Spring Kickoff Service Day", "date": "2026-03-15", "time": "9:00 AM - 3:00 PM", "location": "Salt Lake City", "description": "Join us for our inaugural service day! Multiple project sites available.", "registrationLink": "#", "active": True},
+]
+
+# ============ REGISTRY ============
+
+class Migration:
+    def __init__(self, version: int, name: str, fn: Callable[..., Awaitable[None]]):
+        self.version = version
+        self.name = name
+        self.fn = fn
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Register a migration; versions must be unique and are applied in ascending order"""
+    def register(fn):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version, name, fn))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return fn
+    return register
+
+# ============ HELPERS ============
+
+async def seed_collection(database, collection: str, docs: List[dict]) -> int:
+    """Seed an empty collection, upserting by id so a half-finished seed completes on retry"""
+    from pymongo import UpdateOne
+
+    if await database[collection].find_one({}, {"_id": 1}) is not None:
+        return 0
+    result = await database[collection].bulk_write(
+        [UpdateOne({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True) for doc in docs],
+        ordered=False,
+    )
+    return result.upserted_count
+
+
+async def backfill(database, collection: str, query: dict, update: dict, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Apply `update` to every document matching `query` in batches of _ids.
+
+    Only _ids are pulled through the cursor and each batch is one unordered
+    bulk_write, so this can run online against large collections without long
+    locks or large result sets.
+    """
+    from pymongo import UpdateOne
+
+    modified = 0
+    batch = []
+    async for doc in database[collection].find(query, {"_id": 1}).batch_size(batch_size):
+        batch.append(UpdateOne({"_id": doc["_id"], **query}, update))
+        if len(batch) >= batch_size:
+            modified += (await database[collection].bulk_write(batch, ordered=False)).modified_count
+            batch = []
+            await asyncio.sleep(0)  # let request handlers in between batches
+    if batch:
+        modified += (await database[collection].bulk_write(batch, ordered=False)).modified_count
+    return modified
+
+# ============ MIGRATIONS ============
+
+CMS_COLLECTIONS = ("programs", "events", "stats", "impact_stories", "announcements", "opportunities")
+
+
+@migration(1, "seed default content")
+async def seed_default_content(database):
+    # The seeds don't depend on each other, so they run concurrently
+    await asyncio.gather(
+        seed_collection(database, "programs", DEFAULT_PROGRAMS),
+        seed_collection(database, "stats", DEFAULT_STATS),
+        seed_collection(database, "impact_stories", DEFAULT_IMPACT_STORIES),
+        seed_collection(database, "events", DEFAULT_EVENTS),
+        database.about.update_one({}, {"$setOnInsert": DEFAULT_ABOUT}, upsert=True),
+    )
+
+
+@migration(2, "index id lookups and submission sorts")
+async def create_indexes(database):
+    await asyncio.gather(
+        *[database[c].create_index("id") for c in CMS_COLLECTIONS],
+        database.form_submissions.create_index([("submittedAt", -1)]),
+        database.form_submissions.create_index([("formType", 1), ("submittedAt", -1)]),
+    )
+
+
+@migration(3, "backfill updatedAt on CMS content")
+async def backfill_updated_at(database):
+    now = datetime.now(timezone.utc).isoformat()
+    await asyncio.gather(*[
+        backfill(database, c, {"updatedAt": {"$exists": False}}, {"$set": {"updatedAt": now}})
+        for c in CMS_COLLECTIONS
+    ])
+
+
+@migration(4, "index the submissions archive and TTL expiry")
+async def create_archive_indexes(database):
+    await asyncio.gather(
+        database.form_submissions_archive.create_index([("submittedAt", -1)]),
+        database.form_submissions_archive.create_index([("formType", 1), ("submittedAt", -1)]),
+        # Only documents stamped with expiresAt (SUBMISSION_TTL form types) are affected
+        database.form_submissions.create_index("expiresAt", expireAfterSeconds=0),
+    )
+
+
+@migration(5, "newsletter subscribers from past signups")
+async def create_subscribers(database):
+    await database.subscribers.create_index("email", unique=True)
+    await database.subscribers.create_index([("status", 1), ("email", 1)])
+    # $merge on email needs the unique index above; existing subscribers are left alone
+    await database.form_submissions.aggregate([
+        {"$match": {"formType": "newsletter", "data.email": {"$type": "string"}}},
+        {"$group": {"_id": {"$toLower": {"$trim": {"input": "$data.email"}}}, "subscribedAt": {"$min": "$submittedAt"}}},
+        {"$match": {"_id": {"$regex": "^[^@\\s]+@[^@\\s]+\\.[^@\\s]+$"}}},
+        {"$project": {"_id": 0, "email": "$_id", "subscribedAt": 1, "status": "active", "source": "backfill"}},
+        {"$merge": {"into": "subscribers", "on": "email", "whenMatched": "keepExisting", "whenNotMatched": "insert"}},
+    ]).to_list(None)
+
+
+@migration(6, "index pending notifications")
+async def create_notification_indexes(database):
+    await asyncio.gather(
+        database.pending_notifications.create_index([("dueAt", 1)]),
+        database.pending_notifications.create_index([("claimedBy", 1)]),
+    )
+
+
+@migration(7, "partition CMS content and submissions by tenant")
+async def partition_by_tenant(database):
+    # Everything written before tenants existed belongs to the statewide site
+    untagged = {"tenant": {"$exists": False}}
+    tag = {"$set": {"tenant": DEFAULT_TENANT}}
+    await asyncio.gather(
+        *[backfill(database, c, untagged, tag) for c in CMS_COLLECTIONS + ("about", "settings")],
+        *[database[c].create_index([("tenant", 1), ("id", 1)]) for c in CMS_COLLECTIONS],
+        database.about.create_index("tenant"),
+        database.settings.create_index("tenant"),
+        database.form_submissions.create_index([("tenant", 1), ("submittedAt", -1)]),
+        database.form_submissions.create_index([("tenant", 1), ("formType", 1), ("submittedAt", -1)]),
+    )
+
+
+@migration(8, "index archived submissions by tenant")
+async def create_archive_tenant_indexes(database):
+    # get_submissions filters the archive by tenant too once a range reaches past the hot window
+    await asyncio.gather(
+        database.form_submissions_archive.create_index([("tenant", 1), ("submittedAt", -1)]),
+        database.form_submissions_archive.create_index([("tenant", 1), ("formType", 1), ("submittedAt", -1)]),
+    )
+
+
+@migration(9, "expire archived submissions")
+async def create_archive_ttl_index(database):
+    # Submissions archived before their expiresAt would otherwise be kept forever
+    await database.form_submissions_archive.create_index("expiresAt", expireAfterSeconds=0)
+
+
+@migration(10, "split submission rollups by tenant")
+async def split_rollups_by_tenant(database):
+    # Chapter submissions were counted into the statewide rollups until now
+    await analytics.rebuild_rollups(database)
+
+# ============ RUNNER ============
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def _acquire_lock(database, owner: str) -> bool:
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    now = datetime.now(timezone.utc)
+    try:
+        lock = await database[MIGRATIONS_COLLECTION].find_one_and_update(
+            {"_id": LOCK_ID, "$or": [{"expiresAt": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expiresAt": now + timedelta(seconds=LOCK_TTL_SECONDS)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Lock document exists, unexpired, and held by someone else
+        return False
+    return lock["owner"] == owner
+
+
+async def _heartbeat(database, owner: str):
+    while True:
+        await asyncio.sleep(LOCK_TTL_SECONDS / 3)
+        await database[MIGRATIONS_COLLECTION].update_one(
+            {"_id": LOCK_ID, "owner": owner},
+            {"$set": {"expiresAt": datetime.now(timezone.utc) + timedelta(seconds=LOCK_TTL_SECONDS)}},
+        )
+
+
+async def applied_versions(database) -> List[int]:
+    docs = await database[MIGRATIONS_COLLECTION].find({"_id": {"$type": "int"}}, {"_id": 1}).to_list(None)
+    return sorted(doc["_id"] for doc in docs)
+
+
+async def pending(database) -> List[Migration]:
+    applied = set(await applied_versions(database))
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+async def run_migrations(database, target: Optional[int] = None) -> Dict:
+    """Apply pending migrations in order. Returns what ran, or why nothing did."""
+    todo = [m for m in await pending(database) if target is None or m.version <= target]
+    if not todo:
+        return {"applied": [], "status": "up-to-date"}
+
+    owner = _owner()
+    if not await _acquire_lock(database, owner):
+        logger.info("Migrations are being run by another worker")
+        return {"applied": [], "status": "locked"}
+
+    heartbeat = asyncio.ensure_future(_heartbeat(database, owner))
+    applied = []
+    try:
+        # Re-read under the lock in case another worker finished some meanwhile
+        todo = [m for m in await pending(database) if target is None or m.version <= target]
+        for m in todo:
+            started = time.monotonic()
+            logger.info(f"Applying migration {m.version}: {m.name}")
+            await m.fn(database)
+            await database[MIGRATIONS_COLLECTION].insert_one({
+                "_id": m.version,
+                "name": m.name,
+                "appliedAt": datetime.now(timezone.utc).isoformat(),
+                "durationMs": round((time.monotonic() - started) * 1000),
+            })
+            applied.append(m.version)
+    finally:
+        heartbeat.cancel()
+        await database[MIGRATIONS_COLLECTION].delete_one({"_id": LOCK_ID, "owner": owner})
+    return {"applied": applied, "status": "applied"}
+
+
+async def _main(argv):
+    from server import get_db
+    logging.basicConfig(level=logging.INFO)
+    database = get_db()
+    if argv[1:] == ['status']:
+        applied = set(await applied_versions(database))
+        for m in MIGRATIONS:
+            print(f"{'x' if m.version in applied else ' '} {m.version:>3}  {m.name}")
+        return 0
+    result = await run_migrations(database)
+    print(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(_main(sys.argv)))
@@ -0,0 +1,373 @@
+"""Newsletter subscribers and campaign delivery
+
+Newsletter signups are upserted into `subscribers` (unique on the normalized
+email) as well as being stored as form submissions. Subscribers and campaigns are
+global, not per tenant: there is one UISN newsletter, whichever chapter's site a
+reader signed up on. A campaign is a document in
+`campaigns`; sending one streams active subscribers in email order, renders each
+batch of messages and hands them to a small pool of persistent SMTP connections
+behind a shared rate limiter. After every batch the campaign records the last
+email it finished, so an interrupted send resumes where it stopped. Delivery is
+at-least-once: the batch in flight when a sender dies is sent again on resume. A
+sender holds a lease on the campaign while it runs, so a second `send` of the same
+campaign is refused instead of mailing everyone twice.
+
+    python newsletter.py create "Subject" body.txt
+    python newsletter.py send CAMPAIGN_ID
+    python newsletter.py status CAMPAIGN_ID
+
+SMTP_HOST / SMTP_PORT / SMTP_STARTTLS point delivery anywhere, e.g. a local sink
+on localhost:1025 with SMTP_STARTTLS=false. Unsubscribe links are signed with
+NEWSLETTER_SECRET, which must be set before a campaign can be sent.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+# smtplib, email and pymongo are imported where they're used: the web process
+# only ever subscribes and unsubscribes, and shouldn't load them at startup
+if TYPE_CHECKING:
+    from email.message import EmailMessage
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBERS = 'subscribers'
+CAMPAIGNS = 'campaigns'
+BATCH_SIZE = int(os.environ.get('NEWSLETTER_BATCH_SIZE', 100))
+CONCURRENCY = int(os.environ.get('NEWSLETTER_SMTP_CONNECTIONS', 3))
+RATE_PER_SECOND = float(os.environ.get('NEWSLETTER_RATE_PER_SECOND', 5))
+SECRET = os.environ.get('NEWSLETTER_SECRET', '')
+PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', '').rstrip('/')
+MAX_RECORDED_FAILURES = 1000
+# A sender that died mid-campaign releases it after this long
+SEND_LOCK_TIMEOUT = timedelta(minutes=10)
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+class NewsletterError(Exception):
+    pass
+
+
+def normalize_email(email) -> Optional[str]:
+    email = (email or '').strip().lower()
+    return email if _EMAIL_RE.match(email) else None
+
+
+def unsubscribe_token(email: str) -> str:
+    return hmac.new(SECRET.encode(), email.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def check_unsubscribe_token(email: str, token: str) -> bool:
+    return bool(SECRET) and hmac.compare_digest(unsubscribe_token(email), token or '')
+
+
+def unsubscribe_url(email: str) -> str:
+    query = urlencode({"email": email, "token": unsubscribe_token(email)})
+    return f"{PUBLIC_BASE_URL}/api/newsletter/unsubscribe?{query}"
+
+
+def unsubscribe_page(email: str, token: str, done: bool = False) -> str:
+    """The page behind an unsubscribe link: a button that POSTs, or the confirmation after it.
+
+    Following the link never unsubscribes by itself, so mail scanners and link
+    prefetchers can't unsubscribe anyone; mail clients use the RFC 8058 one-click POST.
+    """
+    import html
+
+    if done:
+        body = f"<p>{html.escape(email)} has been unsubscribed from the UISN newsletter.</p>"
+    else:
+        action = html.escape("?" + urlencode({"email": email, "token": token}))
+        body = (
+            f"<p>Stop sending the UISN newsletter to {html.escape(email)}?</p>"
+            f'<form method="post" action="{action}"><button type="submit">Unsubscribe</button></form>'
+        )
+    return (
+        '<!doctype html><html lang="en"><head><meta charset="utf-8">'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">'
+        f"<title>Unsubscribe</title></head><body>{body}</body></html>"
+    )
+
+# ============ SUBSCRIBERS ============
+
+async def subscribe(database, email, source: str = 'form') -> bool:
+    """Upsert an active subscriber; returns False if the address isn't usable"""
+    from pymongo.errors import DuplicateKeyError
+
+    email = normalize_email(email)
+    if email is None:
+        return False
+    now = datetime.now(timezone.utc).isoformat()
+    update = {
+        "$set": {"status": "active", "updatedAt": now},
+        "$setOnInsert": {"email": email, "subscribedAt": now, "source": source},
+    }
+    try:
+        await database[SUBSCRIBERS].update_one({"email": email}, update, upsert=True)
+    except DuplicateKeyError:
+        # Two concurrent upserts of a new address; the loser's retry matches the winner's insert
+        await database[SUBSCRIBERS].update_one({"email": email}, update, upsert=True)
+    return True
+
+
+async def unsubscribe(database, email: str) -> bool:
+    result = await database[SUBSCRIBERS].update_one(
+        {"email": email},
+        {"$set": {"status": "unsubscribed", "updatedAt": datetime.now(timezone.utc).isoformat()}},
+    )
+    return bool(result.matched_count)
+
+# ============ DELIVERY ============
+
+class SmtpConfig(NamedTuple):
+    host: str
+    port: int
+    starttls: bool
+    username: str
+    password: str
+    from_addr: str
+
+    @classmethod
+    def from_env(cls) -> 'SmtpConfig':
+        username = os.environ.get('GMAIL_USER', 'utahintercollegiateservicenetw@gmail.com')
+        return cls(
+            host=os.environ.get('SMTP_HOST', 'smtp.gmail.com'),
+            port=int(os.environ.get('SMTP_PORT', 587)),
+            starttls=os.environ.get('SMTP_STARTTLS', 'true').lower() in ('1', 'true', 'yes'),
+            username=username,
+            password=os.environ.get('GMAIL_APP_PASSWORD', ''),
+            from_addr=os.environ.get('NEWSLETTER_FROM', username),
+        )
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all callers"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class _Connection:
+    """One persistent SMTP session; smtplib blocks, so callers run it in a thread"""
+
+    def __init__(self, config: SmtpConfig):
+        self.config = config
+        self.smtp = None
+
+    def _connect(self):
+        import smtplib
+        smtp = smtplib.SMTP(self.config.host, self.config.port, timeout=30)
+        if self.config.starttls:
+            smtp.starttls()
+        if self.config.password:
+            smtp.login(self.config.username, self.config.password)
+        self.smtp = smtp
+
+    def send(self, msg: "EmailMessage"):
+        import smtplib
+        if self.smtp is None:
+            self._connect()
+        try:
+            self.smtp.send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # Servers drop idle sessions; reconnect once and retry
+            self.smtp = None
+            self._connect()
+            self.smtp.send_message(msg)
+        except smtplib.SMTPRecipientsRefused:
+            raise  # this address is bad; the session is fine
+        except (smtplib.SMTPException, OSError):
+            self.close()  # unknown session state - start fresh on the next message
+            raise
+
+    def close(self):
+        import smtplib
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.smtp = None
+
+
+class SmtpPool:
+    """A fixed number of SMTP sessions shared by concurrent sends, behind one rate limiter"""
+
+    def __init__(self, config: SmtpConfig, size: int = CONCURRENCY, rate: float = RATE_PER_SECOND):
+        self.limiter = RateLimiter(rate)
+        self._connections = [_Connection(config) for _ in range(max(1, size))]
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for conn in self._connections:
+            self._idle.put_nowait(conn)
+
+    async def send(self, msg: "EmailMessage"):
+        conn = await self._idle.get()
+        try:
+            await self.limiter.wait()
+            await asyncio.to_thread(conn.send, msg)
+        finally:
+            self._idle.put_nowait(conn)
+
+    async def send_batch(self, messages: List["EmailMessage"]) -> List[Tuple[str, str]]:
+        """Send concurrently; returns (recipient, error) for each failure"""
+        results = await asyncio.gather(*(self.send(m) for m in messages), return_exceptions=True)
+        return [(m['To'], repr(r)) for m, r in zip(messages, results) if isinstance(r, Exception)]
+
+    async def close(self):
+        await asyncio.gather(*(asyncio.to_thread(conn.close) for conn in self._connections))
+
+# ============ CAMPAIGNS ============
+
+def render(campaign: dict, email: str, from_addr: str) -> "EmailMessage":
+    from email.message import EmailMessage
+
+    link = unsubscribe_url(email)
+    msg = EmailMessage()
+    msg['From'] = from_addr
+    msg['To'] = email
+    msg['Subject'] = campaign['subject']
+    msg['List-Unsubscribe'] = f"<{link}>"
+    msg['List-Unsubscribe-Post'] = "List-Unsubscribe=One-Click"
+    msg.set_content(f"{campaign['body']}\n\n--\nUnsubscribe: {link}\n")
+    return msg
+
+
+async def create_campaign(database, subject: str, body: str) -> str:
+    campaign_id = str(uuid.uuid4())
+    await database[CAMPAIGNS].insert_one({
+        "_id": campaign_id,
+        "subject": subject,
+        "body": body,
+        "status": "draft",
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "checkpoint": "",
+        "sent": 0,
+        "failed": 0,
+        "failures": [],
+    })
+    return campaign_id
+
+
+async def send_campaign(
+    database,
+    campaign_id: str,
+    config: Optional[SmtpConfig] = None,
+    batch_size: int = BATCH_SIZE,
+    concurrency: int = CONCURRENCY,
+    rate: float = RATE_PER_SECOND,
+) -> Dict:
+    """Send (or resume sending) a campaign to every active subscriber after its checkpoint"""
+    from pymongo import ReturnDocument
+
+    if not SECRET:
+        raise NewsletterError("NEWSLETTER_SECRET must be set to sign unsubscribe links")
+    campaigns = database[CAMPAIGNS]
+    campaign = await campaigns.find_one({"_id": campaign_id})
+    if campaign is None:
+        raise NewsletterError(f"No campaign {campaign_id}")
+    if campaign["status"] == "sent":
+        return campaign
+
+    # Only one sender per campaign: a second run would mail every subscriber twice
+    owner = uuid.uuid4().hex
+    now = datetime.now(timezone.utc)
+    claimed = await campaigns.update_one(
+        {
+            "_id": campaign_id,
+            "status": {"$ne": "sent"},
+            "$or": [{"lockedBy": None}, {"lockedAt": {"$lt": now - SEND_LOCK_TIMEOUT}}],
+        },
+        {"$set": {"status": "sending", "lockedBy": owner, "lockedAt": now}},
+    )
+    if not claimed.modified_count:
+        raise NewsletterError(f"Campaign {campaign_id} is already being sent")
+    campaign = await campaigns.find_one({"_id": campaign_id})
+
+    config = config or SmtpConfig.from_env()
+    pool = SmtpPool(config, concurrency, rate)
+    cursor = database[SUBSCRIBERS].find(
+        {"status": "active", "email": {"$gt": campaign.get("checkpoint", "")}}, {"email": 1}
+    ).sort("email", 1).batch_size(batch_size)
+
+    async def flush(emails: List[str]):
+        messages = [render(campaign, email, config.from_addr) for email in emails]
+        failures = await pool.send_batch(messages)
+        result = await campaigns.update_one({"_id": campaign_id, "lockedBy": owner}, {
+            "$set": {"checkpoint": emails[-1], "lockedAt": datetime.now(timezone.utc)},
+            "$inc": {"sent": len(emails) - len(failures), "failed": len(failures)},
+            "$push": {"failures": {
+                "$each": [{"email": e, "error": err} for e, err in failures],
+                "$slice": -MAX_RECORDED_FAILURES,
+            }},
+        })
+        if not result.matched_count:
+            raise NewsletterError(f"Lost the send lock on campaign {campaign_id}")
+
+    try:
+        batch: List[str] = []
+        async for subscriber in cursor:
+            batch.append(subscriber["email"])
+            if len(batch) >= batch_size:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+    except BaseException:
+        # Leave it resumable right away rather than after SEND_LOCK_TIMEOUT
+        await campaigns.update_one({"_id": campaign_id, "lockedBy": owner}, {"$set": {"lockedBy": None}})
+        raise
+    finally:
+        await pool.close()
+
+    return await campaigns.find_one_and_update(
+        {"_id": campaign_id, "lockedBy": owner},
+        {"$set": {"status": "sent", "finishedAt": datetime.now(timezone.utc).isoformat(), "lockedBy": None}},
+        projection={"failures": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+# ============ CLI ============
+
+async def _main(argv):
+    from server import get_db
+    logging.basicConfig(level=logging.INFO)
+    database = get_db()
+    if len(argv) == 4 and argv[1] == 'create':
+        with open(argv[3]) as f:
+            print(await create_campaign(database, argv[2], f.read()))
+        return 0
+    if len(argv) == 3 and argv[1] == 'send':
+        started = time.monotonic()
+        result = await send_campaign(database, argv[2])
+        print(f"Sent {result['sent']}, failed {result['failed']} in {time.monotonic() - started:.1f}s")
+        return 0 if not result['failed'] else 1
+    if len(argv) == 3 and argv[1] == 'status':
+        print(await database[CAMPAIGNS].find_one({"_id": argv[2]}, {"failures": 0}))
+        return 0
+    print("usage: python newsletter.py create SUBJECT BODY_FILE | send ID | status ID")
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(_main(sys.argv)))
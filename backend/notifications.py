@@ -0,0 +1,134 @@
+"""Per-formType notification delivery: immediate, batched or daily digest
+
+NOTIFY_MODES sets the mode per form type, with `default` covering the rest:
+
+    NOTIFY_MODES="volunteer:batch:15,newsletter:digest,contact:batch:60,default:immediate"
+
+Immediate notifications are emailed as before. Everything else is stored in
+`pending_notifications` with the end of its window as dueAt (the next multiple of
+N minutes, or the next NOTIFY_DIGEST_HOUR o'clock UTC for digests). A scheduler
+claims whatever is due and sends it as one email grouped by form type, so a
+registration drive costs one SMTP session per window instead of one per form.
+
+The queue is shared by every tenant, since all notifications go to the one
+NOTIFY_EMAIL inbox; each entry records its tenant and chapter submissions are
+grouped separately in the digest.
+"""
+
+import asyncio
+import logging
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import tenants
+
+logger = logging.getLogger(__name__)
+
+PENDING_COLLECTION = 'pending_notifications'
+DIGEST_HOUR = int(os.environ.get('NOTIFY_DIGEST_HOUR', 8))
+POLL_SECONDS = int(os.environ.get('NOTIFY_POLL_SECONDS', 60))
+# A worker that died mid-send releases its claim after this long
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def _parse_modes(spec: str) -> Dict[str, Tuple[str, int]]:
+    """"volunteer:batch:15,contact:digest" -> {"volunteer": ("batch", 15), "contact": ("digest", 0)}"""
+    modes = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        form_type, _, rest = item.partition(':')
+        mode, _, minutes = rest.partition(':')
+        if mode not in ('immediate', 'batch', 'digest'):
+            raise ValueError(f"Unknown notification mode {mode!r} for {form_type}")
+        window = int(minutes or 15) if mode == 'batch' else 0
+        if mode == 'batch' and window <= 0:
+            raise ValueError(f"Batch window for {form_type} must be a positive number of minutes")
+        modes[form_type] = (mode, window)
+    return modes
+
+
+MODES = _parse_modes(os.environ.get('NOTIFY_MODES', ''))
+
+
+def mode_for(form_type: str) -> Tuple[str, int]:
+    return MODES.get(form_type) or MODES.get('default') or ('immediate', 0)
+
+
+def scheduler_needed() -> bool:
+    return any(mode != 'immediate' for mode, _ in MODES.values())
+
+
+def due_at(form_type: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """End of the window a notification created `now` belongs to; None for immediate"""
+    now = now or datetime.now(timezone.utc)
+    mode, minutes = mode_for(form_type)
+    if mode == 'batch':
+        window = minutes * 60
+        return datetime.fromtimestamp((int(now.timestamp()) // window + 1) * window, timezone.utc)
+    if mode == 'digest':
+        due = now.replace(hour=DIGEST_HOUR, minute=0, second=0, microsecond=0)
+        return due if due > now else due + timedelta(days=1)
+    return None
+
+
+async def enqueue(database, form_type: str, subject: str, body: str, due: datetime):
+    await database[PENDING_COLLECTION].insert_one({
+        "tenant": tenants.current.get(),
+        "formType": form_type,
+        "subject": subject,
+        "body": body,
+        "createdAt": datetime.now(timezone.utc),
+        "dueAt": due,
+        "claimedBy": None,
+    })
+
+
+def render_digest(notifications) -> Tuple[str, str]:
+    """One subject and body for a window's notifications, grouped by form type"""
+    groups = defaultdict(list)
+    for n in sorted(notifications, key=lambda n: n["createdAt"]):
+        tenant = n.get("tenant") or tenants.DEFAULT_TENANT
+        groups[n["formType"] if tenant == tenants.DEFAULT_TENANT else f"{tenant} {n['formType']}"].append(n)
+    counts = ", ".join(f"{form_type} {len(items)}" for form_type, items in sorted(groups.items()))
+    subject = f"UISN form submissions - {len(notifications)} new ({counts})"
+    sections = []
+    for form_type, items in sorted(groups.items()):
+        sections.append(f"==================== {form_type} ({len(items)}) ====================")
+        for n in items:
+            sections.append(f"--- {n['subject']} ({n['createdAt']:%Y-%m-%d %H:%M} UTC) ---\n{n['body'].strip()}\n")
+    return subject, "\n".join(sections)
+
+
+def _claimable(now: datetime) -> dict:
+    """Due notifications nobody holds, or whose holder stopped renewing the claim"""
+    return {"dueAt": {"$lte": now}, "$or": [{"claimedBy": None}, {"claimedAt": {"$lt": now - CLAIM_TIMEOUT}}]}
+
+
+async def send_due(database, send: Callable[[str, str], Awaitable[bool]]) -> int:
+    """Claim every due notification, send them as one grouped email, then delete them"""
+    pending = database[PENDING_COLLECTION]
+    now = datetime.now(timezone.utc)
+    claim = uuid.uuid4().hex
+    await pending.update_many(_claimable(now), {"$set": {"claimedBy": claim, "claimedAt": now}})
+    notifications = await pending.find({"claimedBy": claim}).to_list(None)
+    if not notifications:
+        return 0
+    subject, body = render_digest(notifications)
+    if not await send(subject, body):
+        # Leave them for the next tick rather than lose them
+        await pending.update_many({"claimedBy": claim}, {"$set": {"claimedBy": None}})
+        return 0
+    await pending.delete_many({"claimedBy": claim})
+    logger.info(f"Sent {len(notifications)} batched notifications in one email")
+    return len(notifications)
+
+
+async def run_scheduler(database, send: Callable[[str, str], Awaitable[bool]]):
+    while True:
+        try:
+            await send_due(database, send)
+        except Exception as e:
+            logger.error(f"Notification scheduler failed: {e}")
+        await asyncio.sleep(POLL_SECONDS)
@@ -0,0 +1,224 @@
+"""Pre-rendered HTML shells for program and event pages, plus sitemap.xml
+
+The SPA's own index.html is used as the template. Each page gets its title,
+description, canonical URL and Open Graph tags in <head>, and the content itself
+inside #root, where React replaces it once the bundle has loaded. Crawlers and
+link previews get a complete page without running any JavaScript.
+
+Pages are rendered from the public site payload (the same content /api/cms/all
+serves) and cached per document: a page is only re-rendered when its own
+document, or the template, changes.
+
+    SITE_URL=https://uisn.org            public origin of the frontend
+    FRONTEND_INDEX_URL / FRONTEND_INDEX_PATH   where to read the built index.html
+"""
+
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SITE_URL = os.environ.get('SITE_URL', '').rstrip('/')
+FRONTEND_INDEX_URL = os.environ.get('FRONTEND_INDEX_URL') or (f"{SITE_URL}/index.html" if SITE_URL else '')
+FRONTEND_INDEX_PATH = os.environ.get('FRONTEND_INDEX_PATH', '')
+TEMPLATE_TTL = int(os.environ.get('PRERENDER_TEMPLATE_TTL', 300))
+SITE_NAME = "UISN - Utah Intercollegiate Service Network"
+DESCRIPTION_LENGTH = 200
+
+# Used when no built index.html is reachable; still a complete page for crawlers
+FALLBACK_TEMPLATE = """<!doctype html>
+<html lang="en">
+    <head>
+        <meta charset="utf-8" />
+        <meta name="viewport" content="width=device-width, initial-scale=1" />
+        <title>UISN - Utah Intercollegiate Service Network</title>
+    </head>
+    <body>
+        <div id="root"></div>
+    </body>
+</html>
+"""
+
+_TITLE_RE = re.compile(r"<title>.*?</title>", re.S)
+_DESCRIPTION_RE = re.compile(r'<meta\s+name="description"[^>]*>\s*', re.S)
+_ROOT_RE = re.compile(r'<div id="root">\s*</div>')
+_HEAD_END_RE = re.compile(r'\s*</head>')
+
+
+def esc(value) -> str:
+    return html.escape(str(value or ''), quote=True)
+
+
+def _summary(text: str) -> str:
+    text = " ".join((text or '').split())
+    return text if len(text) <= DESCRIPTION_LENGTH else text[:DESCRIPTION_LENGTH - 1].rsplit(' ', 1)[0] + "…"
+
+# ============ TEMPLATE ============
+
+_template: Tuple[float, str, str] = (0.0, '', '')  # (loaded at, html, digest)
+
+
+def _read_template() -> str:
+    if FRONTEND_INDEX_PATH:
+        return Path(FRONTEND_INDEX_PATH).read_text()
+    if FRONTEND_INDEX_URL:
+        import urllib.request
+        with urllib.request.urlopen(FRONTEND_INDEX_URL, timeout=5) as response:
+            return response.read().decode()
+    return FALLBACK_TEMPLATE
+
+
+def cached_template() -> Optional[Tuple[str, str]]:
+    """(html, digest) if the template was loaded recently enough, without blocking"""
+    loaded_at, cached, digest = _template
+    if cached and time.monotonic() - loaded_at < TEMPLATE_TTL:
+        return cached, digest
+    return None
+
+
+def template() -> Tuple[str, str]:
+    """(html, digest) of the SPA's index.html, re-read at most every TEMPLATE_TTL seconds.
+    May block on disk or network, so call it in a thread."""
+    global _template
+    fresh_enough = cached_template()
+    if fresh_enough:
+        return fresh_enough
+    cached = _template[1]
+    try:
+        fresh = _read_template()
+        if not _ROOT_RE.search(fresh):
+            raise ValueError("template has no empty #root element")
+    except Exception as err:
+        logger.warning(f"Could not load prerender template: {err}")
+        fresh = cached or FALLBACK_TEMPLATE
+    _template = (time.monotonic(), fresh, hashlib.sha256(fresh.encode()).hexdigest()[:16])
+    return _template[1], _template[2]
+
+# ============ PAGES ============
+
+def _page(shell: str, title: str, description: str, path: str, body: str, site_url: str = SITE_URL,
+          image: Optional[str] = None, og_type: str = "website", json_ld: Optional[dict] = None) -> str:
+    url = f"{site_url}{path}"
+    head = [
+        f'<meta name="description" content="{esc(description)}" />',
+        f'<link rel="canonical" href="{esc(url)}" />',
+        f'<meta property="og:site_name" content="{esc(SITE_NAME)}" />',
+        f'<meta property="og:type" content="{esc(og_type)}" />',
+        f'<meta property="og:title" content="{esc(title)}" />',
+        f'<meta property="og:description" content="{esc(description)}" />',
+        f'<meta property="og:url" content="{esc(url)}" />',
+        f'<meta name="twitter:card" content="{"summary_large_image" if image else "summary"}" />',
+    ]
+    if image:
+        head.append(f'<meta property="og:image" content="{esc(image)}" />')
+    if json_ld:
+        # "</" would end the script element early
+        data = json.dumps(json_ld).replace("</", "<\\/")
+        head.append(f'<script type="application/ld+json">{data}</script>')
+
+    shell = _DESCRIPTION_RE.sub('', shell)
+    shell = _TITLE_RE.sub(lambda _: f"<title>{esc(title)} | UISN</title>", shell, count=1)
+    shell = _HEAD_END_RE.sub(lambda _: "\n        " + "\n        ".join(head) + "\n    </head>", shell, count=1)
+    return _ROOT_RE.sub(lambda _: f'<div id="root">{body}</div>', shell, count=1)
+
+
+def render_program(shell: str, program: dict, site_url: str = SITE_URL) -> str:
+    body = (
+        f'<main><article><h1>{esc(program["title"])}</h1>'
+        f'<p>{esc(program.get("description"))}</p>'
+        f'<ul><li>Frequency: {esc(program.get("frequency"))}</li>'
+        f'<li>Location: {esc(program.get("location"))}</li>'
+        f'<li>Impact: {esc(program.get("impact"))}</li></ul>'
+        f'</article></main>'
+    )
+    return _page(shell, program["title"], _summary(program.get("description")),
+                 f"/program/{program.get('slug') or program['id']}", body, site_url)
+
+
+def _event_image(event: dict) -> Optional[str]:
+    variants = event.get("imageVariants") or {}
+    return variants.get("src") or event.get("image") or None
+
+
+def render_event(shell: str, event: dict, site_url: str = SITE_URL) -> str:
+    when = " · ".join(filter(None, (event.get("date"), event.get("time"))))
+    body = (
+        f'<main><article><h1>{esc(event["title"])}</h1>'
+        f'<p><time datetime="{esc(event.get("date"))}">{esc(when)}</time> · {esc(event.get("location"))}</p>'
+        f'<p>{esc(event.get("description"))}</p>'
+        + (f'<p><a href="{esc(event["registrationLink"])}">Register</a></p>'
+           if event.get("registrationLink") not in (None, '', '#') else '')
+        + '</article></main>'
+    )
+    json_ld = {
+        "@context": "https://schema.org",
+        "@type": "Event",
+        "name": event["title"],
+        "startDate": event.get("date"),
+        "location": {"@type": "Place", "name": event.get("location")},
+        "description": event.get("description") or '',
+        "organizer": {"@type": "Organization", "name": SITE_NAME, "url": SITE_URL or None},
+    }
+    image = _event_image(event)
+    if image:
+        json_ld["image"] = image
+    description = _summary(event.get("description")) or f"{when} at {event.get('location')}"
+    return _page(shell, event["title"], description, f"/event/{event['id']}", body, site_url,
+                 image=image, og_type="article", json_ld=json_ld)
+
+
+def render_sitemap(payload: dict, site_url: str = SITE_URL) -> str:
+    urls = [(f"{site_url}/", None)]
+    for program in payload.get("programs", []):
+        if program.get("active", True):
+            urls.append((f"{site_url}/program/{program.get('slug') or program['id']}", program.get("updatedAt")))
+    for event in payload.get("events", []):
+        if event.get("active", True):
+            urls.append((f"{site_url}/event/{event['id']}", event.get("updatedAt")))
+    entries = []
+    for loc, updated in urls:
+        lastmod = f"<lastmod>{esc(updated[:10])}</lastmod>" if updated else ""
+        entries.append(f"  <url><loc>{esc(loc)}</loc>{lastmod}</url>")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        + "\n".join(entries) + "\n</urlset>\n"
+    )
+
+# ============ CACHE ============
+
+def fingerprint(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:32]
+
+
+class PageCache:
+    """Rendered pages keyed by path, re-rendered only when their fingerprint changes"""
+
+    def __init__(self):
+        self._pages: Dict[str, Tuple[str, str]] = {}
+
+    def get(self, path: str, key: str, render: Callable[[], str]) -> Tuple[str, str]:
+        """(body, etag) for `path`; `render` only runs if `key` differs from the cached one"""
+        cached = self._pages.get(path)
+        if cached and cached[0] == key:
+            return cached[1], f'"{key}"'
+        body = render()
+        self._pages[path] = (key, body)
+        return body, f'"{key}"'
+
+    def stats(self) -> Dict:
+        return {"pages": len(self._pages)}
+
+
+pages = PageCache()
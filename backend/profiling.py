@@ -0,0 +1,179 @@
+"""On-demand profiling of a single request
+
+Disabled unless PROFILING_TOKEN is set - the middleware isn't even installed then,
+so normal requests pay nothing. With it set, a request carrying the token in an
+`X-Profile` header (or a `__profile` query parameter) is run under a profiler:
+
+    mode=deterministic (default)  cProfile; stored as a .pstats file
+    mode=sampling                 stack sampler on the loop thread; stored as a
+                                  .folded file for speedscope / flamegraph.pl
+
+Pick the mode with `X-Profile-Mode` or `__profile_mode`. The response carries an
+`X-Profile-Id`; fetch the result from /api/diagnostics/profiles/{id} with the same
+token. The sampler only sees requests slower than its interval (default 2 ms), and
+cProfile's overhead inflates call-heavy code - use whichever fits. Both profilers
+see everything the event loop ran during the request, so profile on a quiet
+instance for a clean picture. Only one request per worker is profiled at a time;
+a profiled request that overlaps another gets 409 instead of a muddled profile.
+"""
+
+import asyncio
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).parent
+TOKEN = os.environ.get('PROFILING_TOKEN', '')
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles'))
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.002))
+MODES = ('deterministic', 'sampling')
+EXTENSIONS = {'deterministic': 'pstats', 'sampling': 'folded'}
+DOWNLOAD_PREFIX = '/api/diagnostics/profiles/'
+
+
+def enabled() -> bool:
+    return bool(TOKEN)
+
+
+def check_token(value: Optional[str]) -> bool:
+    # As bytes: compare_digest refuses str with non-ASCII characters
+    return enabled() and value is not None and hmac.compare_digest(value.encode(), TOKEN.encode())
+
+
+def profile_path(profile_id: str) -> Optional[Path]:
+    """Stored profile for an id, or None - ids are hex so they can't escape PROFILE_DIR"""
+    if not all(c in '0123456789abcdef' for c in profile_id):
+        return None
+    for ext in EXTENSIONS.values():
+        path = PROFILE_DIR / f"{profile_id}.{ext}"
+        if path.exists():
+            return path
+    return None
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfilingMiddleware:
+    """ASGI middleware so the whole request, including streamed bodies, is profiled"""
+
+    def __init__(self, app):
+        self.app = app
+        # cProfile state is per interpreter (and a second enable() raises on 3.12+),
+        # and the sampler sees the whole loop: overlapping profiles would mix
+        self._busy = asyncio.Lock()
+
+    def _requested(self, scope):
+        if scope["path"].startswith(DOWNLOAD_PREFIX):
+            return None  # fetching a profile shouldn't record another one
+        headers = dict(scope.get("headers") or [])
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        token = headers.get(b"x-profile", b"").decode("latin-1") or (query.get("__profile") or [None])[0]
+        if not check_token(token):
+            return None
+        mode = headers.get(b"x-profile-mode", b"").decode("latin-1")
+        mode = mode or (query.get("__profile_mode") or ["deterministic"])[0]
+        return mode if mode in MODES else "deterministic"
+
+    async def __call__(self, scope, receive, send):
+        mode = self._requested(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if self._busy.locked():
+            await JSONResponse({"detail": "Another request is being profiled"}, status_code=409)(scope, receive, send)
+            return
+        async with self._busy:
+            await self._profile(scope, receive, send, mode)
+
+    async def _profile(self, scope, receive, send, mode: str):
+        profile_id = uuid.uuid4().hex[:16]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (b"x-profile-id", profile_id.encode()),
+                    (b"x-profile-mode", mode.encode()),
+                ]
+            await send(message)
+
+        started = time.perf_counter()
+        if mode == "sampling":
+            profiler = StackSampler(threading.get_ident())
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            if mode == "sampling":
+                profiler.stop()
+            else:
+                profiler.disable()
+            await asyncio.to_thread(self._store, profiler, mode, profile_id)
+            logger.info(f"Profiled {scope['method']} {scope['path']} ({mode}, {elapsed * 1000:.1f} ms) as {profile_id}")
+
+    def _store(self, profiler, mode: str, profile_id: str):
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        path = PROFILE_DIR / f"{profile_id}.{EXTENSIONS[mode]}"
+        if mode == "sampling":
+            path.write_text(profiler.folded())
+        else:
+            profiler.dump_stats(str(path))
+
+
+def summarize(path: Path, limit: int = 40) -> str:
+    """Human-readable view of a stored profile"""
+    if path.suffix == ".folded":
+        return path.read_text()
+    import pstats  # only needed when a profile is downloaded
+    out = io.StringIO()
+    pstats.Stats(str(path), stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,137 @@
+"""Keep serving the public site when MongoDB is slow or unreachable
+
+CircuitBreaker fails fast after repeated DB errors instead of making every request
+wait out serverSelectionTimeoutMS, and Snapshot keeps the last good public payload
+on local disk so it can be served while the breaker is open and right after a cold boot.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the DB while the breaker is open"""
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; after `reset_timeout`
+    one trial call is let through (half-open) and its outcome closes or re-opens it"""
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0, call_timeout: float = 5.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    async def call(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        state = self.state
+        if state == "open" or (state == "half-open" and self._trial_running):
+            raise CircuitOpenError("Database circuit is open")
+        trial = state == "half-open"
+        if trial:
+            self._trial_running = True
+        try:
+            result = await asyncio.wait_for(factory(), timeout=self.call_timeout)
+        except Exception:
+            self._record_failure(trial)
+            raise
+        finally:
+            if trial:
+                self._trial_running = False
+        self.failures = 0
+        if self.opened_at is not None:
+            logger.info("Database circuit closed")
+        self.opened_at = None
+        return result
+
+    def _record_failure(self, trial: bool):
+        self.failures += 1
+        if trial or self.failures >= self.failure_threshold:
+            if self.opened_at is None or trial:
+                self.trips += 1
+                logger.warning(f"Database circuit opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "trips": self.trips}
+
+
+class Snapshot:
+    """Last known good public_site document, persisted atomically as JSON"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.site: Optional[dict] = None
+        self.saved_at: Optional[float] = None
+        self._saving = asyncio.Lock()
+
+    def load(self) -> bool:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.site = data["site"]
+            self.saved_at = data["savedAt"]
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable snapshot {self.path}: {e}")
+            return False
+
+    @property
+    def version(self) -> Optional[int]:
+        return self.site.get("version") if self.site else None
+
+    def age(self) -> Optional[int]:
+        return int(time.time() - self.saved_at) if self.saved_at else None
+
+    def _write(self, data: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=f".{self.path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    async def save(self, site: dict):
+        # One write at a time, so a save that started earlier can't land on top of a newer one
+        async with self._saving:
+            version = site.get("version")
+            if version is not None and self.version is not None and version < self.version:
+                return
+            saved_at = time.time()
+            try:
+                await asyncio.to_thread(self._write, {"savedAt": saved_at, "site": site})
+            except Exception as e:
+                logger.warning(f"Failed to write snapshot {self.path}: {e}")
+                return
+            self.site = site
+            self.saved_at = saved_at
+
+    def touch(self):
+        """The DB just confirmed this version is current"""
+        self.saved_at = time.time()
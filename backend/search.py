@@ -0,0 +1,147 @@
+"""In-process inverted index over CMS content with prefix matching and BM25 ranking"""
+
+import math
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Collections that are searchable, and which fields of each contribute terms.
+# Title terms are counted twice so a title hit outranks the same word in a body.
+SEARCH_FIELDS = {
+    "programs": ("title", "description"),
+    "events": ("title", "description"),
+    "announcements": ("title", "content"),
+    "opportunities": ("title", "description", "skills"),
+}
+TITLE_BOOST = 2
+
+K1 = 1.2
+B = 0.75
+MAX_PREFIX_EXPANSIONS = 50
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or our the to with your you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _doc_terms(collection: str, doc: dict) -> List[str]:
+    terms = []
+    for field in SEARCH_FIELDS[collection]:
+        value = doc.get(field)
+        if not value:
+            continue
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value)
+        tokens = tokenize(str(value))
+        terms.extend(tokens * TITLE_BOOST if field == "title" else tokens)
+    return terms
+
+
+class SearchIndex:
+    """Postings are term -> {doc key: term frequency}; a sorted term list serves prefix lookups"""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._postings: Dict[str, Dict[Tuple[str, str], int]] = defaultdict(dict)
+        self._terms: List[str] = []
+        self._doc_terms: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._lengths: Dict[Tuple[str, str], int] = {}
+        self._docs: Dict[Tuple[str, str], dict] = {}
+        self._total_length = 0
+        self.version = None  # public site version the index was built from
+
+    def build(self, data: Dict[str, Iterable[dict]], version=None):
+        """Rebuild from a full load of the searchable collections"""
+        self.clear()
+        for collection in SEARCH_FIELDS:
+            for doc in data.get(collection) or []:
+                self.upsert(collection, doc)
+        self.version = version
+
+    def upsert(self, collection: str, doc: dict):
+        if collection not in SEARCH_FIELDS:
+            return
+        key = (collection, str(doc.get("id")))
+        self.remove(collection, key[1])
+        if not doc.get("active", True):
+            return
+
+        counts: Dict[str, int] = defaultdict(int)
+        for term in _doc_terms(collection, doc):
+            counts[term] += 1
+        for term, tf in counts.items():
+            postings = self._postings[term]
+            if not postings:
+                self._terms.insert(bisect_left(self._terms, term), term)
+            postings[key] = tf
+        self._doc_terms[key] = dict(counts)
+        self._lengths[key] = sum(counts.values())
+        self._docs[key] = doc
+        self._total_length += self._lengths[key]
+
+    def remove(self, collection: str, doc_id: str):
+        key = (collection, str(doc_id))
+        counts = self._doc_terms.pop(key, None)
+        if counts is None:
+            return
+        self._docs.pop(key, None)
+        self._total_length -= self._lengths.pop(key)
+        for term in counts:
+            postings = self._postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+                i = bisect_left(self._terms, term)
+                if i < len(self._terms) and self._terms[i] == term:
+                    self._terms.pop(i)
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        i = bisect_left(self._terms, prefix)
+        matches = []
+        while i < len(self._terms) and self._terms[i].startswith(prefix) and len(matches) < MAX_PREFIX_EXPANSIONS:
+            matches.append(self._terms[i])
+            i += 1
+        return matches
+
+    def search(self, query: str, limit: int = 20, collection: Optional[str] = None) -> List[dict]:
+        """Rank documents by BM25; the last query token also matches as a prefix"""
+        tokens = tokenize(query)
+        if not tokens or not self._docs:
+            return []
+
+        n_docs = len(self._docs)
+        avg_length = self._total_length / n_docs
+        scores: Dict[Tuple[str, str], float] = defaultdict(float)
+
+        for i, token in enumerate(tokens):
+            terms = self._expand_prefix(token) if i == len(tokens) - 1 else [token]
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, tf in postings.items():
+                    if collection and key[0] != collection:
+                        continue
+                    norm = tf * (K1 + 1) / (tf + K1 * (1 - B + B * self._lengths[key] / avg_length))
+                    scores[key] += idf * norm
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {"type": key[0], "id": key[1], "score": round(score, 4), "item": self._docs[key]}
+            for key, score in ranked
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        return {"documents": len(self._docs), "terms": len(self._terms)}
+
+
+index = SearchIndex()
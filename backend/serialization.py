@@ -0,0 +1,118 @@
+"""Opt-in fast response path for CMS reads
+
+With FAST_SERIALIZATION=1, read handlers skip re-validating every document through
+their response_model and jsonable_encoder. They project each Mongo document onto the
+model's fields (filling defaults, dropping internal fields such as tenant and
+updatedAt) and stream it through orjson instead, so both paths return the same JSON.
+
+The fast path trusts field types rather than checking them. The Pydantic models are
+translated into MongoDB $jsonSchema collection validators that check inserts and
+updates; documents written before a validator existed are only counted and logged
+at startup, not rejected or rewritten.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Type, Union
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+FAST_SERIALIZATION = os.environ.get('FAST_SERIALIZATION', '').lower() in ('1', 'true', 'yes')
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder - still skips Pydantic
+    orjson = None
+
+
+def dumps(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def project(data: Union[dict, list], model: Type[BaseModel]) -> Union[dict, list]:
+    """Keep only `model`'s fields, with its defaults for missing ones - what response_model filtering returns"""
+    fields = [(name, field) for name, field in model.model_fields.items()]
+
+    def one(doc: dict) -> dict:
+        return {name: doc[name] if name in doc else field.get_default(call_default_factory=True) for name, field in fields}
+
+    return [one(doc) for doc in data] if isinstance(data, list) else one(data)
+
+
+# ============ $jsonSchema FROM PYDANTIC ============
+
+_BSON_TYPES = {
+    "string": "string",
+    "boolean": "bool",
+    "integer": ["int", "long"],
+    "number": ["double", "int", "long", "decimal"],
+    "array": "array",
+    "object": "object",
+    "null": "null",
+}
+
+
+def _bson_types(schema: dict) -> list:
+    if "anyOf" in schema:
+        types = []
+        for option in schema["anyOf"]:
+            types.extend(_bson_types(option))
+        return types
+    bson_type = _BSON_TYPES.get(schema.get("type"))
+    if bson_type is None:
+        return []
+    return bson_type if isinstance(bson_type, list) else [bson_type]
+
+
+def _convert(schema: dict) -> dict:
+    converted: Dict[str, Any] = {}
+    types = _bson_types(schema)
+    if types:
+        converted["bsonType"] = types[0] if len(types) == 1 else types
+    items = schema.get("items") or next(
+        (o.get("items") for o in schema.get("anyOf", []) if o.get("items")), None
+    )
+    if items:
+        converted["items"] = _convert(items)
+    return converted
+
+
+def mongo_json_schema(model: Type[BaseModel]) -> dict:
+    """Translate a flat Pydantic model into a MongoDB $jsonSchema document.
+
+    Unknown fields (including _id) stay allowed so existing documents keep validating.
+    """
+    schema = model.model_json_schema()
+    return {
+        "bsonType": "object",
+        "required": schema.get("required", []),
+        "properties": {name: _convert(prop) for name, prop in schema["properties"].items()},
+    }
+
+
+async def apply_validators(database, models: Dict[str, Type[BaseModel]]):
+    """Install or update a $jsonSchema validator on each collection.
+
+    validationLevel="moderate" leaves documents that already fail the schema alone
+    until they're next updated, so those are counted and logged here.
+    """
+    existing = set(await database.list_collection_names())
+    for collection, model in models.items():
+        validator = {"$jsonSchema": mongo_json_schema(model)}
+        invalid = await database[collection].count_documents({"$nor": [validator]}) if collection in existing else 0
+        if invalid:
+            logger.warning(f"{invalid} existing documents in {collection} don't match the {model.__name__} schema")
+        if collection in existing:
+            await database.command(
+                "collMod", collection, validator=validator, validationLevel="moderate", validationAction="error"
+            )
+        else:
+            await database.create_collection(
+                collection, validator=validator, validationLevel="moderate", validationAction="error"
+            )
+        logger.info(f"Applied $jsonSchema validator to {collection}")
@@ -1,7 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException
-from dotenv import load_dotenv
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
@@ -9,20 +8,43 @@ from pydantic import BaseModel, Field, ConfigDict
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import asyncio
+import importlib
 
+# Cold starts: Motor/pymongo, smtplib, email and dotenv are imported on first use,
+# so /api/health and snapshot-backed reads don't wait for them. See
+# benchmarks/cold_start_bench.py.
 ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+if (ROOT_DIR / '.env').exists():
+    # Before the local modules below, which read their settings at import time
+    from dotenv import load_dotenv
+    load_dotenv(ROOT_DIR / '.env')
+
+import media  # noqa: E402
+import uploads  # noqa: E402
+import search  # noqa: E402
+import analytics  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+from resilience import CircuitBreaker, CircuitOpenError  # noqa: E402
+import serialization  # noqa: E402
+import migrations  # noqa: E402
+import cache_policy  # noqa: E402
+import loop_monitor  # noqa: E402
+import profiling  # noqa: E402
+import log_config  # noqa: E402
+import consistency  # noqa: E402
+import archive  # noqa: E402
+import newsletter  # noqa: E402
+import notifications  # noqa: E402
+import dashboard  # noqa: E402
+import prerender  # noqa: E402
+import tenants  # noqa: E402
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+log_config.configure()
 logger = logging.getLogger(__name__)
 
 # MongoDB connection - optimized for cold starts
-mongo_url = os.environ['MONGO_URL']
 _client = None
 _db = None
 
@@ -30,6 +52,8 @@ def get_db():
     global _client, _db
     if _client is None:
         logger.info("Creating MongoDB connection...")
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_url = os.environ['MONGO_URL']
         if mongo_url.startswith('mongodb+srv'):
             import certifi
             _client = AsyncIOMotorClient(
@@ -41,8 +65,8 @@ def get_db():
                 connectTimeoutMS=10000,
                 socketTimeoutMS=20000,
                 retryWrites=True,
-                w=1,  # Faster writes (don't wait for majority)
-                journal=False,  # Faster for non-critical data
+                w=1,  # CMS default; form submissions use the submission-write profile
+                journal=False,
             )
         else:
             _client = AsyncIOMotorClient(
@@ -56,6 +80,10 @@ def get_db():
         logger.info("MongoDB connection created")
     return _db
 
+def col(name: str, profile: str):
+    """A collection with one of the consistency profiles applied"""
+    return consistency.collection(db(), name, profile)
+
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
@@ -70,15 +98,24 @@ async def ping():
     try:
         database = get_db()
         await database.command('ping')
-        return {"status": "ok", "db": "connected"}
+        return {"status": "ok", "db": "connected", "circuit": db_breaker.state}
     except Exception as e:
         logger.error(f"Ping failed: {e}")
-        return {"status": "ok", "db": "connecting"}
+        return {"status": "ok", "db": "connecting", "circuit": db_breaker.state}
 
 # Helper to get database - lazy initialization
 def db():
     return get_db()
 
+# Fire-and-forget tasks are kept referenced here so they can't be garbage collected mid-flight
+_background_tasks = set()
+
+def spawn(coro):
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
 # ============ MODELS ============
 
 class Program(BaseModel):
@@ -150,195 +187,409 @@ class FormSubmission(BaseModel):
     data: Dict[str, Any]
     submittedAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Collections whose writes are validated by a $jsonSchema generated from their model
+CMS_MODELS = {
+    "programs": Program,
+    "events": Event,
+    "announcements": Announcement,
+    "opportunities": Opportunity,
+    "stats": Stat,
+    "impact_stories": ImpactStory,
+    "about": AboutContent,
+    "settings": Settings,
+}
+
 # ============ EMAIL FUNCTION ============
 
+NOTIFY_EMAIL = 'utahintercollegiateservicenetw@gmail.com'
+# A stalled SMTP server would otherwise hold a worker thread (and its task) forever
+SMTP_TIMEOUT = float(os.environ.get('SMTP_TIMEOUT_SECONDS', 30))
+# Immediate notification emails in flight at once, and waiting for a slot
+EMAIL_CONCURRENCY = int(os.environ.get('EMAIL_CONCURRENCY', 2))
+MAX_PENDING_EMAILS = int(os.environ.get('MAX_PENDING_EMAILS', 100))
+
+def _send_smtp(msg, config: newsletter.SmtpConfig):
+    import smtplib
+    server = smtplib.SMTP(config.host, config.port, timeout=SMTP_TIMEOUT)
+    if config.starttls:
+        server.starttls()
+    if config.password:
+        server.login(config.username, config.password)
+    server.send_message(msg)
+    server.quit()
+
 async def send_email(subject: str, body: str, to_email: str = None):
-    """Send email using Gmail SMTP"""
+    """Send email through Gmail SMTP, or SMTP_HOST / SMTP_PORT when set"""
     try:
-        from_email = os.environ.get('GMAIL_USER', 'utahintercollegiateservicenetw@gmail.com')
-        password = os.environ.get('GMAIL_APP_PASSWORD', '')
+        config = newsletter.SmtpConfig.from_env()
+        from_email = config.username
         to_email = to_email or from_email
         
-        if not password:
-            logging.warning("No Gmail password configured. Email not sent.")
+        # A relay named with SMTP_HOST (or a local sink) may not need a login
+        if not config.password and 'SMTP_HOST' not in os.environ:
+            logger.warning("No Gmail password configured. Email not sent.")
             return False
         
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
         msg = MIMEMultipart()
         msg['From'] = from_email
         msg['To'] = to_email
         msg['Subject'] = subject
         msg.attach(MIMEText(body, 'plain'))
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(from_email, password)
-        server.send_message(msg)
-        server.quit()
+        # smtplib blocks; run it off the event loop
+        await asyncio.to_thread(_send_smtp, msg, config)
         
-        logging.info(f"Email sent successfully to {to_email}")
+        logger.info(f"Email sent successfully to {to_email}")
         return True
     except Exception as e:
-        logging.error(f"Failed to send email: {str(e)}")
+        logger.error(f"Failed to send email: {str(e)}")
         return False
 
+_email_slots = asyncio.Semaphore(EMAIL_CONCURRENCY)
+_pending_emails = 0
+email_stats = {"sent": 0, "failed": 0, "dropped": 0}
+
+async def _send_notification(subject: str, body: str):
+    global _pending_emails
+    try:
+        async with _email_slots:
+            sent = await send_email(subject, body, NOTIFY_EMAIL)
+        email_stats["sent" if sent else "failed"] += 1
+    finally:
+        _pending_emails -= 1
+
+def notify_now(subject: str, body: str):
+    """Send a notification email in the background, at most EMAIL_CONCURRENCY at a time.
+
+    Past MAX_PENDING_EMAILS waiting sends the email is dropped rather than queued
+    without bound; the submission itself is already stored.
+    """
+    global _pending_emails
+    if _pending_emails >= MAX_PENDING_EMAILS:
+        email_stats["dropped"] += 1
+        logger.warning(f"Dropping notification email, {_pending_emails} already pending: {subject}")
+        return
+    _pending_emails += 1
+    spawn(_send_notification(subject, body))
+
 # ============ CMS ENDPOINTS ============
 
+def stamped(model: BaseModel) -> dict:
+    """Document to write for a CMS model, with its last-modified time"""
+    doc = tenants.stamp(model.model_dump())
+    doc["updatedAt"] = datetime.now(timezone.utc).isoformat()
+    return doc
+
+# Public reads go through a single-flight layer: when many visitors miss at once
+# (right after a deploy or an admin write) they share one query per key instead of
+# each taking a connection from the small Motor pool.
+reads = SingleFlight()
+
+# DB reads also go through a circuit breaker. While it's open (or a read fails) the
+# public endpoints answer from the last known good snapshot with staleness headers.
+db_breaker = CircuitBreaker(
+    failure_threshold=int(os.environ.get('DB_BREAKER_THRESHOLD', 3)),
+    reset_timeout=float(os.environ.get('DB_BREAKER_RESET_SECONDS', 30)),
+    call_timeout=float(os.environ.get('DB_CALL_TIMEOUT_SECONDS', 5)),
+)
+# Snapshots, search indexes and page caches are kept per tenant, created on first use
+site_states = tenants.TenantStates(Path(os.environ.get('SNAPSHOT_PATH', ROOT_DIR / 'public_site.snapshot.json')))
+
+def site_state() -> tenants.TenantState:
+    """Cached state for the current request's tenant"""
+    return site_states.get()
+
+# How long after a build a lower version from Mongo may still be a replica catching up
+MAX_REPLICA_LAG = float(os.environ.get('MAX_REPLICA_LAG_SECONDS', 60))
+
+def _built_at(site: dict) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(site["builtAt"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def _is_lagging(site: dict, newer: dict) -> bool:
+    """Is `site` an older build than `newer`, read from a secondary that hasn't caught up?
+
+    The version counter restarts when content is restored into a fresh database, so
+    a lower version alone doesn't mean older: it must also have been built before
+    `newer`, and lag only explains it for MAX_REPLICA_LAG seconds after that build.
+    """
+    if site.get("version", 0) >= newer.get("version", 0):
+        return False
+    built, newer_built = _built_at(site), _built_at(newer)
+    if built is None or newer_built is None or built > newer_built:
+        return False
+    return (datetime.now(timezone.utc) - newer_built).total_seconds() < MAX_REPLICA_LAG
+
+# Collection -> key in the public payload, for serving single collections from the snapshot
+SNAPSHOT_KEYS = {
+    "programs": "programs",
+    "events": "events",
+    "stats": "stats",
+    "impact_stories": "impactStories",
+    "about": "about",
+    "announcements": "announcements",
+    "opportunities": "opportunities",
+}
+
+def mark_stale(response: Response, age: Optional[int]):
+    response.headers["X-Served-From"] = "snapshot"
+    if age is not None:
+        response.headers["X-Snapshot-Age"] = str(age)
+
+async def guarded_read(key: str, factory, collection: str, response: Response):
+    snapshot = site_state().snapshot
+    try:
+        return await db_breaker.call(lambda: reads.do(tenants.key(key), factory))
+    except Exception as e:
+        if snapshot.site and collection in SNAPSHOT_KEYS:
+            if not isinstance(e, CircuitOpenError):
+                logger.warning(f"Serving {collection} from snapshot: {e!r}")
+            mark_stale(response, snapshot.age())
+            return snapshot.site["payload"][SNAPSHOT_KEYS[collection]]
+        raise HTTPException(status_code=503, detail="Content temporarily unavailable")
+
+def respond(data, response: Response, model: Optional[type] = None):
+    """With FAST_SERIALIZATION, project documents onto `model` and hand them straight to orjson.
+
+    Returning a Response bypasses response_model validation and jsonable_encoder, so
+    the projection does response_model's field filtering instead.
+    """
+    if not serialization.FAST_SERIALIZATION:
+        return data
+    if model is not None:
+        data = serialization.project(data, model)
+    return Response(serialization.dumps(data), media_type="application/json", headers=dict(response.headers))
+
+# The tenant key is internal; responses and the public payload never include it
+CONTENT_PROJECTION = {"_id": 0, "tenant": 0}
+
+async def find_all(collection: str, response: Response):
+    query = tenants.query()
+    return await guarded_read(
+        f"{collection}.find", lambda: col(collection, "content-read").find(query, CONTENT_PROJECTION).to_list(100),
+        collection, response,
+    )
+
+async def find_one(collection: str, response: Response):
+    query = tenants.query()
+    return await guarded_read(
+        f"{collection}.find_one", lambda: col(collection, "content-read").find_one(query, CONTENT_PROJECTION),
+        collection, response,
+    )
+
 # Programs
 @api_router.get("/cms/programs", response_model=List[Program])
-async def get_programs():
-    programs = await db().programs.find({}, {"_id": 0}).to_list(100)
-    return programs
+async def get_programs(response: Response):
+    return respond(await find_all("programs", response), response, Program)
 
 @api_router.post("/cms/programs")
 async def create_program(program: Program):
-    await db().programs.insert_one(program.model_dump())
+    await db().programs.insert_one(stamped(program))
+    site_state().search.upsert("programs", program.model_dump())
+    await content_changed("programs")
     return {"success": True}
 
 @api_router.put("/cms/programs/{program_id}")
 async def update_program(program_id: str, program: Program):
-    await db().programs.update_one({"id": program_id}, {"$set": program.model_dump()})
+    result = await db().programs.update_one(tenants.query(id=program_id), {"$set": stamped(program)})
+    if result.matched_count:
+        site_state().search.remove("programs", program_id)
+        site_state().search.upsert("programs", program.model_dump())
+    await content_changed("programs")
     return {"success": True}
 
 @api_router.delete("/cms/programs/{program_id}")
 async def delete_program(program_id: str):
-    await db().programs.delete_one({"id": program_id})
+    await db().programs.delete_one(tenants.query(id=program_id))
+    site_state().search.remove("programs", program_id)
+    await content_changed("programs")
     return {"success": True}
 
 # Events
+# Registered ahead of the /cms/events/{event_id} routes so "events.ics" is never taken for an id
+@api_router.get("/cms/events.ics")
+async def get_events_calendar(request: Request):
+    """iCalendar feed of active events; re-rendered only when events change"""
+    site, stale_age = await get_public_site()
+    cached = site_state().feed.get(site["version"], site["payload"]["events"])
+    headers = {"ETag": cached["etag"], "Last-Modified": cached["last_modified"]}
+    if request.headers.get('if-none-match') == cached["etag"] or (
+        'if-none-match' not in request.headers and request.headers.get('if-modified-since') == cached["last_modified"]
+    ):
+        response = Response(status_code=304, headers=headers)
+    else:
+        response = Response(cached["body"], media_type="text/calendar; charset=utf-8", headers=headers)
+    if stale_age is not None:
+        mark_stale(response, stale_age)
+    return response
+
 @api_router.get("/cms/events", response_model=List[Event])
-async def get_events():
-    events = await db().events.find({}, {"_id": 0}).to_list(100)
-    return events
+async def get_events(response: Response):
+    return respond(await find_all("events", response), response, Event)
 
 @api_router.post("/cms/events")
 async def create_event(event: Event):
-    await db().events.insert_one(event.model_dump())
+    await db().events.insert_one(stamped(event))
+    site_state().search.upsert("events", event.model_dump())
+    await content_changed("events")
     return {"success": True}
 
 @api_router.put("/cms/events/{event_id}")
 async def update_event(event_id: str, event: Event):
-    await db().events.update_one({"id": event_id}, {"$set": event.model_dump()})
+    result = await db().events.update_one(tenants.query(id=event_id), {"$set": stamped(event)})
+    if result.matched_count:
+        site_state().search.remove("events", event_id)
+        site_state().search.upsert("events", event.model_dump())
+    await content_changed("events")
     return {"success": True}
 
 @api_router.delete("/cms/events/{event_id}")
 async def delete_event(event_id: str):
-    await db().events.delete_one({"id": event_id})
+    await db().events.delete_one(tenants.query(id=event_id))
+    site_state().search.remove("events", event_id)
+    await content_changed("events")
     return {"success": True}
 
 # Stats
 @api_router.get("/cms/stats", response_model=List[Stat])
-async def get_stats():
-    stats = await db().stats.find({}, {"_id": 0}).to_list(100)
-    return stats
+async def get_stats(response: Response):
+    return respond(await find_all("stats", response), response, Stat)
 
 @api_router.put("/cms/stats/{stat_id}")
 async def update_stat(stat_id: str, stat: Stat):
-    await db().stats.update_one({"id": stat_id}, {"$set": stat.model_dump()})
+    await db().stats.update_one(tenants.query(id=stat_id), {"$set": stamped(stat)})
+    await content_changed("stats")
     return {"success": True}
 
 # Impact Stories
 @api_router.get("/cms/impact-stories", response_model=List[ImpactStory])
-async def get_impact_stories():
-    stories = await db().impact_stories.find({}, {"_id": 0}).to_list(100)
-    return stories
+async def get_impact_stories(response: Response):
+    return respond(await find_all("impact_stories", response), response, ImpactStory)
 
 @api_router.post("/cms/impact-stories")
 async def create_impact_story(story: ImpactStory):
-    await db().impact_stories.insert_one(story.model_dump())
+    await db().impact_stories.insert_one(stamped(story))
+    await content_changed("impact_stories")
     return {"success": True}
 
 @api_router.put("/cms/impact-stories/{story_id}")
 async def update_impact_story(story_id: str, story: ImpactStory):
-    await db().impact_stories.update_one({"id": story_id}, {"$set": story.model_dump()})
+    await db().impact_stories.update_one(tenants.query(id=story_id), {"$set": stamped(story)})
+    await content_changed("impact_stories")
     return {"success": True}
 
 @api_router.delete("/cms/impact-stories/{story_id}")
 async def delete_impact_story(story_id: str):
-    await db().impact_stories.delete_one({"id": story_id})
+    await db().impact_stories.delete_one(tenants.query(id=story_id))
+    await content_changed("impact_stories")
     return {"success": True}
 
 # About Content
 @api_router.get("/cms/about", response_model=AboutContent)
-async def get_about():
-    about = await db().about.find_one({}, {"_id": 0})
+async def get_about(response: Response):
+    about = await find_one("about", response)
     if not about:
         return AboutContent(mission="", story="")
-    return about
+    return respond(about, response, AboutContent)
 
 @api_router.put("/cms/about")
 async def update_about(about: AboutContent):
-    await db().about.replace_one({}, about.model_dump(), upsert=True)
+    await db().about.replace_one(tenants.query(), stamped(about), upsert=True)
+    await content_changed("about")
     return {"success": True}
 
 # Announcements
 @api_router.get("/cms/announcements", response_model=List[Announcement])
-async def get_announcements():
-    announcements = await db().announcements.find({}, {"_id": 0}).to_list(100)
-    return announcements
+async def get_announcements(response: Response):
+    return respond(await find_all("announcements", response), response, Announcement)
 
 @api_router.post("/cms/announcements")
 async def create_announcement(announcement: Announcement):
-    await db().announcements.insert_one(announcement.model_dump())
+    await db().announcements.insert_one(stamped(announcement))
+    site_state().search.upsert("announcements", announcement.model_dump())
+    await content_changed("announcements")
     return {"success": True}
 
 @api_router.put("/cms/announcements/{announcement_id}")
 async def update_announcement(announcement_id: str, announcement: Announcement):
-    await db().announcements.update_one({"id": announcement_id}, {"$set": announcement.model_dump()})
+    result = await db().announcements.update_one(tenants.query(id=announcement_id), {"$set": stamped(announcement)})
+    if result.matched_count:
+        site_state().search.remove("announcements", announcement_id)
+        site_state().search.upsert("announcements", announcement.model_dump())
+    await content_changed("announcements")
     return {"success": True}
 
 @api_router.delete("/cms/announcements/{announcement_id}")
 async def delete_announcement(announcement_id: str):
-    await db().announcements.delete_one({"id": announcement_id})
+    await db().announcements.delete_one(tenants.query(id=announcement_id))
+    site_state().search.remove("announcements", announcement_id)
+    await content_changed("announcements")
     return {"success": True}
 
 # Opportunities
 @api_router.get("/cms/opportunities", response_model=List[Opportunity])
-async def get_opportunities():
-    opportunities = await db().opportunities.find({}, {"_id": 0}).to_list(100)
-    return opportunities
+async def get_opportunities(response: Response):
+    return respond(await find_all("opportunities", response), response, Opportunity)
 
 @api_router.post("/cms/opportunities")
 async def create_opportunity(opportunity: Opportunity):
-    await db().opportunities.insert_one(opportunity.model_dump())
+    await db().opportunities.insert_one(stamped(opportunity))
+    site_state().search.upsert("opportunities", opportunity.model_dump())
+    await content_changed("opportunities")
     return {"success": True}
 
 @api_router.put("/cms/opportunities/{opportunity_id}")
 async def update_opportunity(opportunity_id: str, opportunity: Opportunity):
-    await db().opportunities.update_one({"id": opportunity_id}, {"$set": opportunity.model_dump()})
+    result = await db().opportunities.update_one(tenants.query(id=opportunity_id), {"$set": stamped(opportunity)})
+    if result.matched_count:
+        site_state().search.remove("opportunities", opportunity_id)
+        site_state().search.upsert("opportunities", opportunity.model_dump())
+    await content_changed("opportunities")
     return {"success": True}
 
 @api_router.delete("/cms/opportunities/{opportunity_id}")
 async def delete_opportunity(opportunity_id: str):
-    await db().opportunities.delete_one({"id": opportunity_id})
+    await db().opportunities.delete_one(tenants.query(id=opportunity_id))
+    site_state().search.remove("opportunities", opportunity_id)
+    await content_changed("opportunities")
     return {"success": True}
 
 # Settings
 @api_router.get("/cms/settings", response_model=Settings)
-async def get_settings():
-    settings = await db().settings.find_one({}, {"_id": 0})
+async def get_settings(response: Response):
+    settings = await find_one("settings", response)
     if not settings:
         return Settings(donateEnabled=False, emailNotifications="utahintercollegiateservicenetw@gmail.com")
-    return settings
+    return respond(settings, response, Settings)
 
 @api_router.put("/cms/settings")
 async def update_settings(settings: Settings):
-    await db().settings.replace_one({}, settings.model_dump(), upsert=True)
+    await db().settings.replace_one(tenants.query(), tenants.stamp(settings.model_dump()), upsert=True)
+    await cache_policy.purge([tenants.key("settings")])
     return {"success": True}
 
-# Combined endpoint - fetch all CMS data in one request for faster loading
-@api_router.get("/cms/all")
-async def get_all_cms_data():
-    """Fetch all CMS content in a single request for faster page load"""
-    database = db()
+async def load_cms_data():
+    """Load every public CMS collection concurrently.
+
+    Runs right after writes to rebuild the public site, so it reads through the
+    content-write profile (primary) rather than content-read.
+    """
+    def content(name):
+        return col(name, "content-write")
     
+    query = tenants.query()
     programs, events, stats, impact_stories, about, announcements, opportunities = await asyncio.gather(
-        database.programs.find({}, {"_id": 0}).to_list(100),
-        database.events.find({}, {"_id": 0}).to_list(100),
-        database.stats.find({}, {"_id": 0}).to_list(100),
-        database.impact_stories.find({}, {"_id": 0}).to_list(100),
-        database.about.find_one({}, {"_id": 0}),
-        database.announcements.find({}, {"_id": 0}).to_list(100),
-        database.opportunities.find({}, {"_id": 0}).to_list(100),
+        content("programs").find(query, CONTENT_PROJECTION).to_list(100),
+        content("events").find(query, CONTENT_PROJECTION).to_list(100),
+        content("stats").find(query, CONTENT_PROJECTION).to_list(100),
+        content("impact_stories").find(query, CONTENT_PROJECTION).to_list(100),
+        content("about").find_one(query, CONTENT_PROJECTION),
+        content("announcements").find(query, CONTENT_PROJECTION).to_list(100),
+        content("opportunities").find(query, CONTENT_PROJECTION).to_list(100),
     )
     
     return {
@@ -351,54 +602,140 @@ async def get_all_cms_data():
         "opportunities": opportunities,
     }
 
+# ============ PUBLIC SITE PAYLOAD ============
+# The fully assembled /api/cms/all payload is materialized into one document so a
+# cold worker loads the whole site with a single find_one instead of seven queries.
+# Each tenant has its own document ("current" / "<tenant>:current") and version counter.
+
+async def build_public_payload():
+    data = await load_cms_data()
+    media.with_image_variants(data["events"])
+    media.with_image_variants(data["impactStories"])
+    return data
+
+async def rebuild_public_site():
+    """Reassemble the public payload and store it under a new version.
+
+    The version ticket is taken before loading, so if two rebuilds race the one that
+    started later (and therefore saw every committed write) is the one that sticks.
+    """
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    database = db()
+    site_id = tenants.key("current")
+    counter = await database.public_site.find_one_and_update(
+        {"_id": tenants.key("version")}, {"$inc": {"seq": 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    version = counter["seq"]
+    payload = await build_public_payload()
+    built_at = datetime.now(timezone.utc).isoformat()
+    try:
+        await database.public_site.update_one(
+            {"_id": site_id, "version": {"$lt": version}},
+            {"$set": {"version": version, "builtAt": built_at, "payload": payload}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # A newer version was stored while we were loading - ours is already stale
+        return await database.public_site.find_one({"_id": site_id})
+    site = {"version": version, "builtAt": built_at, "payload": payload}
+    await site_state().snapshot.save(site)
+    return site
+
+async def content_changed(collection: str):
+    """Called by every CMS write handler once its write has committed"""
+    try:
+        await rebuild_public_site()
+    except Exception as e:
+        logger.error(f"Failed to rebuild public site after {collection} write: {e}")
+    keys = [collection] if collection in cache_policy.PUBLIC_COLLECTIONS else cache_policy.PUBLIC_COLLECTIONS
+    # Awaited so the admin screen's re-read after this write can't reach an edge before the purge does
+    await cache_policy.purge([tenants.key(k) for k in keys])
+
+async def _load_public_site():
+    state = site_state()
+    snapshot = state.snapshot
+    site = await col("public_site", "content-read").find_one({"_id": tenants.key("current")}, {"_id": 0})
+    if site is None:
+        site = await rebuild_public_site()
+    elif snapshot.site and _is_lagging(site, snapshot.site):
+        # This worker has already seen a newer build
+        site = snapshot.site
+    elif site.get("version") != snapshot.version:
+        await snapshot.save(site)
+    else:
+        snapshot.touch()
+    state.confirmed = True
+    return site
+
+async def _refresh_public_site():
+    try:
+        await db_breaker.call(lambda: reads.do(tenants.key("public_site"), _load_public_site))
+    except Exception as e:
+        logger.warning(f"Background public site refresh failed: {e!r}")
+
+async def get_public_site():
+    """Return (site, stale_age) for the current tenant; stale_age is None when the site came from Mongo"""
+    state = site_state()
+    snapshot = state.snapshot
+    if snapshot.site and not state.confirmed:
+        # Cold boot: answer from disk right away and confirm against Mongo in the background
+        spawn(_refresh_public_site())
+        return snapshot.site, snapshot.age()
+    try:
+        site = await db_breaker.call(lambda: reads.do(tenants.key("public_site"), _load_public_site))
+    except Exception as e:
+        if snapshot.site:
+            if not isinstance(e, CircuitOpenError):
+                logger.warning(f"Serving public site from snapshot: {e!r}")
+            return snapshot.site, snapshot.age()
+        raise HTTPException(status_code=503, detail="Content temporarily unavailable")
+    return site, None
+
+# Combined endpoint - fetch all CMS data in one request for faster loading
+@api_router.get("/cms/all")
+async def get_all_cms_data(response: Response):
+    """Fetch all CMS content in a single request for faster page load"""
+    site, stale_age = await get_public_site()
+    if stale_age is not None:
+        mark_stale(response, stale_age)
+    return respond(site["payload"], response)
+
+# ============ SEARCH ============
+
+async def ensure_search_index():
+    """Rebuild the tenant's search index whenever its public site version changes.
+
+    Writes made through other workers or replicas only reach this worker as a new
+    public_site version, so the index follows the version rather than local writes.
+    build() doesn't await, so concurrent searches can't interleave two builds.
+    """
+    index = site_state().search
+    site, _ = await get_public_site()
+    if index.version != site["version"]:
+        index.build(site["payload"], version=site["version"])
+        logger.info(f"Search index for {tenants.current.get()} built at version {site['version']}: {index.stats()}")
+
+@api_router.get("/search")
+async def search_content(q: str, type: Optional[str] = None, limit: int = 20):
+    """Full-text search across programs, events, announcements and opportunities"""
+    if type and type not in search.SEARCH_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown type: {type}")
+    await ensure_search_index()
+    return {"query": q, "results": site_state().search.search(q, limit=min(max(limit, 1), 100), collection=type)}
+
 # Initialize CMS data
 @api_router.post("/cms/initialize")
 async def initialize_cms():
-    """Initialize database with default data if empty"""
-    # Check if data exists
-    program_count = await db().programs.count_documents({})
-    
-    if program_count > 0:
-        return {"message": "Data already exists"}
-    
-    # Insert default data (copy from cmsStorage.js DEFAULT_DATA)
-    default_programs = [
-        {"id": "1", "title": "Create a UISN Chapter at Your School", "description": "Start an official UISN chapter on your campus. Access toolkits, branding, and support to lead service initiatives locally and connect with other universities in Utah.", "frequency": "Year-round", "location": "Your Campus", "impact": "Statewide network", "icon": "GraduationCap", "color": "secondary", "active": True, "slug": "create-chapter"},
-        {"id": "2", "title": "Host a UISN Service Event", "description": "Evening service-focused events including community projects, donation drives, and volunteering. Designed for students with busy schedules - 1–2 hours, low commitment, high impact.", "frequency": "Flexible", "location": "Your Community", "impact": "Quick & impactful", "icon": "Calendar", "color": "accent", "active": True, "slug": "service-event"},
-        {"id": "3", "title": "Join the Utah Intercollegiate Service Network", "description": "Become part of a statewide student service coalition. Collaborate with students from other colleges, share resources, events, and impact reports.", "frequency": "Ongoing", "location": "Statewide", "impact": "9+ universities", "icon": "Heart", "color": "secondary", "active": True, "slug": "join-network"},
-        {"id": "4", "title": "Join the UISN Leadership Team", "description": "Take on a leadership role within UISN and help shape the future of student service in Utah. Gain valuable experience, earn service hours, access possible stipends, and expand your network.", "frequency": "Ongoing Commitment", "location": "Statewide", "impact": "Leadership & Growth", "icon": "Users", "color": "accent", "active": True, "slug": "leadership"},
-    ]
-    await db().programs.insert_many(default_programs)
-    
-    default_stats = [
-        {"id": "1", "label": "Active Volunteers", "value": "1,000+", "description": "Students making a difference", "icon": "Users", "color": "secondary"},
-        {"id": "2", "label": "Service Hours", "value": "5,000+", "description": "Contributed since 2026", "icon": "Clock", "color": "accent"},
-        {"id": "3", "label": "Community Partners", "value": "5", "description": "Organizations served", "icon": "Heart", "color": "secondary"},
-        {"id": "4", "label": "Partner Universities", "value": "9+", "description": "Colleges across Utah", "icon": "TrendingUp", "color": "accent"},
-    ]
-    await db().stats.insert_many(default_stats)
-    
-    default_about = {
-        "mission": "To mobilize and empower college students across Utah to serve their communities, develop leadership skills, and create lasting positive impact through coordinated volunteer initiatives that address real community needs.",
-        "story": "Founded in 2026 at Snow College by a passionate group of students who saw the need for coordinated service across Utah's universities. With the support and guidance of UServeUtah, we launched UISN to create a statewide network where college students could collaborate on meaningful service projects. What started as a small group at Snow College has grown into a movement spanning 9+ universities, with over 1,000 active volunteers making a real difference in their communities."
-    }
-    await db().about.insert_one(default_about)
-    
-    # Insert default impact stories
-    default_impact_stories = [
-        {"id": "1", "title": "Building Community Together", "description": "In our first year, UISN volunteers have contributed over 5,000 hours of service across Utah communities.", "image": "https://images.unsplash.com/photo-1758599667729-a6f0f8bd213b?w=800&q=80", "active": True},
-        {"id": "2", "title": "Growing Network", "description": "Started at Snow College, we've expanded to partner with 9 universities across Utah, creating a statewide movement.", "image": "https://images.unsplash.com/photo-1615856210162-9ae33390b1a2?w=800&q=80", "active": True},
-        {"id": "3", "title": "Student-Led Impact", "description": "Over 1,000 student volunteers are actively participating in service projects, proving that young people can create lasting change.", "image": "https://images.unsplash.com/photo-1582213782179-e0d53f98f2ca?w=800&q=80", "active": True},
-    ]
-    await db().impact_stories.insert_many(default_impact_stories)
-    
-    # Insert default event
-    default_events = [
-        {"id": "1", "title": "Spring Kickoff Service Day", "date": "2026-03-15", "time": "9:00 AM - 3:00 PM", "location": "Salt Lake City", "description": "Join us for our inaugural service day! Multiple project sites available.", "registrationLink": "#", "active": True},
-    ]
-    await db().events.insert_many(default_events)
-    
-    return {"message": "Database initialized successfully"}
+    """Apply pending migrations, including seeding default content into empty collections"""
+    result = await migrations.run_migrations(db())
+    if result["applied"]:
+        await content_changed("initialize")
+        return {"message": "Database initialized successfully", **result}
+    if result["status"] == "locked":
+        return {"message": "Migrations are running on another worker", **result}
+    return {"message": "Data already exists", **result}
 
 # ============ FORM SUBMISSIONS ============
 
@@ -409,9 +746,20 @@ async def submit_form(submission: FormSubmission):
         # Save to database first (quick operation)
         doc = submission.model_dump()
         doc['submittedAt'] = doc['submittedAt'].isoformat()
-        await db().form_submissions.insert_one(doc)
+        tenants.stamp(doc)
+        archive.apply_ttl(doc)
+        await col("form_submissions", "submission-write").insert_one(doc)
+        try:
+            await analytics.record_submission(db(), submission.formType, doc['submittedAt'])
+        except Exception as e:
+            logger.warning(f"Failed to update submission rollup: {e}")
+        if submission.formType == 'newsletter':
+            try:
+                await newsletter.subscribe(db(), submission.data.get('email'))
+            except Exception as e:
+                logger.warning(f"Failed to upsert newsletter subscriber: {e}")
         
-        # Prepare email (do not await - fire and forget)
+        # Prepare the notification email
         form_type = submission.formType
         data = submission.data
         
@@ -476,8 +824,19 @@ Program Application: {form_type.title()}
             subject = f"Form Submission - {form_type}"
             body = str(data)
         
-        # Send email in background (non-blocking)
-        asyncio.create_task(send_email(subject, body, 'utahintercollegiateservicenetw@gmail.com'))
+        if tenants.current.get() != tenants.DEFAULT_TENANT:
+            subject = f"[{tenants.current.get()}] {subject}"
+
+        due = notifications.due_at(form_type)
+        if due is None:
+            # Send email in background (non-blocking)
+            notify_now(subject, body)
+        else:
+            try:
+                await notifications.enqueue(db(), form_type, subject, body, due)
+            except Exception as e:
+                logger.warning(f"Failed to queue notification, sending immediately: {e}")
+                notify_now(subject, body)
         
         return {"success": True, "message": "Form submitted successfully"}
     except Exception as e:
@@ -485,15 +844,283 @@ Program Application: {form_type.title()}
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/forms/submissions")
-async def get_submissions(form_type: Optional[str] = None):
-    """Get all form submissions, optionally filtered by type"""
-    query = {"formType": form_type} if form_type else {}
-    submissions = await db().form_submissions.find(query, {"_id": 0}).sort("submittedAt", -1).to_list(1000)
-    return submissions
+async def get_submissions(
+    form_type: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 1000,
+):
+    """Get form submissions newest first, optionally filtered by type and submittedAt range.
+
+    The archive tier is only read when the range reaches past the hot window.
+    """
+    query = tenants.query(formType=form_type) if form_type else tenants.query()
+    return await archive.find_submissions(db(), query, since, until, min(max(limit, 1), 1000))
+
+# ============ ADMIN ============
+
+@api_router.get("/admin/summary")
+async def get_admin_summary(recent: int = 5):
+    """Everything the admin dashboard shows on load, computed with server-side aggregations"""
+    return await dashboard.build_summary(db(), recent, tenants.query())
+
+# ============ TENANTS ============
+
+class Tenant(BaseModel):
+    id: str
+    name: str
+
+@api_router.get("/tenants")
+async def get_tenants():
+    """Registered chapters; the statewide site is the default tenant and isn't listed"""
+    return await db()[tenants.TENANTS_COLLECTION].find({}, {"_id": 0}).sort("id", 1).to_list(1000)
+
+@api_router.post("/tenants", status_code=201)
+async def create_tenant(tenant: Tenant):
+    """Register a chapter; its content is then managed under /api/t/{id}/cms/..."""
+    if not tenants.SLUG_RE.match(tenant.id) or tenant.id == tenants.DEFAULT_TENANT:
+        raise HTTPException(status_code=400, detail="Tenant id must be a lowercase slug")
+    from pymongo.errors import DuplicateKeyError
+    doc = {"_id": tenant.id, **tenant.model_dump(), "createdAt": datetime.now(timezone.utc).isoformat()}
+    try:
+        await db()[tenants.TENANTS_COLLECTION].insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Tenant already exists")
+    tenants.registry.remember(tenant.id)
+    return {"success": True, "id": tenant.id}
+
+# ============ NEWSLETTER ============
+
+def _checked_subscriber(email: str, token: str) -> str:
+    email = newsletter.normalize_email(email)
+    if not email or not newsletter.check_unsubscribe_token(email, token):
+        raise HTTPException(status_code=404, detail="Unknown subscription")
+    return email
+
+@api_router.get("/newsletter/unsubscribe", response_class=HTMLResponse)
+async def unsubscribe_confirmation(email: str, token: str):
+    """Landing page for the link in every campaign email; only its button unsubscribes"""
+    return newsletter.unsubscribe_page(_checked_subscriber(email, token), token)
+
+@api_router.post("/newsletter/unsubscribe")
+async def unsubscribe_newsletter(email: str, token: str, request: Request):
+    """RFC 8058 one-click unsubscribe, also posted by the confirmation page's button"""
+    email = _checked_subscriber(email, token)
+    await newsletter.unsubscribe(db(), email)
+    if "text/html" in request.headers.get("accept", ""):
+        return HTMLResponse(newsletter.unsubscribe_page(email, token, done=True))
+    return {"success": True, "message": "You have been unsubscribed"}
+
+# ============ METRICS ============
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """In-process counters for this worker"""
+    return {
+        "singleflight": reads.stats(),
+        "mediaCache": media.cache.stats(),
+        "dbCircuit": db_breaker.stats(),
+        "eventLoop": {k: v for k, v in loop_monitor.monitor.stats().items() if k != "histogram"},
+        "snapshot": {"version": site_state().snapshot.version, "ageSeconds": site_state().snapshot.age()},
+        "tenants": site_states.stats(),
+        "consistency": consistency.describe(),
+        "backgroundTasks": len(_background_tasks),
+        "email": {**email_stats, "pending": _pending_emails},
+    }
+
+# ============ DIAGNOSTICS ============
+
+@api_router.get("/diagnostics/loop")
+async def get_loop_diagnostics():
+    """Event-loop lag histogram and, in debug mode, stacks captured while the loop was blocked"""
+    return {
+        **loop_monitor.monitor.stats(),
+        "captures": list(loop_monitor.monitor.captures),
+    }
+
+@api_router.get("/diagnostics/profiles/{profile_id}")
+async def get_profile(profile_id: str, request: Request, format: str = "raw"):
+    """Download a stored request profile (raw .pstats/.folded, or format=text)"""
+    if not profiling.check_token(request.headers.get('x-profile')):
+        raise HTTPException(status_code=404, detail="Not found")
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        return Response(await asyncio.to_thread(profiling.summarize, path), media_type="text/plain")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+# ============ ANALYTICS ============
+
+@api_router.get("/analytics/submissions")
+async def get_submission_analytics(days: int = 30, form_type: Optional[str] = None):
+    """Daily submission counts and totals, served from pre-aggregated rollups"""
+    return await analytics.get_series(db(), days, form_type)
+
+@api_router.post("/analytics/rebuild")
+async def rebuild_submission_analytics():
+    """Recompute all rollups from raw form_submissions"""
+    days = await analytics.rebuild_rollups(db())
+    return {"success": True, "days": days}
+
+# ============ MEDIA ============
+
+# Uploads are registered before the proxy route so /media/uploads/{id} isn't read as a variant
+@api_router.post("/media/uploads")
+async def upload_media(request: Request, filename: str = "upload"):
+    """Stream the raw request body into GridFS; identical content is stored only once"""
+    database = db()
+    content_type = request.headers.get('content-type', '').split(';')[0].strip()
+    # Clients that already know the hash can skip sending the body entirely
+    known_hash = request.headers.get('x-content-sha256')
+    if known_hash:
+        existing = await uploads.find_by_hash(database, known_hash.lower())
+        if existing:
+            return uploads.describe(existing)
+    try:
+        file_info, created = await uploads.store_stream(database, request.stream(), filename, content_type)
+    except uploads.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return JSONResponse(file_info, status_code=201 if created else 200)
+
+@api_router.get("/media/uploads/{file_id}")
+async def download_media(file_id: str, request: Request):
+    """Stream an upload from GridFS with ETag and single-range support"""
+    try:
+        grid_out = await uploads.open_download(db(), file_id)
+    except uploads.UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    metadata = grid_out.metadata or {}
+    etag = f'"{metadata.get("sha256") or file_id}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": media.IMMUTABLE_CACHE_CONTROL,
+    }
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+
+    length = grid_out.length
+    range_header = request.headers.get('range')
+    if range_header and request.headers.get('if-range', etag) != etag:
+        range_header = None
+    try:
+        byte_range = uploads.parse_range(range_header, length)
+    except uploads.UploadError as e:
+        return Response(status_code=e.status_code, headers={**headers, "Content-Range": f"bytes */{length}"})
+
+    start, end = byte_range or (0, length - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    status_code = 200
+    if byte_range:
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    return StreamingResponse(
+        uploads.iter_file(grid_out, start, end),
+        status_code=status_code,
+        media_type=metadata.get('contentType', 'application/octet-stream'),
+        headers=headers,
+    )
+
+async def _copy_upload(file_id: str, dst_path: str):
+    try:
+        await uploads.copy_to_path(db(), file_id, dst_path)
+    except uploads.UploadError as e:
+        raise media.MediaError(e.status_code, e.detail)
+
+media.register_resolver(uploads.URL_PREFIX, _copy_upload)
+
+@api_router.get("/media/{key}/{variant}")
+async def get_media(key: str, variant: str):
+    """Serve a resized WebP/JPEG variant of a proxied image, rendering it on first request"""
+    width, _, fmt = variant.partition('.')
+    if not width.isdigit():
+        raise HTTPException(status_code=404, detail="Unknown variant")
+    try:
+        path = await media.get_variant(key, int(width), fmt)
+    except media.MediaError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return FileResponse(
+        path,
+        media_type=media.media_type(fmt),
+        headers={"Cache-Control": media.IMMUTABLE_CACHE_CONTROL},
+    )
+
+# ============ PRE-RENDERED PAGES ============
+
+# Served at the SPA's own paths so the frontend host can proxy them straight through
+def _site_url() -> str:
+    """Public URL of the current tenant's site; chapters live under /t/<tenant>"""
+    tenant = tenants.current.get()
+    return prerender.SITE_URL if tenant == tenants.DEFAULT_TENANT else f"{prerender.SITE_URL}/t/{tenant}"
+
+async def _prerender_template():
+    return prerender.cached_template() or await asyncio.to_thread(prerender.template)
+
+def _cached_page(request: Request, stale_age, path: str, key: str, render, media_type: str = "text/html"):
+    body, etag = site_state().pages.get(path, key, render)
+    response = Response(status_code=304) if request.headers.get('if-none-match') == etag else Response(body, media_type=media_type)
+    response.headers["ETag"] = etag
+    if stale_age is not None:
+        mark_stale(response, stale_age)
+    return response
+
+@app.get("/program/{slug}")
+async def program_page(slug: str, request: Request):
+    """Program detail page with its content and Open Graph tags inlined"""
+    site, stale_age = await get_public_site()
+    program = next((p for p in site["payload"]["programs"] if p.get("slug") == slug or p["id"] == slug), None)
+    if program is None:
+        raise HTTPException(status_code=404, detail="Program not found")
+    shell, shell_digest = await _prerender_template()
+    return _cached_page(request, stale_age, f"/program/{slug}", prerender.fingerprint(program, shell_digest),
+                        lambda: prerender.render_program(shell, program, _site_url()))
+
+@app.get("/event/{event_id}")
+async def event_page(event_id: str, request: Request):
+    """Event detail page with its content, Open Graph tags and schema.org Event inlined"""
+    site, stale_age = await get_public_site()
+    event = next((ev for ev in site["payload"]["events"] if ev["id"] == event_id), None)
+    if event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    shell, shell_digest = await _prerender_template()
+    return _cached_page(request, stale_age, f"/event/{event_id}", prerender.fingerprint(event, shell_digest),
+                        lambda: prerender.render_event(shell, event, _site_url()))
+
+@app.get("/sitemap.xml")
+async def sitemap(request: Request):
+    site, stale_age = await get_public_site()
+    payload = site["payload"]
+    # Only the fields the sitemap uses, so unrelated edits don't re-render it
+    key = prerender.fingerprint(
+        [(p.get("slug"), p["id"], p.get("active"), p.get("updatedAt")) for p in payload["programs"]],
+        [(ev["id"], ev.get("active"), ev.get("updatedAt")) for ev in payload["events"]],
+    )
+    return _cached_page(request, stale_age, "/sitemap.xml", key,
+                        lambda: prerender.render_sitemap(payload, _site_url()), media_type="application/xml")
 
 # ============ INCLUDE ROUTER ============
 app.include_router(api_router)
 
+@app.middleware("http")
+async def cache_headers(request: Request, call_next):
+    """Apply the per-route Cache-Control / Surrogate-Key policy"""
+    response = await call_next(request)
+    cache_policy.apply(request.method, request.url.path, response.status_code, response.headers,
+                       key_prefix=tenants.key(""))
+    return response
+
+async def tenant_exists(tenant: str) -> bool:
+    try:
+        return await db_breaker.call(lambda: tenants.registry.exists(db(), tenant))
+    except Exception as e:
+        # Mongo is unreachable: keep serving tenants this worker already has cached
+        logger.warning(f"Tenant lookup for {tenant} failed: {e!r}")
+        return tenant in site_states
+
+app.add_middleware(tenants.TenantMiddleware, exists=tenant_exists)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -502,12 +1129,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Outermost, so a profiled request includes every other middleware
+if profiling.enabled():
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+# Outside the profiler too, so the request id covers everything logged for a request
+app.add_middleware(log_config.AccessLogMiddleware)
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if os.environ.get('LOOP_MONITOR', 'true').lower() in ('1', 'true', 'yes'):
+        loop_monitor.monitor.start()
+
+@app.on_event("startup")
+async def load_public_site_snapshot():
+    # Lets the first /api/cms/all after a cold boot answer without waiting for Mongo.
+    # Other tenants' snapshots are loaded the first time each tenant is requested.
+    snapshot = site_states.default.snapshot
+    if snapshot.load():
+        logger.info(f"Loaded public site snapshot version {snapshot.version}")
+    spawn(start_background_jobs())
+
+async def start_background_jobs():
+    # Importing Motor takes ~100 ms of CPU; do it in a thread so the event loop keeps
+    # answering health checks and snapshot reads in the meantime
+    await asyncio.to_thread(importlib.import_module, "motor.motor_asyncio")
+    spawn(media.cache.preload())
+    if serialization.FAST_SERIALIZATION:
+        spawn(apply_collection_validators())
+    if os.environ.get('RUN_MIGRATIONS', 'true').lower() in ('1', 'true', 'yes'):
+        spawn(run_startup_migrations())
+    if archive.HOT_DAYS is not None:
+        spawn(archive.run_forever(db()))
+    if notifications.scheduler_needed():
+        spawn(notifications.run_scheduler(db(), send_notification_digest))
+
+async def send_notification_digest(subject: str, body: str) -> bool:
+    return await send_email(subject, body, NOTIFY_EMAIL)
+
+async def run_startup_migrations():
+    try:
+        result = await migrations.run_migrations(db())
+    except Exception as e:
+        logger.error(f"Startup migrations failed: {e}")
+        return
+    if result["applied"]:
+        logger.info(f"Applied migrations {result['applied']}")
+        await content_changed("migrations")
+
+async def apply_collection_validators():
+    try:
+        await serialization.apply_validators(db(), CMS_MODELS)
+    except Exception as e:
+        logger.error(f"Failed to apply collection validators: {e}")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     if _client:
         _client.close()
+    media.shutdown()
+    loop_monitor.monitor.stop()
+    log_config.shutdown()
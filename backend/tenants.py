@@ -0,0 +1,233 @@
+"""Per-chapter (tenant) CMS content
+
+Every CMS document carries a `tenant` key. The statewide site is the default
+tenant; each university chapter is another tenant with its own programs,
+events, announcements, about and settings. A request's tenant comes from the
+path or the host:
+
+    /api/t/usu/cms/all         -> tenant "usu", routed as /api/cms/all
+    /t/usu/program/leadership  -> tenant "usu", routed as /program/leadership
+    usu.uisn.org/api/cms/all   -> tenant "usu" (TENANT_HOSTS or TENANT_HOST_SUFFIX)
+
+Anything else is the default tenant, so existing URLs are unchanged. The tenant
+is held in a ContextVar for the rest of the request; handlers scope their
+queries with query() and stamp writes with stamp().
+
+Per tenant: CMS content, public_site, form submissions (hot and archived) and
+their daily rollups. Global: newsletter subscribers and campaigns (there is one
+UISN newsletter, whichever chapter's form a reader signed up on) and the
+notification queue, which goes to the one NOTIFY_EMAIL inbox with each chapter's
+submissions labelled by tenant.
+
+Chapters are registered in the `tenants` collection (one document each). Nothing
+per tenant happens at startup: a worker only creates a tenant's snapshot, search
+index and page caches the first time that tenant is requested, and keeps at most
+TENANT_CACHE_SIZE of them.
+
+    TENANT_HOSTS="usu.uisn.org=usu,uofu.example.edu=utah"
+    TENANT_HOST_SUFFIX=".uisn.org"     any <slug>.uisn.org is tenant <slug>
+"""
+
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+import calendar_feed
+import prerender
+import search
+from resilience import Snapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TENANT = 'main'
+TENANTS_COLLECTION = 'tenants'
+CACHE_SIZE = int(os.environ.get('TENANT_CACHE_SIZE', 64))
+REGISTRY_TTL = float(os.environ.get('TENANT_REGISTRY_TTL_SECONDS', 60))
+HOST_SUFFIX = os.environ.get('TENANT_HOST_SUFFIX', '').lower()
+# Subdomains of TENANT_HOST_SUFFIX that are never tenants
+RESERVED_SUBDOMAINS = {'www', 'api', 'admin'}
+
+SLUG_RE = re.compile(r"^[a-z0-9][a-z0-9-]{0,39}$")
+_PATH_RE = re.compile(r"^(/api)?/t/([a-z0-9][a-z0-9-]{0,39})(/.*)?$")
+
+
+def _parse_hosts(spec: str) -> Dict[str, str]:
+    """"usu.uisn.org=usu,uofu.example.edu=utah" -> {"usu.uisn.org": "usu", ...}"""
+    hosts = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        host, _, tenant = item.partition('=')
+        if not SLUG_RE.match(tenant):
+            raise ValueError(f"Invalid tenant {tenant!r} for host {host}")
+        hosts[host.strip().lower()] = tenant
+    return hosts
+
+
+HOSTS = _parse_hosts(os.environ.get('TENANT_HOSTS', ''))
+
+current: ContextVar[str] = ContextVar('tenant', default=DEFAULT_TENANT)
+
+
+def query(tenant: Optional[str] = None, **filters) -> dict:
+    """Filter for the current tenant's documents.
+
+    Content written before tenants existed has no `tenant` field and belongs to
+    the default tenant.
+    """
+    tenant = tenant or current.get()
+    if tenant == DEFAULT_TENANT:
+        return {"tenant": {"$in": [DEFAULT_TENANT, None]}, **filters}
+    return {"tenant": tenant, **filters}
+
+
+def stamp(doc: dict, tenant: Optional[str] = None) -> dict:
+    doc["tenant"] = tenant or current.get()
+    return doc
+
+
+def key(name: str, tenant: Optional[str] = None) -> str:
+    """Per-tenant name for a cache key, document _id or surrogate key; the default tenant keeps the bare name"""
+    tenant = tenant or current.get()
+    return name if tenant == DEFAULT_TENANT else f"{tenant}:{name}"
+
+
+def _host_tenant(host: str) -> Optional[str]:
+    host = host.split(',')[0].strip().lower().rsplit(':', 1)[0]
+    if host in HOSTS:
+        return HOSTS[host]
+    if HOST_SUFFIX and host.endswith(HOST_SUFFIX):
+        sub = host[:-len(HOST_SUFFIX)]
+        if SLUG_RE.match(sub) and sub not in RESERVED_SUBDOMAINS:
+            return sub
+    return None
+
+
+def resolve(path: str, host: str = '') -> Tuple[str, str]:
+    """(tenant, path to route) for a request; a /t/<slug> path prefix wins over the host"""
+    match = _PATH_RE.match(path)
+    if match:
+        return match.group(2), (match.group(1) or '') + (match.group(3) or '/')
+    return _host_tenant(host) or DEFAULT_TENANT, path
+
+# ============ PER-TENANT STATE ============
+
+class TenantState:
+    """What a worker caches for one tenant: its public site snapshot and derived caches"""
+
+    def __init__(self, tenant: str, snapshot: Snapshot, index: search.SearchIndex,
+                 feed: calendar_feed.FeedCache, pages: prerender.PageCache):
+        self.tenant = tenant
+        self.snapshot = snapshot
+        self.confirmed = False  # has this worker loaded the site from Mongo yet
+        self.search = index
+        self.feed = feed
+        self.pages = pages
+
+
+class TenantStates:
+    """Lazily created TenantStates, least recently used evicted beyond `size`.
+
+    The default tenant uses the module-level caches and is never evicted.
+    """
+
+    def __init__(self, snapshot_path: Path, size: int = CACHE_SIZE):
+        self.snapshot_path = snapshot_path
+        self.size = size
+        self.default = TenantState(DEFAULT_TENANT, Snapshot(snapshot_path), search.index,
+                                   calendar_feed.feed, prerender.pages)
+        self._states: "OrderedDict[str, TenantState]" = OrderedDict()
+
+    def snapshot_path_for(self, tenant: str) -> Path:
+        path = self.snapshot_path
+        return path.with_name(f"{path.stem}.{tenant}{path.suffix}")
+
+    def get(self, tenant: Optional[str] = None) -> TenantState:
+        tenant = tenant or current.get()
+        if tenant == DEFAULT_TENANT:
+            return self.default
+        state = self._states.get(tenant)
+        if state is not None:
+            self._states.move_to_end(tenant)
+            return state
+        state = TenantState(tenant, Snapshot(self.snapshot_path_for(tenant)), search.SearchIndex(),
+                            calendar_feed.FeedCache(), prerender.PageCache())
+        state.snapshot.load()
+        self._states[tenant] = state
+        while len(self._states) > self.size:
+            evicted, _ = self._states.popitem(last=False)
+            logger.info(f"Evicted cached state for tenant {evicted}")
+        return state
+
+    def __contains__(self, tenant: str) -> bool:
+        return tenant == DEFAULT_TENANT or tenant in self._states
+
+    def stats(self) -> Dict:
+        return {"cached": len(self._states) + 1, "capacity": self.size + 1}
+
+# ============ REGISTRY ============
+
+class Registry:
+    """Which tenants exist, cached for REGISTRY_TTL seconds so lookups rarely reach Mongo.
+
+    Unknown slugs are cached too (bounded), so probing random paths costs one
+    query per slug per TTL at most.
+    """
+
+    def __init__(self, ttl: float = REGISTRY_TTL, size: int = 1024):
+        self.ttl = ttl
+        self.size = size
+        self._seen: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+
+    def remember(self, tenant: str, exists: bool = True):
+        self._seen[tenant] = (exists, time.monotonic() + self.ttl)
+        self._seen.move_to_end(tenant)
+        while len(self._seen) > self.size:
+            self._seen.popitem(last=False)
+
+    async def exists(self, database, tenant: str) -> bool:
+        if tenant == DEFAULT_TENANT:
+            return True
+        cached = self._seen.get(tenant)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        found = await database[TENANTS_COLLECTION].find_one({"_id": tenant}, {"_id": 1}) is not None
+        self.remember(tenant, found)
+        return found
+
+
+registry = Registry()
+
+# ============ MIDDLEWARE ============
+
+class TenantMiddleware:
+    """Resolves the tenant, strips a /t/<slug> prefix before routing and 404s unknown tenants"""
+
+    def __init__(self, app, exists: Callable[[str], Awaitable[bool]]):
+        self.app = app
+        self.exists = exists
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or ())
+        host = (headers.get(b"x-forwarded-host") or headers.get(b"host") or b"").decode("latin-1")
+        tenant, path = resolve(scope["path"], host)
+        if tenant != DEFAULT_TENANT and not await self.exists(tenant):
+            await JSONResponse({"detail": "Unknown tenant"}, status_code=404)(scope, receive, send)
+            return
+        scope["tenant"] = tenant  # for the access log, which sees the original scope
+        inner = dict(scope, path=path, raw_path=path.encode()) if path != scope["path"] else scope
+        token = current.set(tenant)
+        try:
+            await self.app(inner, receive, send)
+        finally:
+            current.reset(token)
+            if "route" in inner:
+                scope["route"] = inner["route"]
@@ -6,6 +6,8 @@ Tests complete CRUD operations for events, programs, stats, announcements, and i
 import pytest
 import requests
 import os
+import base64
+import hashlib
 from datetime import datetime
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
@@ -545,6 +547,34 @@ class TestEventDetailIntegration:
         requests.delete(f"{BASE_URL}/api/cms/events/{event_id}")
 
 
+class TestPublicSitePayload:
+    """The materialized /api/cms/all payload is rebuilt on every CMS write"""
+    
+    def test_cms_all_reflects_write_immediately(self):
+        """Create, update and delete an announcement and check /api/cms/all after each"""
+        ann_id = f"TEST_SITE_{datetime.now().timestamp()}"
+        announcement = {
+            "id": ann_id,
+            "title": "TEST_Materialized Announcement",
+            "content": "Should appear in the combined payload",
+            "date": "2026-05-01",
+            "priority": "normal",
+            "active": True
+        }
+        requests.post(f"{BASE_URL}/api/cms/announcements", json=announcement)
+        payload = requests.get(f"{BASE_URL}/api/cms/all").json()
+        assert any(a['id'] == ann_id for a in payload['announcements']), "New announcement missing from /cms/all"
+        
+        requests.put(f"{BASE_URL}/api/cms/announcements/{ann_id}", json={**announcement, "title": "TEST_Renamed"})
+        payload = requests.get(f"{BASE_URL}/api/cms/all").json()
+        found = next(a for a in payload['announcements'] if a['id'] == ann_id)
+        assert found['title'] == "TEST_Renamed"
+        
+        requests.delete(f"{BASE_URL}/api/cms/announcements/{ann_id}")
+        payload = requests.get(f"{BASE_URL}/api/cms/all").json()
+        assert not any(a['id'] == ann_id for a in payload['announcements'])
+
+
 class TestSettingsCRUD:
     """Tests for Settings update - /api/cms/settings"""
     
@@ -578,5 +608,73 @@ class TestSettingsCRUD:
         print("Settings updated and restored")
 
 
+class TestMediaUploads:
+    """Tests for GridFS uploads - /api/media/uploads"""
+    
+    # 4x4 PNG; a timestamp is appended after IEND so every run uploads new content
+    PNG = base64.b64decode("iVBORw0KGgoAAAANSUhEUgAAAAQAAAAECAIAAAAmkwkpAAAAFElEQVR4nGNkYPjPAANMDEgANwcAMdMBB1sLEtoAAAAASUVORK5CYII=")
+    
+    def _unique_png(self):
+        return self.PNG + str(datetime.now().timestamp()).encode()
+    
+    def test_upload_deduplicates_identical_content(self):
+        """Uploading the same bytes twice returns the same stored file"""
+        body = self._unique_png()
+        first = requests.post(
+            f"{BASE_URL}/api/media/uploads?filename=test.png",
+            data=body,
+            headers={"Content-Type": "image/png"}
+        )
+        assert first.status_code == 201, f"Failed to upload: {first.text}"
+        assert first.json()['sha256'] == hashlib.sha256(body).hexdigest()
+        
+        second = requests.post(
+            f"{BASE_URL}/api/media/uploads?filename=copy.png",
+            data=body,
+            headers={"Content-Type": "image/png"}
+        )
+        assert second.status_code == 200
+        assert second.json()['id'] == first.json()['id']
+        
+        # Known hash short-circuits without a body
+        by_hash = requests.post(
+            f"{BASE_URL}/api/media/uploads",
+            headers={"Content-Type": "image/png", "X-Content-SHA256": first.json()['sha256']}
+        )
+        assert by_hash.json()['id'] == first.json()['id']
+    
+    def test_download_supports_range_and_etag(self):
+        """Downloads honour Range and If-None-Match"""
+        body = self._unique_png()
+        uploaded = requests.post(
+            f"{BASE_URL}/api/media/uploads",
+            data=body,
+            headers={"Content-Type": "image/png"}
+        ).json()
+        url = f"{BASE_URL}/api/media/uploads/{uploaded['id']}"
+        
+        full = requests.get(url)
+        assert full.status_code == 200
+        assert full.content == body
+        assert full.headers['content-length'] == str(len(body))
+        
+        partial = requests.get(url, headers={"Range": "bytes=0-7"})
+        assert partial.status_code == 206
+        assert partial.content == body[:8]
+        assert partial.headers['content-range'] == f"bytes 0-7/{len(body)}"
+        
+        cached = requests.get(url, headers={"If-None-Match": full.headers['etag']})
+        assert cached.status_code == 304
+    
+    def test_rejects_unsupported_content_type(self):
+        """Only image uploads are accepted"""
+        response = requests.post(
+            f"{BASE_URL}/api/media/uploads",
+            data=b"not an image",
+            headers={"Content-Type": "text/plain"}
+        )
+        assert response.status_code == 415
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,112 @@
+"""
+Backup round trip against a local mongod
+Seeds a throwaway database with every backed-up collection, exports it, restores
+the stream into a second database and compares the two.
+
+Skipped unless a mongod is reachable at QUERY_PLAN_MONGO_URL (default
+mongodb://localhost:27017; MONGO_URL is deliberately ignored so this never runs
+against a deployment).
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import backup  # noqa: E402
+
+MONGO_URL = os.environ.get('QUERY_PLAN_MONGO_URL', 'mongodb://localhost:27017')
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _seed(db):
+    db.tenants.insert_one({"_id": "usu", "id": "usu", "name": "USU"})
+    for tenant in ("main", "usu"):
+        db.programs.insert_many([{"tenant": tenant, "id": str(i), "title": f"{tenant} {i}"} for i in range(3)])
+        db.about.insert_one({"tenant": tenant, "mission": f"{tenant} mission"})
+        db.settings.insert_one({"tenant": tenant, "contactEmail": f"{tenant}@example.edu"})
+    db.programs.insert_one({"id": "legacy", "title": "Written before tenants"})
+    # More than one batch, with dates and ObjectIds that must survive as BSON types
+    db.form_submissions.insert_many([
+        {"tenant": "main", "formType": "contact", "data": {"n": i}, "submittedAt": NOW, "expiresAt": NOW}
+        for i in range(backup.BATCH_SIZE + 7)
+    ])
+    db.form_submissions_archive.insert_one({"formType": "volunteer", "data": {}, "submittedAt": NOW})
+    db.subscribers.insert_many([
+        {"email": "a@example.edu", "status": "active"},
+        {"email": "b@example.edu", "status": "unsubscribed", "unsubscribedAt": NOW},
+    ])
+    db.campaigns.insert_one({"_id": "c1", "subject": "Hello", "status": "sent"})
+    db.pending_notifications.insert_one({"formType": "contact", "subject": "s", "body": "b", "dueAt": NOW})
+    file_id = ObjectId()
+    db["media.files"].insert_one({"_id": file_id, "length": 3, "chunkSize": 255, "uploadDate": NOW})
+    db["media.chunks"].insert_one({"files_id": file_id, "n": 0, "data": b"abc"})
+
+
+def _dump(db) -> dict:
+    return {name: sorted(db[name].find({}), key=lambda d: str(d["_id"])) for name in backup.BACKUP_COLLECTIONS}
+
+
+async def _round_trip(source: str, target: str, existing=None) -> dict:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        chunks = [chunk async for chunk in backup.export_stream(client[source])]
+
+        async def replay():
+            for chunk in chunks:
+                yield chunk
+
+        return await backup.restore_stream(client[target], replay())
+    finally:
+        client.close()
+
+
+@pytest.fixture
+def client():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"No mongod at {MONGO_URL}: {e}")
+    names = []
+
+    def database(prefix):
+        names.append(f"backup_{prefix}_{uuid.uuid4().hex[:8]}")
+        return client[names[-1]]
+
+    try:
+        yield database
+    finally:
+        for name in names:
+            client.drop_database(name)
+        client.close()
+
+
+def test_round_trip_restores_every_collection(client):
+    source, target = client("source"), client("target")
+    _seed(source)
+    result = asyncio.run(_round_trip(source.name, target.name))
+    assert result["mismatched"] == {}
+    assert _dump(target) == _dump(source)
+
+
+def test_restore_replaces_singletons_per_tenant(client):
+    source, target = client("source"), client("target")
+    _seed(source)
+    # The target already has its own about for both tenants, plus an unrelated chapter's
+    for tenant in ("main", "usu", "weber"):
+        target.about.insert_one({"tenant": tenant, "mission": "old"})
+    asyncio.run(_round_trip(source.name, target.name))
+    missions = {doc["tenant"]: doc["mission"] for doc in target.about.find({})}
+    assert missions == {"main": "main mission", "usu": "usu mission", "weber": "old"}
+    assert target.about.count_documents({}) == 3
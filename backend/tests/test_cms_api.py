@@ -118,6 +118,202 @@ class TestCMSImpactStories:
         print(f"Impact stories returned: {len(data)}")
 
 
+class TestDatabaseResilience:
+    """Tests for the DB circuit breaker and public site snapshot"""
+    
+    def test_ping_reports_circuit_state(self):
+        """Verify ping exposes the circuit breaker state"""
+        response = requests.get(f"{BASE_URL}/api/ping")
+        assert response.status_code == 200
+        assert response.json()['circuit'] in ('closed', 'open', 'half-open')
+    
+    def test_healthy_reads_are_not_marked_stale(self):
+        """With Mongo reachable, /api/cms/all comes from the database"""
+        requests.get(f"{BASE_URL}/api/cms/all")  # first call after a cold boot may be the snapshot
+        response = requests.get(f"{BASE_URL}/api/cms/all")
+        assert response.status_code == 200
+        assert 'x-served-from' not in response.headers
+        
+        snapshot = requests.get(f"{BASE_URL}/api/metrics").json()['snapshot']
+        assert snapshot['version'] is not None, "Snapshot should be written after a successful load"
+
+
+class TestCacheHeaders:
+    """Tests for the per-route Cache-Control / Surrogate-Key policy"""
+    
+    def test_public_reads_are_cacheable(self):
+        """Verify public CMS reads allow shared caching with stale-while-revalidate"""
+        response = requests.get(f"{BASE_URL}/api/cms/programs")
+        assert response.status_code == 200
+        cache_control = response.headers.get('cache-control', '')
+        assert 'public' in cache_control
+        assert 'stale-while-revalidate' in cache_control
+        assert response.headers.get('surrogate-key') == 'programs'
+    
+    def test_combined_payload_tagged_with_every_collection(self):
+        """Verify /api/cms/all is purged by a write to any public collection"""
+        response = requests.get(f"{BASE_URL}/api/cms/all")
+        keys = response.headers.get('surrogate-key', '').split()
+        for key in ['programs', 'events', 'stats', 'impact_stories', 'about', 'announcements', 'opportunities']:
+            assert key in keys, f"Missing surrogate key {key}"
+    
+    def test_submissions_not_stored(self):
+        """Verify submissions are never cached"""
+        response = requests.get(f"{BASE_URL}/api/forms/submissions")
+        assert response.headers.get('cache-control') == 'no-store'
+        assert 'surrogate-key' not in response.headers
+
+
+class TestLoopDiagnostics:
+    """Tests for /api/diagnostics/loop"""
+    
+    def test_loop_monitor_reports_lag_histogram(self):
+        """Verify the monitor is running and reports a histogram"""
+        response = requests.get(f"{BASE_URL}/api/diagnostics/loop")
+        assert response.status_code == 200
+        data = response.json()
+        assert data['running'] is True
+        assert data['samples'] > 0
+        assert sum(b['count'] for b in data['histogram']) == data['samples']
+        assert response.headers.get('cache-control') == 'no-store'
+
+
+class TestConsistencyProfiles:
+    """Tests for the named read/write concern profiles"""
+    
+    def test_submissions_are_majority_journaled(self):
+        """Verify submissions are durable while public reads may use secondaries"""
+        response = requests.get(f"{BASE_URL}/api/metrics")
+        assert response.status_code == 200
+        profiles = response.json()['consistency']
+        assert profiles['submission-write']['writeConcern']['w'] == 'majority'
+        assert profiles['submission-write']['writeConcern']['j'] is True
+        assert profiles['content-read']['readPreference'] == 'secondaryPreferred'
+        assert profiles['content-read']['maxStalenessSeconds'] >= 90
+
+
+class TestRequestIds:
+    """Tests for request ids threaded through logging"""
+    
+    def test_request_id_is_echoed_or_generated(self):
+        """Verify an incoming X-Request-ID is kept and a missing one is generated"""
+        response = requests.get(f"{BASE_URL}/api/health", headers={"X-Request-ID": "test-request-1"})
+        assert response.headers.get('x-request-id') == 'test-request-1'
+        
+        response = requests.get(f"{BASE_URL}/api/health")
+        assert len(response.headers.get('x-request-id', '')) == 32
+
+
+class TestRequestProfiling:
+    """Tests for the opt-in per-request profiler"""
+    
+    def test_unprofiled_requests_are_untouched(self):
+        """Verify requests without the token aren't profiled and profiles aren't public"""
+        response = requests.get(f"{BASE_URL}/api/health", headers={"X-Profile": "wrong-token"})
+        assert response.status_code == 200
+        assert 'x-profile-id' not in response.headers
+        
+        response = requests.get(f"{BASE_URL}/api/diagnostics/profiles/0123456789abcdef")
+        assert response.status_code == 404
+    
+    def test_profiled_request_can_be_downloaded(self):
+        """Verify a request carrying the token is profiled and its pstats can be fetched"""
+        token = os.environ.get('PROFILING_TOKEN')
+        if not token:
+            pytest.skip("PROFILING_TOKEN not set")
+        response = requests.get(f"{BASE_URL}/api/cms/programs", headers={"X-Profile": token})
+        assert response.status_code == 200
+        profile_id = response.headers.get('x-profile-id')
+        assert profile_id, "Profiled response should carry X-Profile-Id"
+        
+        report = requests.get(
+            f"{BASE_URL}/api/diagnostics/profiles/{profile_id}",
+            params={"format": "text"},
+            headers={"X-Profile": token},
+        )
+        assert report.status_code == 200
+        assert "function calls" in report.text
+
+
+class TestReadCoalescing:
+    """Tests for single-flight coalescing of public reads"""
+    
+    def test_metrics_report_coalescing_ratio(self):
+        """Verify concurrent reads are counted and the ratio is reported"""
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            responses = list(pool.map(lambda _: requests.get(f"{BASE_URL}/api/cms/programs"), range(20)))
+        assert all(r.status_code == 200 for r in responses)
+        
+        metrics = requests.get(f"{BASE_URL}/api/metrics").json()['singleflight']
+        assert metrics['calls'] >= metrics['executions'] > 0
+        assert 0.0 <= metrics['coalescingRatio'] < 1.0
+
+
+class TestMediaProxy:
+    """Tests for /api/media image variants"""
+    
+    def test_cms_all_exposes_image_variants(self):
+        """Verify impact stories carry srcset-ready variant URLs"""
+        response = requests.get(f"{BASE_URL}/api/cms/all")
+        assert response.status_code == 200
+        stories = response.json()['impactStories']
+        assert len(stories) > 0, "No impact stories returned"
+        for story in stories:
+            variants = story.get('imageVariants')
+            assert variants is not None, f"Missing imageVariants on story: {story.get('title')}"
+            assert 'webpSrcset' in variants and 'jpgSrcset' in variants and 'src' in variants
+            assert '640w' in variants['webpSrcset']
+    
+    def test_variant_served_with_immutable_cache_headers(self):
+        """Verify a rendered variant is a WebP image with long-lived cache headers"""
+        stories = requests.get(f"{BASE_URL}/api/cms/all").json()['impactStories']
+        url = stories[0]['imageVariants']['webpSrcset'].split(',')[0].split()[0]
+        response = requests.get(url if url.startswith('http') else f"{BASE_URL}{url}")
+        assert response.status_code == 200
+        assert response.headers['content-type'] == 'image/webp'
+        assert 'immutable' in response.headers.get('cache-control', '')
+    
+    def test_unknown_width_rejected(self):
+        """Verify widths outside the bucket list are not rendered"""
+        stories = requests.get(f"{BASE_URL}/api/cms/all").json()['impactStories']
+        url = stories[0]['imageVariants']['src'].replace('/960.jpg', '/961.jpg')
+        response = requests.get(url if url.startswith('http') else f"{BASE_URL}{url}")
+        assert response.status_code == 404
+
+
+class TestSearch:
+    """Tests for /api/search endpoint"""
+    
+    def test_search_finds_default_program(self):
+        """Verify a title word from a default program ranks that program"""
+        response = requests.get(f"{BASE_URL}/api/search", params={"q": "chapter"})
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert len(results) > 0, "No search results for 'chapter'"
+        assert results[0]['type'] == 'programs'
+        assert 'chapter' in results[0]['item']['title'].lower()
+    
+    def test_search_prefix_match(self):
+        """Verify the last query token matches as a prefix"""
+        response = requests.get(f"{BASE_URL}/api/search", params={"q": "leader"})
+        assert response.status_code == 200
+        titles = [r['item']['title'] for r in response.json()['results']]
+        assert any('Leadership' in t for t in titles), f"Prefix search missed leadership: {titles}"
+    
+    def test_search_filter_by_type(self):
+        """Verify results can be limited to one collection"""
+        response = requests.get(f"{BASE_URL}/api/search", params={"q": "service", "type": "programs"})
+        assert response.status_code == 200
+        for result in response.json()['results']:
+            assert result['type'] == 'programs'
+    
+    def test_search_unknown_type_rejected(self):
+        """Verify an unknown type filter is a 400"""
+        response = requests.get(f"{BASE_URL}/api/search", params={"q": "service", "type": "stats"})
+        assert response.status_code == 400
+
+
 class TestFormSubmission:
     """Tests for /api/forms/submit endpoint"""
     
@@ -285,6 +481,121 @@ class TestFormSubmissionRetrieval:
         # All returned submissions should be volunteer type
         for submission in data:
             assert submission.get('formType') == 'volunteer', f"Got non-volunteer submission: {submission.get('formType')}"
+    
+    def test_filter_submissions_by_date_range(self):
+        """Verify since/until bound submittedAt and results stay newest first"""
+        since = "2026-01-01"
+        response = requests.get(f"{BASE_URL}/api/forms/submissions", params={"since": since, "limit": 50})
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) <= 50
+        stamps = [s['submittedAt'] for s in data]
+        assert all(stamp >= since for stamp in stamps)
+        assert stamps == sorted(stamps, reverse=True)
+
+
+class TestEventsCalendar:
+    """Tests for the /api/cms/events.ics feed"""
+    
+    def test_feed_is_valid_icalendar_with_validators(self):
+        """Verify the feed parses as a calendar and supports conditional GETs"""
+        response = requests.get(f"{BASE_URL}/api/cms/events.ics")
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/calendar')
+        assert response.text.startswith('BEGIN:VCALENDAR\r\n')
+        assert response.text.rstrip().endswith('END:VCALENDAR')
+        assert response.text.count('BEGIN:VEVENT') == response.text.count('END:VEVENT') >= 1
+        assert response.headers.get('last-modified')
+        
+        cached = requests.get(f"{BASE_URL}/api/cms/events.ics", headers={"If-None-Match": response.headers['etag']})
+        assert cached.status_code == 304
+
+
+class TestPrerenderedPages:
+    """Tests for server-rendered program/event pages and the sitemap"""
+    
+    def test_program_page_inlines_content_and_og_tags(self):
+        """Verify a program page carries its content and Open Graph tags before any JS runs"""
+        programs = requests.get(f"{BASE_URL}/api/cms/programs").json()
+        program = next(p for p in programs if p.get('active'))
+        response = requests.get(f"{BASE_URL}/program/{program['slug']}")
+        assert response.status_code == 200
+        assert 'text/html' in response.headers['content-type']
+        assert 'property="og:title"' in response.text
+        assert '<div id="root"><main>' in response.text
+        
+        etag = response.headers.get('etag')
+        assert etag
+        cached = requests.get(f"{BASE_URL}/program/{program['slug']}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+    
+    def test_unknown_event_page_is_404(self):
+        """Verify unknown ids aren't rendered"""
+        response = requests.get(f"{BASE_URL}/event/does-not-exist")
+        assert response.status_code == 404
+    
+    def test_sitemap_lists_active_programs(self):
+        """Verify sitemap.xml has a url entry per active program"""
+        response = requests.get(f"{BASE_URL}/sitemap.xml")
+        assert response.status_code == 200
+        assert '<urlset' in response.text
+        programs = requests.get(f"{BASE_URL}/api/cms/programs").json()
+        for program in programs:
+            if program.get('active'):
+                assert f"/program/{program['slug']}</loc>" in response.text
+
+
+class TestAdminSummary:
+    """Tests for /api/admin/summary"""
+    
+    def test_summary_has_counts_and_recent_items(self):
+        """Verify counts per collection and at most N latest submissions per formType"""
+        response = requests.get(f"{BASE_URL}/api/admin/summary", params={"recent": 3})
+        assert response.status_code == 200
+        data = response.json()
+        programs = data['collections']['programs']
+        assert programs['total'] >= 4
+        assert programs['active'] + programs['inactive'] == programs['total']
+        assert len(data['upcomingEvents']) <= 3
+        for form_type, group in data['submissions'].items():
+            assert len(group['latest']) <= min(3, group['count'])
+            stamps = [s['submittedAt'] for s in group['latest']]
+            assert stamps == sorted(stamps, reverse=True)
+        assert response.headers.get('cache-control') == 'no-store'
+
+
+class TestNewsletterSubscriptions:
+    """Tests for newsletter subscriber handling"""
+    
+    def test_unsubscribe_rejects_unsigned_links(self):
+        """Verify an unsubscribe link without a valid signature does nothing"""
+        response = requests.get(
+            f"{BASE_URL}/api/newsletter/unsubscribe",
+            params={"email": "someone@example.org", "token": "not-a-valid-token"},
+        )
+        assert response.status_code == 404
+
+
+class TestSubmissionAnalytics:
+    """Tests for /api/analytics/submissions rollups"""
+    
+    def test_series_is_zero_filled(self):
+        """Verify one entry per requested day"""
+        response = requests.get(f"{BASE_URL}/api/analytics/submissions?days=14")
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data['series']) == 14
+        assert data['total'] == sum(day['total'] for day in data['series'])
+    
+    def test_submit_increments_todays_rollup(self):
+        """Verify a submission is counted in today's bucket"""
+        before = requests.get(f"{BASE_URL}/api/analytics/submissions?days=1&form_type=contact").json()
+        requests.post(f"{BASE_URL}/api/forms/submit", json={
+            "formType": "contact",
+            "data": {"name": "TEST_Analytics", "email": "test_analytics@test.com", "subject": "Rollup", "message": "Counting"}
+        })
+        after = requests.get(f"{BASE_URL}/api/analytics/submissions?days=1&form_type=contact").json()
+        assert after['total'] == before['total'] + 1
 
 
 class TestCMSSettings:
@@ -316,6 +627,51 @@ class TestCMSInitialize:
         programs_response = requests.get(f"{BASE_URL}/api/cms/programs")
         programs = programs_response.json()
         assert len(programs) == 4, f"Expected 4 programs after double init, got {len(programs)}"
+    
+    def test_initialize_reports_migrations_up_to_date(self):
+        """Verify a repeat initialize has no pending migrations to apply"""
+        requests.post(f"{BASE_URL}/api/cms/initialize")
+        response = requests.post(f"{BASE_URL}/api/cms/initialize")
+        assert response.status_code == 200
+        data = response.json()
+        assert data['applied'] == []
+        assert data['status'] in ('up-to-date', 'locked')
+
+
+class TestTenants:
+    """Tests for chapter-scoped CMS content under /api/t/{tenant}"""
+    
+    def test_unknown_tenant_is_404(self):
+        """Verify an unregistered tenant prefix isn't routed"""
+        response = requests.get(f"{BASE_URL}/api/t/test-no-such-chapter/cms/all")
+        assert response.status_code == 404
+    
+    def test_tenant_content_is_isolated(self):
+        """Verify a chapter's program shows up for that chapter only"""
+        tenant = f"test-{uuid.uuid4().hex[:8]}"
+        response = requests.post(f"{BASE_URL}/api/tenants", json={"id": tenant, "name": "TEST_Chapter"})
+        assert response.status_code == 201
+        program = {
+            "id": f"TEST_{uuid.uuid4().hex[:8]}", "title": "TEST_Chapter Program", "description": "Chapter only",
+            "frequency": "Weekly", "location": "Campus", "impact": "Local", "icon": "Heart",
+            "color": "accent", "active": True, "slug": "test-chapter-program",
+        }
+        assert requests.post(f"{BASE_URL}/api/t/{tenant}/cms/programs", json=program).status_code == 200
+        
+        chapter = requests.get(f"{BASE_URL}/api/t/{tenant}/cms/all")
+        assert chapter.status_code == 200
+        assert [p['id'] for p in chapter.json()['programs']] == [program['id']]
+        assert f"{tenant}:programs" in chapter.headers.get('Surrogate-Key', '')
+        statewide = requests.get(f"{BASE_URL}/api/cms/programs").json()
+        assert program['id'] not in [p['id'] for p in statewide]
+        assert all('tenant' not in p for p in statewide)
+    
+    def test_duplicate_tenant_rejected(self):
+        """Verify registering the same chapter twice is a conflict"""
+        tenant = f"test-{uuid.uuid4().hex[:8]}"
+        requests.post(f"{BASE_URL}/api/tenants", json={"id": tenant, "name": "TEST_Chapter"})
+        response = requests.post(f"{BASE_URL}/api/tenants", json={"id": tenant, "name": "TEST_Chapter"})
+        assert response.status_code == 409
 
 
 if __name__ == "__main__":
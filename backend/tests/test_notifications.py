@@ -0,0 +1,187 @@
+"""
+Notification batching tests
+Mode parsing, window arithmetic, digest rendering and the claim/send/delete cycle,
+with an in-memory stand-in for the pending_notifications collection
+"""
+
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import notifications  # noqa: E402
+
+NOW = datetime(2026, 3, 2, 10, 7, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def modes(monkeypatch):
+    def use(spec):
+        monkeypatch.setattr(notifications, "MODES", notifications._parse_modes(spec))
+    return use
+
+
+class TestParseModes:
+    def test_parses_each_mode(self):
+        assert notifications._parse_modes("volunteer:batch:30, contact:digest,default:immediate") == {
+            "volunteer": ("batch", 30),
+            "contact": ("digest", 0),
+            "default": ("immediate", 0),
+        }
+
+    def test_batch_window_defaults_to_15_minutes(self):
+        assert notifications._parse_modes("volunteer:batch") == {"volunteer": ("batch", 15)}
+
+    def test_empty_spec(self):
+        assert notifications._parse_modes("") == {}
+
+    @pytest.mark.parametrize("spec", ["volunteer:batch:0", "volunteer:batch:-5", "volunteer:batch:soon"])
+    def test_rejects_bad_batch_windows(self, spec):
+        with pytest.raises(ValueError):
+            notifications._parse_modes(spec)
+
+    def test_rejects_unknown_mode(self):
+        with pytest.raises(ValueError, match="Unknown notification mode"):
+            notifications._parse_modes("volunteer:hourly")
+
+
+class TestDueAt:
+    def test_batch_rounds_up_to_the_end_of_the_window(self, modes):
+        modes("volunteer:batch:15")
+        assert notifications.due_at("volunteer", NOW) == datetime(2026, 3, 2, 10, 15, tzinfo=timezone.utc)
+
+    def test_batch_on_a_boundary_belongs_to_the_next_window(self, modes):
+        modes("volunteer:batch:15")
+        boundary = datetime(2026, 3, 2, 10, 15, tzinfo=timezone.utc)
+        assert notifications.due_at("volunteer", boundary) == boundary + timedelta(minutes=15)
+
+    def test_digest_is_due_at_the_next_digest_hour(self, modes, monkeypatch):
+        modes("contact:digest")
+        monkeypatch.setattr(notifications, "DIGEST_HOUR", 8)
+        assert notifications.due_at("contact", NOW) == datetime(2026, 3, 3, 8, tzinfo=timezone.utc)
+        monkeypatch.setattr(notifications, "DIGEST_HOUR", 18)
+        assert notifications.due_at("contact", NOW) == datetime(2026, 3, 2, 18, tzinfo=timezone.utc)
+
+    def test_immediate_and_default(self, modes):
+        modes("volunteer:batch:15,default:digest")
+        assert notifications.due_at("partner", NOW) is not None
+        modes("volunteer:batch:15")
+        assert notifications.due_at("partner", NOW) is None
+        assert notifications.scheduler_needed()
+        modes("default:immediate")
+        assert not notifications.scheduler_needed()
+
+
+def _notification(form_type, subject, minutes_ago=0, **extra):
+    return {
+        "formType": form_type, "subject": subject, "body": f"{subject} body\n",
+        "createdAt": NOW - timedelta(minutes=minutes_ago), "dueAt": NOW - timedelta(minutes=1),
+        "claimedBy": None, **extra,
+    }
+
+
+def test_render_digest_groups_by_form_type_in_order():
+    subject, body = notifications.render_digest([
+        _notification("volunteer", "Later volunteer", minutes_ago=1),
+        _notification("contact", "A question", minutes_ago=5),
+        _notification("volunteer", "Earlier volunteer", minutes_ago=3),
+    ])
+    assert subject == "UISN form submissions - 3 new (contact 1, volunteer 2)"
+    assert body.index("contact (1)") < body.index("volunteer (2)")
+    assert body.index("Earlier volunteer") < body.index("Later volunteer")
+    assert "A question body" in body
+
+# ============ SEND_DUE ============
+
+def _matches(doc, filter):
+    for key, condition in filter.items():
+        if key == "$or":
+            if not any(_matches(doc, option) for option in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            if value is None:
+                return False
+            if "$lte" in condition and not value <= condition["$lte"]:
+                return False
+            if "$lt" in condition and not value < condition["$lt"]:
+                return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakePending:
+    """The handful of collection methods send_due uses, over a list of dicts"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def update_many(self, filter, update):
+        for doc in self.docs:
+            if _matches(doc, filter):
+                doc.update(update["$set"])
+
+    def find(self, filter):
+        found = [dict(doc) for doc in self.docs if _matches(doc, filter)]
+
+        class Cursor:
+            async def to_list(self, length):
+                return found
+        return Cursor()
+
+    async def delete_many(self, filter):
+        self.docs[:] = [doc for doc in self.docs if not _matches(doc, filter)]
+
+
+def _send_due(docs, ok=True):
+    sent = []
+
+    async def send(subject, body):
+        sent.append((subject, body))
+        return ok
+
+    database = {notifications.PENDING_COLLECTION: FakePending(docs)}
+    return asyncio.run(notifications.send_due(database, send)), sent
+
+
+class TestSendDue:
+    def test_sends_due_notifications_as_one_email_and_deletes_them(self):
+        later = _notification("volunteer", "Not yet", dueAt=datetime.now(timezone.utc) + timedelta(hours=1))
+        docs = [_notification("volunteer", "One"), _notification("contact", "Two"), later]
+        count, sent = _send_due(docs)
+        assert count == 2
+        assert len(sent) == 1 and "2 new" in sent[0][0]
+        assert docs == [later]
+
+    def test_failed_send_releases_the_claim(self):
+        docs = [_notification("volunteer", "One")]
+        count, sent = _send_due(docs, ok=False)
+        assert count == 0 and len(sent) == 1
+        assert docs[0]["claimedBy"] is None
+
+    def test_skips_live_claims_but_takes_over_expired_ones(self):
+        now = datetime.now(timezone.utc)
+        live = _notification("volunteer", "Claimed", claimedBy="other", claimedAt=now)
+        expired = _notification("volunteer", "Abandoned", claimedBy="dead", claimedAt=now - timedelta(hours=1))
+        docs = [live, expired]
+        count, sent = _send_due(docs)
+        assert count == 1 and "Abandoned" in sent[0][1]
+        assert docs == [live]
+
+    def test_nothing_due_sends_nothing(self):
+        assert _send_due([]) == (0, [])
+
+
+def test_render_digest_separates_chapters():
+    subject, body = notifications.render_digest([
+        _notification("volunteer", "Statewide", tenant="main"),
+        _notification("volunteer", "Legacy"),
+        _notification("volunteer", "Chapter", tenant="usu"),
+    ])
+    assert subject == "UISN form submissions - 3 new (usu volunteer 1, volunteer 2)"
+    assert body.index("usu volunteer (1)") < body.index("Chapter body")
@@ -0,0 +1,314 @@
+"""
+Query-plan regression tests against a seeded local mongod
+Every query shape the handlers issue is run through explain("executionStats"),
+built with the handlers' own filter and pipeline helpers wherever they have one.
+A shape fails if it scans the whole collection, sorts more than SORT_LIMIT
+documents in memory, or examines far more documents than it returns. Indexes
+come from the real migrations, so dropping or reordering one fails here rather
+than in production.
+
+Skipped unless a mongod is reachable at QUERY_PLAN_MONGO_URL (default
+mongodb://localhost:27017; MONGO_URL is deliberately ignored so this never runs
+against a deployment). Each run seeds and drops a throwaway database.
+"""
+
+import asyncio
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import analytics  # noqa: E402
+import archive  # noqa: E402
+import dashboard  # noqa: E402
+import migrations  # noqa: E402
+import newsletter  # noqa: E402
+import notifications  # noqa: E402
+import tenants  # noqa: E402
+import uploads  # noqa: E402
+
+MONGO_URL = os.environ.get('QUERY_PLAN_MONGO_URL', 'mongodb://localhost:27017')
+# Largest input an in-memory SORT may take: a tenant's CMS collection, capped at 100 documents
+SORT_LIMIT = int(os.environ.get('QUERY_PLAN_SORT_LIMIT', 200))
+# Documents examined may exceed documents returned by this factor (or by EXAMINED_SLACK)
+EXAMINED_RATIO = 2
+EXAMINED_SLACK = 5
+
+CHAPTER = "usu"
+TENANTS = (tenants.DEFAULT_TENANT, None, CHAPTER, "weber")  # None: written before tenants existed
+FORM_TYPES = ("volunteer", "partner", "newsletter", "contact", "chapter")
+CONTENT_PROJECTION = {"_id": 0, "tenant": 0}
+NOW = datetime.now(timezone.utc)
+
+
+def _iso(days_ago: float) -> str:
+    return (NOW - timedelta(days=days_ago)).isoformat()
+
+
+def _seed(db):
+    rng = random.Random(49)
+    for name in migrations.CMS_COLLECTIONS:
+        db[name].insert_many([
+            {
+                **({"tenant": tenant} if tenant else {}),
+                "id": f"{tenant or 'legacy'}-{i}",
+                "title": f"{name} {i}",
+                "active": i % 4 != 0,
+                "date": (NOW + timedelta(days=i - 10)).date().isoformat(),
+            }
+            for tenant in TENANTS for i in range(40)
+        ])
+    for name in ("about", "settings"):
+        db[name].insert_many([{"tenant": t, "mission": "", "story": ""} for t in TENANTS[2:]])
+
+    def submission(days_ago):
+        tenant = rng.choice(TENANTS)
+        return {
+            **({"tenant": tenant} if tenant else {}),
+            "formType": rng.choice(FORM_TYPES),
+            "data": {"email": f"user{rng.randrange(10**6)}@example.edu"},
+            "submittedAt": _iso(days_ago),
+        }
+
+    db[archive.HOT_COLLECTION].insert_many([submission(rng.uniform(0, 90)) for _ in range(6000)])
+    db[archive.ARCHIVE_COLLECTION].insert_many([submission(rng.uniform(90, 700)) for _ in range(4000)])
+    db[newsletter.SUBSCRIBERS].insert_many([
+        {"email": f"subscriber{i:05d}@example.edu", "status": "active" if i % 5 else "unsubscribed"}
+        for i in range(3000)
+    ])
+    db[notifications.PENDING_COLLECTION].insert_many([
+        {
+            "formType": rng.choice(FORM_TYPES),
+            "subject": "s",
+            "body": "b",
+            "createdAt": NOW,
+            "dueAt": NOW + timedelta(minutes=rng.randint(-30, 24 * 60)),
+            "claimedBy": None if i % 10 else uuid.uuid4().hex,
+            "claimedAt": NOW,
+        }
+        for i in range(2000)
+    ])
+    db[analytics.ROLLUP_COLLECTION].insert_many([
+        {"_id": tenants.key((NOW - timedelta(days=d)).date().isoformat(), t), "total": 1, "counts": {"volunteer": 1}}
+        for t in (tenants.DEFAULT_TENANT, CHAPTER, "weber") for d in range(730)
+    ])
+    db[f"{uploads.BUCKET_NAME}.files"].insert_many([
+        {"metadata": {"sha256": f"{i:064x}"}, "uploadDate": NOW, "length": 1} for i in range(500)
+    ])
+    db.public_site.insert_many([
+        {"_id": tenants.key("current", t), "version": 1, "payload": {}} for t in (tenants.DEFAULT_TENANT, CHAPTER)
+    ])
+    db[tenants.TENANTS_COLLECTION].insert_many([{"_id": t, "id": t, "name": t} for t in (CHAPTER, "weber")])
+
+
+async def _migrate(db_name: str):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    client = AsyncIOMotorClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        database = client[db_name]
+        result = await migrations.run_migrations(database)
+        assert result["status"] != "locked"
+        await uploads._ensure_indexes(database)
+    finally:
+        client.close()
+
+
+@pytest.fixture(scope="module")
+def db():
+    client = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"No mongod at {MONGO_URL}: {e}")
+    db_name = f"query_plans_{uuid.uuid4().hex[:8]}"
+    try:
+        asyncio.run(_migrate(db_name))
+        _seed(client[db_name])
+        yield client[db_name]
+    finally:
+        client.drop_database(db_name)
+        client.close()
+
+# ============ EXPLAIN ============
+
+def _stages(plan) -> list:
+    """Every classic stage name in a winning plan (SBE plans carry the same tree under queryPlan)"""
+    found = []
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            found.append(plan["stage"])
+        for key, value in plan.items():
+            if key != "slotBasedPlan":
+                found += _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            found += _stages(item)
+    return found
+
+
+def _plans(explain) -> list:
+    """(winningPlan, executionStats) for each query an explain output contains.
+
+    A find explains as one; an aggregation has one at the top level or one per
+    $cursor stage, depending on how much of the pipeline was pushed down.
+    """
+    found = []
+    if isinstance(explain, dict):
+        if "queryPlanner" in explain:
+            found.append((explain["queryPlanner"]["winningPlan"], explain.get("executionStats", {})))
+        for value in explain.values():
+            found += _plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            found += _plans(item)
+    return found
+
+
+def explain_find(db, collection, filter, projection=None, sort=None, limit=None):
+    command = {"find": collection, "filter": filter}
+    if projection:
+        command["projection"] = projection
+    if sort:
+        command["sort"] = sort
+    if limit:
+        command["limit"] = limit
+    return db.command("explain", command, verbosity="executionStats")
+
+
+def explain_aggregate(db, collection, pipeline):
+    return db.command(
+        "explain", {"aggregate": collection, "pipeline": pipeline, "cursor": {}}, verbosity="executionStats"
+    )
+
+
+def assert_efficient(explain, check_examined=True):
+    plans = _plans(explain)
+    assert plans, f"No query plan in explain output: {explain}"
+    for plan, stats in plans:
+        stages = _stages(plan)
+        assert "COLLSCAN" not in stages, f"Collection scan: {stages}"
+        examined = stats.get("totalDocsExamined", 0)
+        if "SORT" in stages:
+            assert examined <= SORT_LIMIT, f"In-memory SORT over {examined} documents: {stages}"
+        if check_examined:
+            returned = stats.get("nReturned", 0)
+            assert examined <= max(returned * EXAMINED_RATIO, returned + EXAMINED_SLACK), (
+                f"Examined {examined} documents to return {returned}: {stages}"
+            )
+
+# ============ CMS ============
+
+@pytest.mark.parametrize("tenant", [tenants.DEFAULT_TENANT, CHAPTER])
+class TestContentQueries:
+    """find_all / find_one / load_cms_data and the by-id writes"""
+
+    @pytest.mark.parametrize("collection", migrations.CMS_COLLECTIONS)
+    def test_find_all(self, db, tenant, collection):
+        assert_efficient(explain_find(db, collection, tenants.query(tenant), CONTENT_PROJECTION, limit=100))
+
+    @pytest.mark.parametrize("collection", ["about", "settings"])
+    def test_find_one(self, db, tenant, collection):
+        assert_efficient(explain_find(db, collection, tenants.query(tenant), CONTENT_PROJECTION, limit=1))
+
+    @pytest.mark.parametrize("collection", migrations.CMS_COLLECTIONS)
+    def test_by_id(self, db, tenant, collection):
+        """Filter of the update_one / delete_one in every write handler"""
+        doc_id = f"{tenant}-7"
+        assert_efficient(explain_find(db, collection, tenants.query(tenant, id=doc_id)))
+
+    def test_public_site(self, db, tenant):
+        assert_efficient(explain_find(db, "public_site", {"_id": tenants.key("current", tenant)}, {"_id": 0}))
+
+    def test_tenant_registry(self, db, tenant):
+        assert_efficient(explain_find(db, tenants.TENANTS_COLLECTION, {"_id": tenant}, {"_id": 1}, limit=1))
+
+# ============ SUBMISSIONS ============
+
+@pytest.mark.parametrize("tenant", [tenants.DEFAULT_TENANT, CHAPTER])
+@pytest.mark.parametrize("collection", [archive.HOT_COLLECTION, archive.ARCHIVE_COLLECTION])
+class TestSubmissionQueries:
+    """archive.find_submissions, as called by get_submissions"""
+
+    def test_newest_first(self, db, tenant, collection):
+        assert_efficient(explain_find(db, collection, tenants.query(tenant), sort={"submittedAt": -1}, limit=100))
+
+    def test_by_form_type(self, db, tenant, collection):
+        query = tenants.query(tenant, formType="volunteer")
+        assert_efficient(explain_find(db, collection, query, sort={"submittedAt": -1}, limit=100))
+
+    @pytest.mark.parametrize("until", [_iso(30), _iso(30)[:10]])
+    def test_date_range(self, db, tenant, collection, until):
+        query = tenants.query(tenant, submittedAt=archive._date_range(_iso(400), until))
+        assert_efficient(explain_find(db, collection, query, sort={"submittedAt": -1}, limit=100))
+
+
+class TestBackgroundJobQueries:
+    def test_archive_batch(self, db):
+        query = {"submittedAt": {"$lt": _iso(60)}}
+        assert_efficient(explain_find(db, archive.HOT_COLLECTION, query, sort={"submittedAt": 1}, limit=500))
+
+    def test_claim_due_notifications(self, db):
+        """Filter of the update_many that claims due notifications"""
+        # Claimed-but-fresh notifications are examined and skipped; that's bounded by the window
+        query = notifications._claimable(NOW)
+        assert_efficient(explain_find(db, notifications.PENDING_COLLECTION, query), check_examined=False)
+
+    def test_claimed_notifications(self, db):
+        assert_efficient(explain_find(db, notifications.PENDING_COLLECTION, {"claimedBy": uuid.uuid4().hex}))
+
+    def test_campaign_cursor(self, db):
+        query = {"status": "active", "email": {"$gt": "subscriber01000@example.edu"}}
+        assert_efficient(explain_find(db, newsletter.SUBSCRIBERS, query, {"email": 1}, sort={"email": 1}))
+
+    def test_subscriber_by_email(self, db):
+        assert_efficient(explain_find(db, newsletter.SUBSCRIBERS, {"email": "subscriber00042@example.edu"}))
+
+    @pytest.mark.parametrize("tenant", [tenants.DEFAULT_TENANT, CHAPTER])
+    def test_analytics_series(self, db, tenant):
+        token = tenants.current.set(tenant)
+        try:
+            query = analytics.series_filter((NOW - timedelta(days=29)).date().isoformat(), NOW.date().isoformat())
+        finally:
+            tenants.current.reset(token)
+        explain = explain_find(db, analytics.ROLLUP_COLLECTION, query, limit=30)
+        assert_efficient(explain)
+        assert all(stats.get("nReturned") == 30 for _, stats in _plans(explain))
+
+    def test_upload_by_hash(self, db):
+        query = {"metadata.sha256": f"{42:064x}"}
+        assert_efficient(explain_find(db, f"{uploads.BUCKET_NAME}.files", query, sort={"uploadDate": 1}, limit=1))
+
+# ============ DASHBOARD ============
+
+@pytest.mark.parametrize("tenant", [tenants.DEFAULT_TENANT, CHAPTER])
+class TestDashboardQueries:
+    """The aggregations behind /api/admin/summary; they summarize, so only scans are checked"""
+
+    @pytest.mark.parametrize("collection", migrations.CMS_COLLECTIONS)
+    def test_collection_summary(self, db, tenant, collection):
+        pipeline = dashboard.collection_summary_pipeline(tenants.query(tenant))
+        assert_efficient(explain_aggregate(db, collection, pipeline), check_examined=False)
+
+    def test_upcoming_events(self, db, tenant):
+        pipeline = dashboard.upcoming_events_pipeline(5, tenants.query(tenant), NOW.date().isoformat())
+        assert_efficient(explain_aggregate(db, "events", pipeline), check_examined=False)
+
+    def test_submissions_by_type(self, db, tenant):
+        pipeline = dashboard.submissions_by_type_pipeline(5, tenants.query(tenant))
+        assert_efficient(explain_aggregate(db, archive.HOT_COLLECTION, pipeline), check_examined=False)
+
+    def test_active_subscribers(self, db, tenant):
+        pipeline = [{"$match": {"status": "active"}}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]
+        assert_efficient(explain_aggregate(db, newsletter.SUBSCRIBERS, pipeline), check_examined=False)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,70 @@
+"""
+Fast vs. standard serialization of CMS reads
+Both paths must return the same JSON for the same stored documents, including
+documents that carry internal fields or omit optional ones
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import serialization  # noqa: E402
+import server  # noqa: E402
+
+STORED = {
+    "programs": [{
+        "id": "1", "title": "Create a Chapter", "description": "Start one", "frequency": "Year-round",
+        "location": "Campus", "impact": "Statewide", "icon": "GraduationCap", "color": "secondary",
+        "active": True, "slug": "create-chapter", "tenant": "main", "updatedAt": "2026-01-01T00:00:00+00:00",
+    }],
+    # time, description, registrationLink and image left out: the response fills them with null
+    "events": [{"id": "e1", "title": "Food drive", "date": "2026-04-01", "location": "Logan", "active": True,
+                "tenant": "main", "updatedAt": "2026-01-01T00:00:00+00:00"}],
+    "opportunities": [{"id": "o1", "title": "Tutor", "description": "Help out", "active": False,
+                       "updatedAt": "2026-01-01T00:00:00+00:00"}],
+    "stats": [],
+    "impact_stories": [{"id": "s1", "title": "Ünïcode", "description": "—", "image": "/x.png", "active": True}],
+    "announcements": [{"id": "a1", "title": "Hi", "content": "c", "date": "2026-01-01", "priority": "high",
+                       "active": True, "tenant": "usu"}],
+    "about": {"mission": "Serve", "story": "Founded", "tenant": "main", "updatedAt": "2026-01-01"},
+    "settings": {"donateEnabled": True, "emailNotifications": "a@example.edu", "tenant": "main"},
+}
+PATHS = [
+    "/api/cms/programs", "/api/cms/events", "/api/cms/opportunities", "/api/cms/stats",
+    "/api/cms/impact-stories", "/api/cms/announcements", "/api/cms/about", "/api/cms/settings",
+]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def find_all(collection, response):
+        return [dict(doc) for doc in STORED[collection]]
+
+    async def find_one(collection, response):
+        return dict(STORED[collection])
+
+    monkeypatch.setattr(server, "find_all", find_all)
+    monkeypatch.setattr(server, "find_one", find_one)
+    return TestClient(server.app)
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_fast_path_matches_response_model(client, monkeypatch, path):
+    monkeypatch.setattr(serialization, "FAST_SERIALIZATION", False)
+    standard = client.get(path)
+    monkeypatch.setattr(serialization, "FAST_SERIALIZATION", True)
+    fast = client.get(path)
+    assert standard.status_code == fast.status_code == 200
+    assert fast.json() == standard.json()
+    assert "tenant" not in fast.text and "updatedAt" not in fast.text
+
+
+def test_project_fills_defaults_without_sharing_them():
+    first, second = serialization.project([{"id": "1"}, {"id": "2"}], server.Opportunity)
+    assert first["skills"] == [] and first["category"] is None
+    first["skills"].append("x")
+    assert second["skills"] == []
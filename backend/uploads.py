@@ -0,0 +1,156 @@
+"""GridFS-backed media uploads: chunked streaming in and out, with content-hash deduplication"""
+
+import hashlib
+import logging
+import os
+import re
+from typing import AsyncIterator, Optional, Tuple
+
+from media import PUBLIC_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+BUCKET_NAME = 'media'
+CHUNK_SIZE = 255 * 1024  # GridFS default chunk size - one network read per chunk
+MAX_UPLOAD_BYTES = int(os.environ.get('MEDIA_MAX_UPLOAD_BYTES', 25 * 1024 * 1024))
+ALLOWED_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/gif', 'image/avif'}
+
+URL_PREFIX = '/api/media/uploads/'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_indexed = False
+
+
+class UploadError(Exception):
+    """Raised for rejected uploads or unsatisfiable downloads; carries an HTTP status"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def bucket(database):
+    # Imported here so the upload routes don't cost every cold start a GridFS import
+    from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+    return AsyncIOMotorGridFSBucket(database, bucket_name=BUCKET_NAME, chunk_size_bytes=CHUNK_SIZE)
+
+
+async def _ensure_indexes(database):
+    global _indexed
+    if not _indexed:
+        await database[f'{BUCKET_NAME}.files'].create_index('metadata.sha256')
+        _indexed = True
+
+
+async def find_by_hash(database, sha256: str) -> Optional[dict]:
+    """Oldest stored file with this content hash - the canonical copy"""
+    await _ensure_indexes(database)
+    return await database[f'{BUCKET_NAME}.files'].find_one(
+        {"metadata.sha256": sha256}, sort=[("uploadDate", 1)]
+    )
+
+
+def describe(file_doc: dict) -> dict:
+    file_id = str(file_doc['_id'])
+    return {
+        "id": file_id,
+        "filename": file_doc.get('filename'),
+        "contentType": file_doc.get('metadata', {}).get('contentType'),
+        "length": file_doc.get('length'),
+        "sha256": file_doc.get('metadata', {}).get('sha256'),
+        "url": f"{PUBLIC_BASE_URL}{URL_PREFIX}{file_id}",
+    }
+
+
+async def store_stream(database, chunks: AsyncIterator[bytes], filename: str, content_type: str) -> Tuple[dict, bool]:
+    """Write an incoming byte stream to GridFS chunk by chunk.
+
+    The hash is computed while streaming; if an identical file already exists the new
+    copy is dropped and the existing one returned. Returns (file description, created).
+    """
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise UploadError(415, f"Unsupported content type: {content_type}")
+    await _ensure_indexes(database)
+
+    digest = hashlib.sha256()
+    size = 0
+    grid_in = bucket(database).open_upload_stream(filename, metadata={"contentType": content_type})
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise UploadError(413, "Upload too large")
+            digest.update(chunk)
+            await grid_in.write(chunk)
+        if size == 0:
+            raise UploadError(400, "Empty upload")
+        sha256 = digest.hexdigest()
+        await grid_in.set('metadata', {"contentType": content_type, "sha256": sha256})
+        await grid_in.close()
+    except BaseException:
+        await grid_in.abort()
+        raise
+
+    # Two identical uploads racing each other both resolve to the oldest copy
+    existing = await find_by_hash(database, sha256)
+    if existing and existing['_id'] != grid_in._id:
+        await bucket(database).delete(grid_in._id)
+        return describe(existing), False
+    file_doc = await database[f'{BUCKET_NAME}.files'].find_one({"_id": grid_in._id})
+    return describe(file_doc), True
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Parse a single-range `Range` header into an inclusive (start, end) pair"""
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        raise UploadError(416, "Invalid range")
+    start, end = match.groups()
+    if start == '':
+        # Suffix range: last N bytes
+        start, end = max(length - int(end), 0), length - 1
+    else:
+        start, end = int(start), min(int(end), length - 1) if end else length - 1
+    if start >= length or start > end:
+        raise UploadError(416, "Range not satisfiable")
+    return start, end
+
+
+async def open_download(database, file_id: str):
+    from bson import ObjectId
+    from bson.errors import InvalidId
+    from gridfs.errors import NoFile
+
+    try:
+        oid = ObjectId(file_id)
+    except InvalidId:
+        raise UploadError(404, "Upload not found")
+    try:
+        return await bucket(database).open_download_stream(oid)
+    except NoFile:
+        raise UploadError(404, "Upload not found")
+
+
+async def iter_file(grid_out, start: int, end: int) -> AsyncIterator[bytes]:
+    """Yield bytes start..end (inclusive) one GridFS chunk at a time"""
+    grid_out.seek(start)  # a synchronous delegate in Motor, unlike read()
+    remaining = end - start + 1
+    while remaining > 0:
+        data = await grid_out.read(min(CHUNK_SIZE, remaining))
+        if not data:
+            break
+        remaining -= len(data)
+        yield data
+
+
+async def copy_to_path(database, file_id: str, dst_path: str):
+    """Copy a stored upload to a local file (used as a source by the image proxy)"""
+    grid_out = await open_download(database, file_id)
+    with open(dst_path, 'wb') as out:
+        async for data in iter_file(grid_out, 0, grid_out.length - 1):
+            out.write(data)
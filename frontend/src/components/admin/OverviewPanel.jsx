@@ -0,0 +1,141 @@
+import React, { useState, useEffect } from 'react';
+import { Card, CardContent, CardHeader, CardTitle } from '../ui/card';
+import { Button } from '../ui/button';
+import { RefreshCw, Calendar as CalendarIcon, Inbox, Mail } from 'lucide-react';
+import { getAdminSummary } from '../../utils/cmsStorage';
+
+const COLLECTION_LABELS = {
+  programs: 'Programs',
+  events: 'Events',
+  announcements: 'Announcements',
+  opportunities: 'Opportunities',
+  impact_stories: 'Impact Stories',
+  stats: 'Stats',
+};
+
+const submissionLabel = (submission) => {
+  const data = submission.data || {};
+  return data.name || data.organizationName || data.organizerName || data.email || 'Submission';
+};
+
+export const OverviewPanel = () => {
+  const [summary, setSummary] = useState(null);
+  const [error, setError] = useState(false);
+
+  useEffect(() => {
+    loadSummary();
+  }, []);
+
+  const loadSummary = async () => {
+    try {
+      setError(false);
+      setSummary(await getAdminSummary(5));
+    } catch (e) {
+      setError(true);
+    }
+  };
+
+  if (error) {
+    return (
+      <Card>
+        <CardContent className="p-6 flex items-center justify-between">
+          <p className="text-muted-foreground">Could not load the dashboard summary.</p>
+          <Button variant="outline" onClick={loadSummary}>
+            <RefreshCw size={16} className="mr-2" />
+            Retry
+          </Button>
+        </CardContent>
+      </Card>
+    );
+  }
+
+  if (!summary) {
+    return <p className="text-muted-foreground">Loading overview...</p>;
+  }
+
+  return (
+    <div className="space-y-6">
+      <div className="grid grid-cols-2 md:grid-cols-3 lg:grid-cols-6 gap-4">
+        {Object.entries(COLLECTION_LABELS).map(([key, label]) => {
+          const counts = summary.collections[key] || { total: 0, active: 0, inactive: 0 };
+          return (
+            <Card key={key}>
+              <CardContent className="p-4">
+                <p className="text-sm text-muted-foreground">{label}</p>
+                <p className="text-3xl font-bold text-primary">{counts.total}</p>
+                <p className="text-xs text-muted-foreground">
+                  {counts.active} active · {counts.inactive} inactive
+                </p>
+              </CardContent>
+            </Card>
+          );
+        })}
+      </div>
+
+      <div className="grid md:grid-cols-2 gap-6">
+        <Card>
+          <CardHeader>
+            <CardTitle className="flex items-center space-x-2">
+              <CalendarIcon size={18} />
+              <span>Upcoming Events</span>
+            </CardTitle>
+          </CardHeader>
+          <CardContent>
+            {summary.upcomingEvents.length === 0 ? (
+              <p className="text-muted-foreground">No upcoming events.</p>
+            ) : (
+              <ul className="space-y-3">
+                {summary.upcomingEvents.map((event) => (
+                  <li key={event.id} className="flex justify-between">
+                    <span className="font-medium">{event.title}</span>
+                    <span className="text-sm text-muted-foreground">{event.date}</span>
+                  </li>
+                ))}
+              </ul>
+            )}
+          </CardContent>
+        </Card>
+
+        <Card>
+          <CardHeader className="flex flex-row items-center justify-between">
+            <CardTitle className="flex items-center space-x-2">
+              <Inbox size={18} />
+              <span>Recent Submissions</span>
+            </CardTitle>
+            <span className="flex items-center text-sm text-muted-foreground">
+              <Mail size={14} className="mr-1" />
+              {summary.subscribers} subscribers
+            </span>
+          </CardHeader>
+          <CardContent>
+            {Object.keys(summary.submissions).length === 0 ? (
+              <p className="text-muted-foreground">No submissions yet.</p>
+            ) : (
+              <div className="space-y-4">
+                {Object.entries(summary.submissions).map(([formType, group]) => (
+                  <div key={formType}>
+                    <p className="text-sm font-semibold text-primary capitalize">
+                      {formType} ({group.count})
+                    </p>
+                    <ul className="text-sm space-y-1">
+                      {group.latest.map((submission, i) => (
+                        <li key={`${submission.submittedAt}-${i}`} className="flex justify-between">
+                          <span>{submissionLabel(submission)}</span>
+                          <span className="text-muted-foreground">
+                            {new Date(submission.submittedAt).toLocaleDateString()}
+                          </span>
+                        </li>
+                      ))}
+                    </ul>
+                  </div>
+                ))}
+              </div>
+            )}
+          </CardContent>
+        </Card>
+      </div>
+    </div>
+  );
+};
+
+export default OverviewPanel;
@@ -6,7 +6,8 @@ import { ProgramsManager } from '../components/admin/ProgramsManager';
 import { EventsManager } from '../components/admin/EventsManager';
 import { AnnouncementsManager } from '../components/admin/AnnouncementsManager';
 import { OpportunitiesManager } from '../components/admin/OpportunitiesManager';
-import { LayoutDashboard, Calendar, Megaphone, Briefcase, LogOut, Home } from 'lucide-react';
+import { OverviewPanel } from '../components/admin/OverviewPanel';
+import { LayoutDashboard, Calendar, Megaphone, Briefcase, LogOut, Home, BarChart3 } from 'lucide-react';
 import { initializeStorage } from '../utils/cmsStorage';
 
 export const AdminDashboard = ({ onLogout }) => {
@@ -68,8 +69,13 @@ export const AdminDashboard = ({ onLogout }) => {
           </CardContent>
         </Card>
 
-        <Tabs defaultValue="programs" className="space-y-6">
-          <TabsList className="grid w-full grid-cols-4 lg:w-auto lg:inline-grid">
+        {/* Managers only mount (and fetch their collection) when their tab is opened */}
+        <Tabs defaultValue="overview" className="space-y-6">
+          <TabsList className="grid w-full grid-cols-5 lg:w-auto lg:inline-grid">
+            <TabsTrigger value="overview" className="flex items-center space-x-2">
+              <BarChart3 size={16} />
+              <span>Overview</span>
+            </TabsTrigger>
             <TabsTrigger value="programs" className="flex items-center space-x-2">
               <LayoutDashboard size={16} />
               <span>Programs</span>
@@ -88,6 +94,10 @@ export const AdminDashboard = ({ onLogout }) => {
             </TabsTrigger>
           </TabsList>
 
+          <TabsContent value="overview">
+            <OverviewPanel />
+          </TabsContent>
+
           <TabsContent value="programs">
             <ProgramsManager />
           </TabsContent>
@@ -524,3 +524,8 @@ export const submitForm = async (formType, data) => {
     body: JSON.stringify({ formType, data }),
   });
 };
+
+// Admin dashboard summary - counts and recent items only, never full collections
+export const getAdminSummary = async (recent = 5) => {
+  return await apiCall(`/admin/summary?recent=${recent}`);
+};